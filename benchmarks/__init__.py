@@ -0,0 +1,2 @@
+"""Micro-benchmarks and load tests for the API
+"""
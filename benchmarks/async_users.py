@@ -0,0 +1,74 @@
+"""Load test: sync against async users controller at growing concurrency
+
+Runs benchmarks.load in a fresh interpreter for every controller variant
+and number of driver threads, as ASYNC_CONTROLLERS is read when config is
+imported, and reports throughput and latency of both side by side. The
+default workload only reads, so concurrent SQLite writers do not dominate
+the results; use --target postgres for write-heavy mixes.
+
+    python -m benchmarks.async_users [--concurrency 1,16,64] [--requests 2000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_load_test(arguments, concurrency: int, serve_async: bool):
+    """Run load test in a fresh interpreter, return its report"""
+    command = [
+        sys.executable, '-m', 'benchmarks.load',
+        '--target', arguments.target,
+        '--users', str(arguments.users),
+        '--requests', str(arguments.requests),
+        '--concurrency', str(concurrency),
+        '--mix', arguments.mix,
+    ]
+
+    if serve_async:
+        command.append('--async')
+
+    output = subprocess.run(
+        command,
+        cwd=ROOT_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+
+    return json.loads(output)
+
+
+def main():
+    """Run load tests and print side by side comparison as JSON"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=('sqlite', 'postgres'), default='sqlite')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', default='1,16,64', help='driver thread counts')
+    parser.add_argument('--mix', default='list=40,get=60', help='workload mix')
+    arguments = parser.parse_args()
+
+    results = []
+
+    for concurrency in (int(value) for value in arguments.concurrency.split(',')):
+        for serve_async in (False, True):
+            report = run_load_test(arguments, concurrency, serve_async)
+
+            results.append({
+                'variant': 'async' if serve_async else 'sync',
+                'concurrency': concurrency,
+                'requests_per_second': report['requests_per_second'],
+                'latency_ms': report['latency_ms'],
+                'errors': report['errors'],
+                'peak_rss_mb': report['peak_rss_mb'],
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
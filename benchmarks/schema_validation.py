@@ -0,0 +1,81 @@
+"""Micro-benchmark: per-request JSON Schema validation cost
+
+Compares loading the schema file and calling `jsonschema.validate` on every
+request (previous behaviour) against validation through the compiled
+validators of `SchemaRegistry`.
+
+    python -m benchmarks.schema_validation [--number 2000]
+"""
+import argparse
+import functools
+import json
+import os
+import timeit
+
+import jsonschema
+
+from project.services.schema_registry import SchemaRegistry
+
+SCHEMA_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'project',
+    'http'
+)
+
+PAYLOADS = {
+    'user_create_schema': {
+        'email': 'john.doe@example.com',
+        'name': 'John Doe',
+        'password': 'password123',
+        'consent': True,
+    },
+    'user_update_schema': {
+        'memo': 'User related note',
+    },
+}
+
+
+def validate_per_request(name: str, data):
+    """Previous behaviour: read schema file and validate from scratch"""
+    schema_file_path = os.path.join(SCHEMA_DIRECTORY, f'{name}.json')
+
+    with open(schema_file_path, mode='r', encoding='utf-8') as schema_file:
+        schema = json.load(schema_file)
+
+    jsonschema.validate(data, schema)
+
+
+def main():
+    """Run benchmark and print per-call cost in microseconds"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='calls per measurement')
+    arguments = parser.parse_args()
+
+    registry = SchemaRegistry(SCHEMA_DIRECTORY)
+
+    for name in PAYLOADS:
+        registry.validator(name)
+
+    results = {}
+
+    for name, data in PAYLOADS.items():
+        before = timeit.timeit(
+            functools.partial(validate_per_request, name, data),
+            number=arguments.number
+        )
+        after = timeit.timeit(
+            functools.partial(registry.validate, name, data),
+            number=arguments.number
+        )
+
+        results[name] = {
+            'per_request_us': round(before / arguments.number * 1e6, 2),
+            'registry_us': round(after / arguments.number * 1e6, 2),
+            'speedup': round(before / after, 1),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
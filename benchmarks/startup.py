@@ -0,0 +1,93 @@
+"""Startup benchmark: cold boot time of a worker running create_app
+
+Every sample boots a fresh interpreter, like a new gunicorn worker, and
+times module imports plus create_app() on a temporary SQLite database.
+Variants:
+
+    * legacy_second_engine - create_app() followed by the schema check the
+      factory used to do, on a second engine which was never disposed
+    * bootstrap_app_engine - create_app() with schema bootstrap through
+      the app engine (SCHEMA_BOOTSTRAP_ON_STARTUP)
+    * no_bootstrap - create_app() only, schema created by
+      `flask create_schema` at deployment
+
+    python -m benchmarks.startup [--samples 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER_SCRIPT = """
+import sys, time
+started_at = time.perf_counter()
+
+import sqlalchemy as sa
+from project import create_app
+
+app = create_app()
+
+if sys.argv[1] == 'bootstrap_app_engine':
+    from project import ensure_schema
+    ensure_schema(app)
+elif sys.argv[1] == 'legacy_second_engine':
+    engine = sa.create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    sa.inspect(engine).has_table('users')
+
+print(time.perf_counter() - started_at)
+"""
+
+VARIANTS = ('legacy_second_engine', 'bootstrap_app_engine', 'no_bootstrap')
+
+
+def boot_worker(variant: str, environment: dict):
+    """Boot interpreter running create_app, return its boot time in seconds"""
+    output = subprocess.run(
+        [sys.executable, '-c', WORKER_SCRIPT, variant],
+        cwd=ROOT_DIRECTORY,
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    """Run benchmark and print boot time statistics in milliseconds"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=10, help='boots per variant')
+    arguments = parser.parse_args()
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        environment = dict(
+            os.environ,
+            CONFIG_TYPE='config.TestingConfig',
+            TEST_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        )
+
+        # Schema exists, as it does for every worker but the first one
+        boot_worker('bootstrap_app_engine', environment)
+
+        for variant in VARIANTS:
+            samples = [boot_worker(variant, environment) * 1000 for _ in range(arguments.samples)]
+
+            results[variant] = {
+                'median_ms': round(statistics.median(samples), 2),
+                'min_ms': round(min(samples), 2),
+                'max_ms': round(max(samples), 2),
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
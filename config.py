@@ -4,6 +4,34 @@ import os
 # Determine the folder of the top-level directory of this project
 BASEDIR = os.path.abspath(os.path.dirname(__file__))
 
+
+def engine_options(database_url, pool_size=5, max_overflow=10):
+    """SQLAlchemy engine and connection pool options, every value can be
+    overridden by DB_* environment variables.
+
+    Connections are pinged on checkout and recycled periodically, so
+    connections left stale by a database failover are not handed out.
+    """
+    if database_url in ('sqlite://', 'sqlite:///:memory:'):
+        # In-memory SQLite uses a single static connection, there is no pool
+        return {}
+
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', default=str(pool_size))),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', default=str(max_overflow))),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', default='30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', default='1800')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', default='true').lower() == 'true',
+    }
+
+    if database_url.startswith('postgresql'):
+        options['connect_args'] = {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', default='10')),
+        }
+
+    return options
+
+
 # pylint: disable=too-few-public-methods
 class Config():
     """Config provider"""
@@ -30,6 +58,132 @@ class Config():
         SQLALCHEMY_DATABASE_URI = database_url
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Create missing tables when the app starts, deployments run
+    # `flask create_schema` once instead
+    SCHEMA_BOOTSTRAP_ON_STARTUP = False
+
+    # Controllers imported on their first request instead of at boot, their
+    # URL rules are read from `flask controllers manifest` output. Off in
+    # every environment: no controller of this app imports slowly enough
+    # for boot time to change measurably
+    LAZY_CONTROLLERS = ()
+
+    # Controllers served by their async variant (`<module>_async`), like
+    # project.http.users, on an async engine: aiosqlite or asyncpg driver of
+    # SQLALCHEMY_DATABASE_URI unless ASYNC_DATABASE_URI is set
+    ASYNC_CONTROLLERS = tuple(filter(None, os.getenv('ASYNC_CONTROLLERS', default='').split(',')))
+    ASYNC_DATABASE_URI = os.getenv('ASYNC_DATABASE_URI')
+
+    # Logging: request threads only queue records, a listener thread writes
+    # them to LOG_FILE (management.log in instance folder by default).
+    # Records below WARNING are sampled, 1 of LOG_SAMPLE_RATE per call site
+    LOG_FILE = os.getenv('LOG_FILE')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', default='INFO')
+    LOG_FORMAT = 'json'
+    LOG_MAX_BYTES = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT = 20
+    LOG_QUEUE_SIZE = 10000
+    LOG_SAMPLE_RATE = int(os.getenv('LOG_SAMPLE_RATE', default='1'))
+    # Collection reads are the most frequent requests
+    LOG_COLLECTION_SAMPLE_RATE = 100
+
+    # Request instrumentation: Server-Timing response header with phase,
+    # SQL and total durations, latency histogram buckets (seconds) of /metrics
+    SERVER_TIMING = True
+    METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    # On-demand profiling of requests sent with `X-Profile` header or
+    # `_profile` query argument, carrying PROFILING_TOKEN when it is set.
+    # Profiles are stored in instance/profiles unless PROFILING_DIRECTORY
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='false').lower() == 'true'
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+    PROFILING_DIRECTORY = None
+    PROFILING_MAX_FILES = 100
+
+    # Users collection: keyset pagination page sizes and the number of rows
+    # fetched per round trip when the whole collection is streamed
+    USERS_PAGE_SIZE = 100
+    USERS_PAGE_SIZE_MAX = 1000
+    USERS_STREAM_CHUNK_SIZE = 1000
+
+    # Number of users inserted by a single statement on bulk import
+    USERS_BULK_BATCH_SIZE = 500
+
+    # Number of ids a bulk deletion may list
+    USERS_BULK_MAX_IDS = 10000
+
+    # Batch lookup by ids: number of ids a request may list, and number of
+    # ids bound to a single IN query
+    USERS_BATCH_MAX_IDS = 10000
+    USERS_BATCH_CHUNK_SIZE = 500
+
+    # Number of rows read and encoded at a time by users export, one
+    # Parquet row group each
+    USERS_EXPORT_CHUNK_SIZE = 10000
+
+    # Age changes must reach before the change feed reports them, so
+    # transactions committed late with earlier timestamps are not skipped
+    USERS_CHANGES_SETTLE_SECONDS = 2
+
+    # Format of datetimes in JSON responses: http (RFC 7231 date) or iso
+    JSON_DATETIME_FORMAT = 'http'
+
+    # Recompile JSON Schemas when their files change
+    SCHEMA_AUTO_RELOAD = False
+
+    # Password hashing: werkzeug method with its cost parameters, number of
+    # worker processes (0 hashes in the request thread) and the number of
+    # hashes allowed to queue before requests are rejected with 503
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', default='pbkdf2:sha256:600000')
+    PASSWORD_HASH_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', default='0'))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', default='32'))
+    PASSWORD_HASH_TIMEOUT = 30
+
+    # Cache of single user lookups: lru, redis, memory or none
+    USER_CACHE_BACKEND = os.getenv('USER_CACHE_BACKEND', default='lru')
+    USER_CACHE_URL = os.getenv('USER_CACHE_URL')
+    USER_CACHE_MAX_ENTRIES = 10000
+    USER_CACHE_TTL = 60
+
+    # User mutation events streamed by /users/events: local, redis, memory
+    # or none. Each subscriber queues up to EVENTS_QUEUE_SIZE events, full
+    # queue drops oldest or newest event, or disconnects the subscriber
+    EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', default='local')
+    EVENTS_URL = os.getenv('EVENTS_URL')
+    EVENTS_QUEUE_SIZE = 100
+    EVENTS_OVERFLOW_POLICY = 'drop_oldest'
+    EVENTS_MAX_SUBSCRIBERS = 100
+    EVENTS_HEARTBEAT_SECONDS = 15
+
+    # Transactional outbox of user changes: sink messages are delivered to
+    # (log, webhook or memory), batch size, claim lease, retry backoff base
+    # and attempts before a message is parked, idle poll interval. Runs as
+    # `flask outbox dispatch`, or as a thread of every app process
+    OUTBOX_SINK = os.getenv('OUTBOX_SINK', default='log')
+    OUTBOX_WEBHOOK_URL = os.getenv('OUTBOX_WEBHOOK_URL')
+    OUTBOX_WEBHOOK_TIMEOUT = 10
+    OUTBOX_BATCH_SIZE = 100
+    OUTBOX_LEASE_SECONDS = 60
+    OUTBOX_RETRY_SECONDS = 1
+    OUTBOX_MAX_ATTEMPTS = 10
+    OUTBOX_POLL_SECONDS = 1
+    OUTBOX_DISPATCHER_THREAD = (
+        os.getenv('OUTBOX_DISPATCHER_THREAD', default='false').lower() == 'true'
+    )
+
+    # Response compression negotiated by Accept-Encoding: zstd and br need
+    # zstandard and brotli packages, gzip is always available. Bodies below
+    # COMPRESSION_MIN_SIZE bytes are sent as they are. Compressed bodies of
+    # responses with ETag are cached, COMPRESSION_CACHE_MAX_ENTRIES of them
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', default='true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = 1024
+    COMPRESSION_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+    COMPRESSION_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+    COMPRESSION_CACHE_MAX_ENTRIES = 1000
+    COMPRESSION_CACHE_TTL = 300
 
 # pylint: disable=too-few-public-methods
 class TestingConfig(Config):
@@ -41,13 +195,45 @@ class TestingConfig(Config):
     database_url = os.getenv( 'TEST_DATABASE_URI', default=default_url)
 
     SQLALCHEMY_DATABASE_URI = database_url
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    LOG_MAX_BYTES = 1024 * 1024
+    LOG_BACKUP_COUNT = 2
+
+    # Cheap hashes keep the test suite fast
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+    # Changes are read right after they are made
+    USERS_CHANGES_SETTLE_SECONDS = 0
+
+    # Outbox messages are dispatched by the tests
+    OUTBOX_SINK = 'memory'
+    OUTBOX_DISPATCHER_THREAD = False
 
 # pylint: disable=too-few-public-methods
 class DevelopmentConfig(Config):
     """Config provider for dev env."""
     DEBUG = True
+    SCHEMA_AUTO_RELOAD = True
+    SCHEMA_BOOTSTRAP_ON_STARTUP = True
+    LOG_FORMAT = 'text'
+    LOG_LEVEL = 'DEBUG'
+    PROFILING_ENABLED = True
+    # Cheapest levels keep the dev server responsive
+    COMPRESSION_LEVELS = {'gzip': 1, 'br': 1, 'zstd': 1}
 
 # pylint: disable=too-few-public-methods
 class ProductionConfig(Config):
     """Config provider for prod env."""
     FLASK_ENV = 'production'
+    LOG_MAX_BYTES = 50 * 1024 * 1024
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        Config.SQLALCHEMY_DATABASE_URI,
+        pool_size=10,
+        max_overflow=20
+    )
+    PASSWORD_HASH_WORKERS = int(
+        os.getenv('PASSWORD_HASH_WORKERS', default=str(os.cpu_count() or 1))
+    )
+    # Responses cross availability zones, spend more CPU on smaller bodies
+    COMPRESSION_LEVELS = {'gzip': 6, 'br': 6, 'zstd': 6}
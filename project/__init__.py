@@ -2,18 +2,33 @@
     Application Factory Function and configurations for production and testing
 """
 
-import logging
 import os
-from logging.handlers import RotatingFileHandler
 import importlib
 
+import click
 import sqlalchemy as sa
 from click import echo
 
-from flask import Flask
+from flask import Flask, jsonify
 from flask.logging import default_handler
 from flask_sqlalchemy import SQLAlchemy # pylint: disable=import-error
 
+from project.exceptions.password_hasher_saturated import PasswordHasherSaturated
+from project.services.async_db import AsyncDatabase
+from project.services.compression import ResponseCompressor
+from project.services.controller_registry import (
+    controller_modules, import_time_report, lazy_rules, register_lazy_controller, write_manifest
+)
+from project.services.db_pool import configure_pool
+from project.services.event_broker import EventBroker
+from project.services.instrumentation import Instrumentation
+from project.services.log_pipeline import LogPipeline
+from project.services.outbox import OutboxDispatcher
+from project.services.password_hasher import PasswordHasher
+from project.services.request_profiler import SORT_KEYS, RequestProfiler
+from project.services.schema_registry import SchemaRegistry
+from project.services.user_cache import UserCache
+
 
 # -------------
 # Configuration
@@ -23,6 +38,28 @@ from flask_sqlalchemy import SQLAlchemy # pylint: disable=import-error
 # the global scope, but without any arguments passed in.
 db = SQLAlchemy()
 
+# Async engine of controllers served by their async variant
+async_db = AsyncDatabase()
+
+# JSON Schemas of API payloads are kept next to the controllers using them
+schema_registry = SchemaRegistry(os.path.join(os.path.dirname(__file__), 'http'))
+
+password_hasher = PasswordHasher()
+
+user_cache = UserCache()
+
+event_broker = EventBroker()
+
+outbox_dispatcher = OutboxDispatcher()
+
+log_pipeline = LogPipeline()
+
+instrumentation = Instrumentation()
+
+request_profiler = RequestProfiler()
+
+compressor = ResponseCompressor()
+
 def create_app():
     """Application Factory Function"""
 
@@ -33,75 +70,181 @@ def create_app():
 
     initialise_extensions(app)
     configure_logging(app)
+    register_error_handlers(app)
     register_cli_commands(app)
     register_blueprints(app)
 
-    engine = sa.create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
-    inspector = sa.inspect(engine)
+    # Schema bootstrap is a one-shot deployment step (flask create_schema),
+    # running it on every worker boot is opt-in for local development
+    if app.config.get('SCHEMA_BOOTSTRAP_ON_STARTUP', False):
+        ensure_schema(app)
+
+    return app
 
-    if not inspector.has_table("users"):
-        with app.app_context():
-            app.logger.info('Cleanup database') # pylint: disable=no-member
-            db.drop_all()
-            app.logger.info('initialise database') # pylint: disable=no-member
+
+def ensure_schema(app):
+    """Create database tables and indexes which do not exist yet, through
+    the engine managed by the app. Existing tables and data are left
+    untouched.
+
+        :param app: Flask application
+        :return: names of created tables and indexes
+        :rtype: list
+    """
+    with app.app_context():
+        inspector = sa.inspect(db.engine)
+        missing_tables = [
+            table.name for table in db.metadata.sorted_tables
+            if not inspector.has_table(table.name)
+        ]
+        missing_indexes = [
+            index for table in db.metadata.sorted_tables
+            if table.name not in missing_tables
+            for index in _missing_indexes(inspector, table)
+        ]
+
+        if missing_tables:
+            app.logger.info(f'Creating tables: {", ".join(missing_tables)}') # pylint: disable=no-member
             db.create_all()
-    else:
-        app.logger.info('Database already contains the users table.')# pylint: disable=no-member
 
-    return app
+        if missing_indexes:
+            app.logger.info( # pylint: disable=no-member
+                f'Creating indexes: {", ".join(index.name for index in missing_indexes)}'
+            )
+
+            with db.engine.begin() as connection:
+                for index in missing_indexes:
+                    index.create(connection, checkfirst=True)
+
+        if not missing_tables and not missing_indexes:
+            app.logger.info('Database schema is up to date.') # pylint: disable=no-member
+
+    return missing_tables + [index.name for index in missing_indexes]
+
+
+def _missing_indexes(inspector, table):
+    """Indexes of existing table not in the database yet. Indexes limited to
+    other database dialects by Index.ddl_if() are skipped."""
+    existing_indexes = _index_names(inspector, table.name)
+    missing_indexes = []
+
+    for index in table.indexes:
+        ddl_if = index._ddl_if # pylint: disable=protected-access
+
+        if ddl_if is not None and ddl_if.dialect not in (None, inspector.dialect.name):
+            continue
+
+        if index.name not in existing_indexes:
+            missing_indexes.append(index)
+
+    return missing_indexes
+
+
+def _index_names(inspector, table_name):
+    """Names of indexes of a table in the database. SQLite dialect does not
+    reflect expression indexes, their names are read from sqlite_master."""
+    if inspector.dialect.name != 'sqlite':
+        return {index['name'] for index in inspector.get_indexes(table_name)}
+
+    with inspector.bind.connect() as connection:
+        return set(connection.execute(
+            sa.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+            {'table': table_name}
+        ).scalars())
 
 
 # ----------------
 # Helper Functions
 # ----------------
 def initialise_extensions(app):
-    """Initialise extensions: DB"""
+    """Initialise extensions: DB, async DB, JSON Schema registry, password
+    hasher, user cache, event broker, outbox dispatcher, request
+    instrumentation and profiling, response compression. Compression is
+    initialised last, so its response hook runs first and compression time
+    is part of request timings"""
+    configure_pool(app)
     db.init_app(app)
+    async_db.init_app(app)
+    schema_registry.init_app(app)
+    password_hasher.init_app(app)
+    user_cache.init_app(app)
+    event_broker.init_app(app)
+    outbox_dispatcher.init_app(app)
+    instrumentation.init_app(app)
+    request_profiler.init_app(app)
+    compressor.init_app(app)
 
 
 def configure_logging(app):
-    """Configure logging functionality"""
-    # Logging Configuration
-
-    file_handler = RotatingFileHandler('instance/management.log',
-                                        maxBytes=16384,
-                                        backupCount=20)
-    # pylint: disable=line-too-long
-    file_formatter = logging.Formatter(
-        '%(asctime)s %(levelname)s %(threadName)s-%(thread)d: %(message)s [in %(filename)s:%(lineno)d]'
+    """Configure logging functionality
+
+    Records are queued by request threads and written to the log file by
+    a background thread, so file I/O and rollovers stay off the request path.
+    """
+    log_file = app.config.get('LOG_FILE', None) or os.path.join(
+        app.instance_path,
+        'management.log'
     )
-    # pylint: enable=line-too-long
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
-    file_handler.setFormatter(file_formatter)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    log_pipeline.init_app(app, log_file)
 
     # Remove the default logger configured by Flask
     app.logger.removeHandler(default_handler)
     app.logger.info('Starting the Flask User Management App...')
 
 
+def register_error_handlers(app):
+    """Register handlers for errors shared by all API blueprints"""
+
+    @app.errorhandler(PasswordHasherSaturated)
+    def handle_password_hasher_saturated(exception):
+        app.logger.warning(exception.message) # pylint: disable=no-member
+
+        response = jsonify({'error': exception.message})
+        response.headers['Retry-After'] = '1'
+
+        return response, 503
+
+
 def register_blueprints(app):
-    """Register available API blueprints"""
+    """Register API blueprints of the controller registry
+
+    Controllers listed in `LAZY_CONTROLLERS` are registered from the
+    controllers manifest (`flask controllers manifest`) and imported on
+    their first request. Without an up to date manifest they are imported
+    right away, like every other controller.
 
-    controllers_path = 'project/http'
-    module_base = controllers_path.replace('/', '.')
+    Controllers listed in `ASYNC_CONTROLLERS` are replaced by their async
+    variant, `<module>_async` module serving the same routes.
+    """
 
-    for filename in os.listdir(controllers_path):
-        if filename.endswith('.py') and filename != '__init__.py':
-            app.logger.debug(f'Testing file {filename} in {controllers_path}...')
+    lazy_controllers = app.config.get('LAZY_CONTROLLERS', ())
+    async_controllers = app.config.get('ASYNC_CONTROLLERS', ())
+    manifest_path = os.path.join(app.instance_path, 'controllers.json')
 
-            module_name = f'{module_base}.{filename[:-3]}'
+    for module_name in controller_modules():
+        if module_name in async_controllers:
+            module_name = f'{module_name}_async'
 
-            app.logger.debug(f'Module name {module_name}...')
+        if module_name in lazy_controllers:
+            rules = lazy_rules(manifest_path, module_name)
 
-            module = importlib.import_module(module_name)
+            if rules is not None:
+                app.logger.info(f'Registering {module_name} lazily ...')
+                register_lazy_controller(app, rules)
 
-            if hasattr(module, 'controller_blueprint'):
-                blueprint = module.controller_blueprint
-                app.logger.info(f'Blueprint detected, registering {blueprint} ...')
+                continue
 
-                app.register_blueprint(module.controller_blueprint)
+            app.logger.warning(f'No up to date manifest for {module_name}, importing it.')
+
+        module = importlib.import_module(module_name)
+
+        if hasattr(module, 'controller_blueprint'):
+            blueprint = module.controller_blueprint
+            app.logger.info(f'Blueprint detected, registering {blueprint} ...')
+
+            app.register_blueprint(module.controller_blueprint)
 
 
 def register_cli_commands(app):
@@ -113,3 +256,77 @@ def register_cli_commands(app):
         db.drop_all()
         db.create_all()
         echo('Initialized the database!')
+
+    @app.cli.command('create_schema')
+    def create_schema():
+        """Create missing database tables and indexes, keeping existing data."""
+        missing_objects = ensure_schema(app)
+
+        if missing_objects:
+            echo(f'Created tables and indexes: {", ".join(missing_objects)}')
+        else:
+            echo('Database schema is up to date.')
+
+    @app.cli.group('controllers')
+    def controllers():
+        """Inspect API controllers registry."""
+
+    @controllers.command('list')
+    def list_controllers():
+        """List registered controllers."""
+        lazy_controllers = app.config.get('LAZY_CONTROLLERS', ())
+        async_controllers = app.config.get('ASYNC_CONTROLLERS', ())
+
+        for module_name in controller_modules():
+            if module_name in async_controllers:
+                echo(f'{module_name}_async (async)')
+            else:
+                echo(f'{module_name}{" (lazy)" if module_name in lazy_controllers else ""}')
+
+    @controllers.command('manifest')
+    def write_controllers_manifest():
+        """Write URL rules manifest used by lazy controllers."""
+        os.makedirs(app.instance_path, exist_ok=True)
+        manifest_path = os.path.join(app.instance_path, 'controllers.json')
+        manifest = write_manifest(manifest_path, controller_modules())
+
+        echo(f'Written {sum(len(entry["rules"]) for entry in manifest.values())} '
+             f'rules to {manifest_path}')
+
+    @controllers.command('importtime')
+    @click.option('--limit', default=25, help='Number of imports to report.')
+    def profile_imports(limit):
+        """Report slowest imports of app boot (python -X importtime)."""
+        echo(f'{"self [us]":>10} {"cumulative":>10}  module')
+
+        for self_time, cumulative_time, module in import_time_report(
+            os.path.dirname(app.root_path),
+            limit
+        ):
+            echo(f'{self_time:>10} {cumulative_time:>10}  {module}')
+
+    @app.cli.group('profiles')
+    def profiles():
+        """Inspect stored request profiles."""
+
+    @profiles.command('list')
+    def list_profiles():
+        """List stored request profiles, newest first."""
+        for profile_id in request_profiler.list_profiles():
+            echo(profile_id)
+
+    @profiles.command('show')
+    @click.argument('profile_id')
+    @click.option('--limit', default=20, help='Number of functions to report.')
+    @click.option('--sort', default='cumulative', help='pstats sort key, e.g. time.')
+    def show_profile(profile_id, limit, sort):
+        """Summarise hottest functions of a stored request profile."""
+        if sort not in SORT_KEYS:
+            raise click.BadParameter(
+                f'{sort} is not one of {", ".join(SORT_KEYS)}.', param_hint="'--sort'"
+            )
+
+        try:
+            echo(request_profiler.summary(profile_id, limit, sort))
+        except FileNotFoundError as exception:
+            raise click.ClickException(f'Unknown profile: {profile_id}') from exception
@@ -0,0 +1,10 @@
+"""Password hasher backpressure exception
+"""
+
+
+class PasswordHasherSaturated(Exception):
+    """Exception raised when too many password hashes are already queued."""
+
+    def __init__(self, message="Password hasher is saturated, retry later"):
+        self.message = message
+        super().__init__(self.message)
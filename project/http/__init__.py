@@ -0,0 +1,21 @@
+"""API controllers
+
+Every controller module exposes `controller_blueprint`. Modules listed in
+CONTROLLERS are registered by the application factory, controllers of
+installed plugins are registered through the `ENTRY_POINT_GROUP` entry
+point group.
+"""
+
+CONTROLLERS = (
+    'project.http.default',
+    'project.http.diagnostics',
+    'project.http.metrics',
+    'project.http.outbox',
+    'project.http.users',
+    'project.http.users_bulk',
+    'project.http.users_changes',
+    'project.http.users_events',
+    'project.http.users_export',
+)
+
+ENTRY_POINT_GROUP = 'flask_restfull_api.controllers'
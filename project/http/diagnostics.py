@@ -0,0 +1,32 @@
+""" Diagnostics controller exposing runtime metrics of app services """
+
+from flask import Blueprint, jsonify
+
+from project import db, log_pipeline, password_hasher, user_cache
+from project.services.db_pool import pool_metrics
+
+controller_blueprint = Blueprint('diagnostics_resources', __name__)
+
+
+@controller_blueprint.route('/diagnostics/password-hasher', methods=['GET'])
+def get_password_hasher_metrics():
+    """ Handle GET request to get password hashing latency and queue metrics """
+    return jsonify(password_hasher.metrics())
+
+
+@controller_blueprint.route('/diagnostics/user-cache', methods=['GET'])
+def get_user_cache_metrics():
+    """ Handle GET request to get user cache hit, miss and eviction counters """
+    return jsonify(user_cache.metrics())
+
+
+@controller_blueprint.route('/diagnostics/db-pool', methods=['GET'])
+def get_db_pool_metrics():
+    """ Handle GET request to get database connection pool usage """
+    return jsonify(pool_metrics(db.engine))
+
+
+@controller_blueprint.route('/diagnostics/logging', methods=['GET'])
+def get_logging_metrics():
+    """ Handle GET request to get queued, dropped and sampled out log records """
+    return jsonify(log_pipeline.metrics())
@@ -0,0 +1,97 @@
+""" Metrics controller exposing app metrics in Prometheus text format """
+
+from flask import Blueprint, Response
+
+from project import (
+    compressor, db, event_broker, instrumentation, log_pipeline, outbox_dispatcher,
+    password_hasher, user_cache
+)
+from project.services.db_pool import pool_metrics
+
+controller_blueprint = Blueprint('metrics_resources', __name__)
+
+
+@controller_blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    """ Handle GET request to get request latency histograms and service
+        counters, in Prometheus text exposition format """
+
+    lines = [instrumentation.render_prometheus().rstrip('\n')]
+
+    cache_metrics = user_cache.metrics()
+    hasher_metrics = password_hasher.metrics()
+    db_pool_metrics = pool_metrics(db.engine)
+
+    _render_metric(lines, 'user_cache_hits_total', 'counter', cache_metrics['hits'])
+    _render_metric(lines, 'user_cache_misses_total', 'counter', cache_metrics['misses'])
+    _render_metric(lines, 'user_cache_evictions_total', 'counter', cache_metrics['evictions'])
+
+    for operation in ('hash', 'check'):
+        _render_metric(
+            lines,
+            f'password_{operation}_seconds_total',
+            'counter',
+            hasher_metrics[operation]['total_seconds']
+        )
+        _render_metric(
+            lines,
+            f'password_{operation}_total',
+            'counter',
+            hasher_metrics[operation]['count']
+        )
+
+    _render_metric(lines, 'password_hasher_rejected_total', 'counter', hasher_metrics['rejected'])
+    _render_metric(lines, 'password_hasher_pending', 'gauge', hasher_metrics['pending'])
+
+    for name in ('checked_out', 'idle', 'overflow'):
+        if name in db_pool_metrics:
+            _render_metric(lines, f'db_pool_{name}_connections', 'gauge', db_pool_metrics[name])
+
+    _render_metric(lines, 'log_records_dropped_total', 'counter', log_pipeline.metrics()['dropped'])
+
+    events_metrics = event_broker.metrics()
+
+    _render_metric(lines, 'user_events_published_total', 'counter', events_metrics['published'])
+    _render_metric(lines, 'user_events_dropped_total', 'counter', events_metrics['dropped'])
+    _render_metric(lines, 'user_events_subscribers', 'gauge', events_metrics['subscribers'])
+
+    compression_metrics = compressor.metrics()
+
+    _render_metric(
+        lines, 'compressed_responses_total', 'counter', compression_metrics['responses']
+    )
+    _render_metric(
+        lines, 'compression_cache_hits_total', 'counter', compression_metrics['cache_hits']
+    )
+
+    for name in ('bytes_in', 'bytes_out'):
+        _render_metric(
+            lines, f'compression_{name}_total', 'counter', compression_metrics[name]
+        )
+
+    _render_outbox_metrics(lines)
+
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def _render_outbox_metrics(lines):
+    """ Append dispatcher counters of this process and outbox backlog """
+    outbox_metrics = outbox_dispatcher.metrics()
+    outbox_status = outbox_dispatcher.status()
+
+    for name in ('dispatched', 'failed', 'parked'):
+        _render_metric(lines, f'outbox_messages_{name}_total', 'counter', outbox_metrics[name])
+
+    _render_metric(lines, 'outbox_batches_total', 'counter', outbox_metrics['batches'])
+    _render_metric(lines, 'outbox_pending_messages', 'gauge', outbox_status['pending'])
+    _render_metric(lines, 'outbox_parked_messages', 'gauge', outbox_status['parked'])
+    _render_metric(lines, 'outbox_lag_seconds', 'gauge', outbox_status['lag_seconds'])
+    _render_metric(
+        lines, 'outbox_throughput_messages_per_second', 'gauge', outbox_metrics['throughput']
+    )
+
+
+def _render_metric(lines, name: str, metric_type: str, value):
+    """ Append single sample metric with its type to exposition lines """
+    lines.append(f'# TYPE {name} {metric_type}')
+    lines.append(f'{name} {value}')
@@ -0,0 +1,43 @@
+""" Outbox dispatcher commands: `flask outbox dispatch|status|requeue`
+
+The dispatcher is an extension of the app, see OutboxDispatcher.
+"""
+
+import click
+from flask import Blueprint
+
+from project import outbox_dispatcher
+
+controller_blueprint = Blueprint('outbox_resources', __name__, cli_group='outbox')
+
+
+@controller_blueprint.cli.command('dispatch')
+@click.option('--once', is_flag=True, help='Stop once no message is available.')
+def dispatch(once):
+    """Deliver outbox messages until interrupted."""
+    try:
+        outbox_dispatcher.run(once=once)
+    except KeyboardInterrupt:
+        pass
+
+    metrics = outbox_dispatcher.metrics()
+    click.echo(
+        f'Dispatched {metrics["dispatched"]} messages in {metrics["batches"]} batches, '
+        f'{metrics["failed"]} failed deliveries, {metrics["parked"]} parked.'
+    )
+
+
+@controller_blueprint.cli.command('status')
+def status():
+    """Report pending and parked outbox messages."""
+    outbox_status = outbox_dispatcher.status()
+    click.echo(
+        f'{outbox_status["pending"]} pending, {outbox_status["parked"]} parked, '
+        f'oldest pending {outbox_status["lag_seconds"]:.1f}s old.'
+    )
+
+
+@controller_blueprint.cli.command('requeue')
+def requeue():
+    """Make parked outbox messages available again."""
+    click.echo(f'Requeued {outbox_dispatcher.requeue_parked()} parked messages.')
@@ -0,0 +1,710 @@
+""" Request parsing, statements and responses of the users resources,
+shared by the users controller and its async variant
+"""
+
+import base64
+from collections import namedtuple
+from datetime import datetime
+
+import jsonschema
+import sqlalchemy as sa
+
+
+from flask import Response, jsonify, current_app, request
+from flask import url_for
+from flask.globals import request_ctx
+
+from project import db, event_broker, schema_registry, user_cache
+from project.models.outbox_message import OutboxMessage
+from project.models.user import User
+from project.models.user_tombstone import UserTombstone
+from project.services.batching import chunked
+from project.services.etags import user_etag, user_version_condition
+from project.services.instrumentation import timed
+from project.services.serialization import dumps, json_response, serializer_for
+
+STREAM_MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Fields of the user collection items, unless sparse fieldset is requested
+COLLECTION_FIELDS = frozenset(('id', 'name', 'email'))
+
+# Fields user ETag is derived from
+VERSION_FIELDS = frozenset(('id', 'created_at', 'updated_at'))
+
+# Query arguments filtering and ordering the user collection, kept in the
+# link to the next page
+COLLECTION_FILTERS = ('fields', 'email', 'verified', 'sort')
+
+# Events of users deleted for tombstone reasons
+REMOVAL_EVENTS = {
+    UserTombstone.REASON_DELETED: 'user.deleted',
+    UserTombstone.REASON_CONSENT_REVOKED: 'user.consent_revoked',
+}
+
+# Sort keys of the user collection, user id breaks ties
+SORT_COLUMNS = {
+    'id': User._id, # pylint: disable=protected-access
+    'created_at': User._created_at, # pylint: disable=protected-access
+}
+
+# Fields amended through User setters, in the order they are set
+UPDATABLE_FIELDS = ('password', 'remember_token', 'email', 'name', 'memo', 'consent')
+
+CollectionArguments = namedtuple(
+    'CollectionArguments',
+    ('fields', 'limit', 'after', 'email', 'verified', 'sort')
+)
+
+# Requested user ids, sparse fieldset and the representations found so far
+UserBatch = namedtuple('UserBatch', ('ids', 'fields', 'users'))
+
+user_serializer = serializer_for(User)
+
+
+def collection_request(etag: str):
+    """ Read query arguments of user collection request, and answer the
+        request when no page has to be read: with 304 on matching
+        `If-None-Match`, 400 on invalid argument or with streamed collection
+
+        :param etag: collection ETag
+        :return: CollectionArguments and the response, None when a page
+                 has to be read
+        :rtype: tuple
+    """
+    if request.if_none_match.contains_weak(etag):
+        return None, _not_modified(etag)
+
+    try:
+        sort = _get_sort_argument()
+        arguments = CollectionArguments(
+            fields=user_serializer.parse_fields(request.args.get('fields', None)),
+            limit=None,
+            after=_get_keyset_argument(sort.lstrip('-')),
+            email=request.args.get('email', None),
+            verified=_get_bool_argument('verified'),
+            sort=sort
+        )
+        stream_format = request.args.get('stream', None)
+
+        if stream_format is not None:
+            if stream_format not in STREAM_MIMETYPES:
+                raise ValueError(f'Unsupported stream format: {stream_format}')
+
+            response = _stream_user_collection(stream_format, arguments)
+            response.set_etag(etag, weak=True)
+
+            return arguments, response
+
+        limit = get_limit_argument()
+    except ValueError as exception:
+        return None, (jsonify({'error': str(exception)}), 400)
+
+    current_app.logger.info(
+        'Fetching user collection from the database.',
+        extra={'sample_rate': current_app.config['LOG_COLLECTION_SAMPLE_RATE']}
+    )
+
+    return arguments._replace(limit=limit), None
+
+
+def collection_page_response(rows, arguments, etag: str):
+    """ Build response of a collection page, from up to limit + 1 rows.
+        The extra row tells there is a next page, linked in `Link` header.
+    """
+    has_next_page = len(rows) > arguments.limit
+    rows = rows[:arguments.limit]
+
+    response = json_response(
+        list(user_serializer.serialize_rows(rows, arguments.fields or COLLECTION_FIELDS))
+    )
+
+    if has_next_page:
+        sort_key = arguments.sort.lstrip('-')
+        position = {'after': rows[-1].id} if sort_key == 'id' else {
+            'cursor': _encode_cursor(sort_key, (getattr(rows[-1], sort_key), rows[-1].id))
+        }
+        next_page = url_for(
+            '.get_user_collection',
+            limit=arguments.limit,
+            **position,
+            **{name: request.args.get(name, None) for name in COLLECTION_FILTERS}
+        )
+        response.headers['Link'] = f'<{next_page}>; rel="next"'
+
+    response.set_etag(etag, weak=True)
+
+    return response
+
+
+def user_collection_query(arguments, dialect_name: str):
+    """ Build column-limited SELECT of the user collection: filtered,
+        ordered by sort key and user id, and starting after the `after`
+        keyset. Rows are plain tuples, so no ORM entities are hydrated.
+
+        :param arguments: CollectionArguments
+        :param dialect_name: database dialect, picks email comparison
+    """
+    # pylint: disable=protected-access
+    # Sort key is selected as well, the cursor of the next page is built of it
+    selected = (arguments.fields or COLLECTION_FIELDS) | {'id', arguments.sort.lstrip('-')}
+    query = sa.select(*user_serializer.columns(selected))
+
+    if arguments.email is not None:
+        query = query.where(User.email_equals(arguments.email, dialect_name))
+
+    if arguments.verified is not None:
+        query = query.where(
+            User._email_verified_at.is_not(None) if arguments.verified
+            else User._email_verified_at.is_(None)
+        )
+
+    descending = arguments.sort.startswith('-')
+    sort_column = SORT_COLUMNS[arguments.sort.lstrip('-')]
+    keyset = (User._id,) if sort_column is User._id else (sort_column, User._id)
+
+    if arguments.after is not None:
+        # Row value comparison, index range scan starts right at the keyset
+        query = query.where(
+            sa.tuple_(*keyset) < sa.tuple_(*arguments.after) if descending
+            else sa.tuple_(*keyset) > sa.tuple_(*arguments.after)
+        )
+
+    return query.order_by(*(column.desc() if descending else column for column in keyset))
+
+
+def _stream_user_collection(stream_format: str, arguments):
+    """ Stream whole user collection as a JSON array or as NDJSON
+
+        Rows are read from a server-side cursor `USERS_STREAM_CHUNK_SIZE`
+        at a time and written out chunk by chunk, so memory usage does not
+        depend on the size of the table.
+
+        Rows are read while the response is sent, in the request context
+        pushed again by the generator. Unlike stream_with_context, context
+        is not pushed before the view returns, so async views, running on
+        another thread, can build the response as well.
+    """
+    context = request_ctx._get_current_object() # pylint: disable=protected-access
+    chunk_size = current_app.config['USERS_STREAM_CHUNK_SIZE']
+    fields = arguments.fields or COLLECTION_FIELDS
+
+    def generate():
+        is_json_array = stream_format == 'json'
+        separator = b',' if is_json_array else b'\n'
+        is_first_chunk = True
+
+        if is_json_array:
+            yield b'['
+
+        with context:
+            rows = db.session.execute(
+                user_collection_query(arguments, db.engine.dialect.name),
+                execution_options={'yield_per': chunk_size}
+            )
+
+            for chunk in chunked(rows, chunk_size):
+                lines = separator.join(
+                    dumps(item) for item in user_serializer.serialize_rows(chunk, fields)
+                )
+
+                if is_json_array and not is_first_chunk:
+                    lines = separator + lines
+                elif not is_json_array:
+                    lines += b'\n'
+
+                is_first_chunk = False
+
+                yield lines
+
+        if is_json_array:
+            yield b']'
+
+    return Response(generate(), mimetype=STREAM_MIMETYPES[stream_format])
+
+
+def user_batch_request():
+    """ Read ids and sparse fieldset of batch lookup, and look users up in
+        cache. `ids` query argument is a comma separated list, otherwise
+        ids are read from `ids` array of the payload.
+
+        :return: UserBatch and the response, None unless request is invalid
+        :rtype: tuple
+    """
+    try:
+        fields = user_serializer.parse_fields(request.args.get('fields', None))
+
+        if request.method == 'GET':
+            ids = _parse_ids(request.args['ids'].split(','))
+        else:
+            data = request.get_json(silent=True)
+            ids = _parse_ids(data.get('ids', None) if isinstance(data, dict) else None)
+    except ValueError as exception:
+        return None, (jsonify({'error': str(exception)}), 400)
+
+    return UserBatch(ids, fields, user_cache.get_many(list(dict.fromkeys(ids)))), None
+
+
+def _parse_ids(values):
+    """ Validate list of user ids, given as integers or digit strings
+
+        Raises: ValueError for missing, empty or too long list, invalid id
+    """
+    max_ids = current_app.config['USERS_BATCH_MAX_IDS']
+
+    if not isinstance(values, list) or not values:
+        raise ValueError('List of user ids expected')
+
+    if len(values) > max_ids:
+        raise ValueError(f'At most {max_ids} user ids can be looked up at once')
+
+    ids = []
+
+    for value in values:
+        if isinstance(value, str) and value.isascii() and value.isdigit():
+            value = int(value)
+
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError('User ids must be positive integers')
+
+        ids.append(value)
+
+    return ids
+
+
+def user_batch_queries(batch):
+    """ Build SELECTs of users missing from cache, one IN query per
+        `USERS_BATCH_CHUNK_SIZE` distinct ids. Every visible column is
+        selected, so fetched users can be cached.
+    """
+    missing = [user_id for user_id in dict.fromkeys(batch.ids) if user_id not in batch.users]
+
+    for chunk in chunked(missing, current_app.config['USERS_BATCH_CHUNK_SIZE']):
+        # pylint: disable=protected-access
+        yield sa.select(*user_serializer.columns()).where(User._id.in_(chunk))
+
+
+def user_batch_response(batch, rows):
+    """ Build response of a batch lookup from cached users and rows
+        selected by user_batch_queries, caching the latter. Users are
+        listed in the order of requested ids.
+    """
+    for row, user_data in zip(rows, user_serializer.serialize_rows(rows)):
+        cached = {'etag': user_etag(row.id, row.created_at, row.updated_at), 'user': user_data}
+        user_cache.set(row.id, cached)
+        batch.users[row.id] = cached
+
+    return json_response([
+        _select_fields(batch.users[user_id]['user'], batch.fields) if user_id in batch.users
+        else {'id': user_id, 'error': f'User not found: id: {user_id}'}
+        for user_id in batch.ids
+    ])
+
+
+def _select_fields(data: dict, fields=None):
+    """ Limit representation to sparse fieldset, if any """
+    if fields is None:
+        return data
+
+    return {name: value for name, value in data.items() if name in fields}
+
+
+def user_entity_etag(user: User):
+    """ Weak ETag value of loaded user entity """
+    return user_etag(user.id, user.created_at, user.updated_at)
+
+
+def _not_modified(etag: str):
+    """ Build 304 response for ETag matching If-None-Match """
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+
+    return response
+
+
+def _get_bool_argument(name: str):
+    """ Read true/false query string argument, None when not given
+
+        Raises: ValueError when argument is neither true nor false
+    """
+    value = request.args.get(name, None)
+
+    if value is None:
+        return None
+
+    if value not in ('true', 'false'):
+        raise ValueError(f'Query argument {name} must be true or false')
+
+    return value == 'true'
+
+
+def _get_sort_argument():
+    """ Read `sort` query string argument, sort key with optional `-`
+
+        Raises: ValueError on unknown sort key
+    """
+    value = request.args.get('sort', 'id')
+
+    if value.lstrip('-') not in SORT_COLUMNS or value.startswith('--'):
+        raise ValueError(f'Unsupported sort: {value}, use one of: {", ".join(SORT_COLUMNS)}')
+
+    return value
+
+
+def _get_keyset_argument(sort_key: str):
+    """ Read keyset the collection page starts after: `after` user id of
+        collection sorted by id, or `cursor` of the next page link
+
+        Raises: ValueError on malformed keyset, or on `after` given for
+                another sort key
+    """
+    cursor = request.args.get('cursor', None)
+
+    if cursor is not None:
+        return _decode_cursor(cursor, sort_key)
+
+    after = _get_int_argument('after', default=None, minimum=0)
+
+    if after is not None and sort_key != 'id':
+        raise ValueError(f'Collection sorted by {sort_key} is paginated by cursor, not after')
+
+    return None if after is None else (after,)
+
+
+def _encode_cursor(sort_key: str, keyset):
+    """ Encode (sort value, id) keyset of the last user of a page as
+        opaque cursor """
+    sort_value, user_id = keyset
+    position = f'{sort_key}|{sort_value.isoformat()}|{user_id}'
+
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort_key: str):
+    """ Decode cursor of _encode_cursor, built for the same sort key
+
+        Raises: ValueError on malformed cursor
+    """
+    try:
+        cursor_sort_key, sort_value, user_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        )
+        keyset = (datetime.fromisoformat(sort_value), int(user_id))
+    except (UnicodeError, ValueError) as exception:
+        raise ValueError(f'Invalid cursor: {cursor}') from exception
+
+    if cursor_sort_key != sort_key:
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+    return keyset
+
+
+def get_limit_argument():
+    """ Read `limit` query string argument, page size capped by
+        `USERS_PAGE_SIZE_MAX`
+
+        Raises: ValueError when argument is not a positive integer
+    """
+    limit = _get_int_argument('limit', default=current_app.config['USERS_PAGE_SIZE'], minimum=1)
+
+    return min(limit, current_app.config['USERS_PAGE_SIZE_MAX'])
+
+
+def _get_int_argument(name: str, default, minimum: int):
+    """ Read integer query string argument
+
+        Raises: ValueError when argument is not an integer or below minimum
+    """
+    value = request.args.get(name, None)
+
+    if value is None:
+        return default
+
+    try:
+        value = int(value)
+    except ValueError as exception:
+        raise ValueError(f'Query argument {name} must be an integer') from exception
+
+    if value < minimum:
+        raise ValueError(f'Query argument {name} must be at least {minimum}')
+
+    return value
+
+
+def validate_new_user(data):
+    """ Validate payload of a new user against the JSON Schema
+
+        :return: 400 response when payload is invalid, otherwise None
+    """
+    try:
+        with timed('validate'):
+            schema_registry.validate('user_create_schema', data)
+    except jsonschema.ValidationError as exception:
+        # Provide a custom user-friendly error message
+        error_message = f"Invalid data received. {str(exception)}"
+
+        return jsonify({'error': error_message}), 400
+
+    return None
+
+
+def validate_user_changes(user_id: int, data):
+    """ Validate payload of a user update against the JSON Schema
+
+        :return: 400 response when payload is invalid, otherwise None
+    """
+    current_app.logger.debug(f'Update of user {user_id} requested, fields: {sorted(data or {})}')
+
+    try:
+        with timed('validate'):
+            schema_registry.validate('user_update_schema', data)
+    except jsonschema.ValidationError as exception:
+        # Provide a custom user-friendly error message
+        error_message = f"Invalid data was received {str(exception)}"
+        current_app.logger.warning(
+            f'Invalid update of user {user_id}: {exception.validator} '
+            f'failed at {list(exception.absolute_path)}'
+        )
+
+        return jsonify({'error': error_message}), 400
+
+    return None
+
+
+def user_query(user_id: int, fields=None):
+    """ Build column-limited SELECT of a user: requested fields and the
+        fields ETag is derived from, all visible fields when fields is None.
+        No ORM entity is hydrated.
+    """
+    columns = user_serializer.columns(None if fields is None else fields | VERSION_FIELDS)
+
+    return sa.select(*columns).where(User._id == user_id) # pylint: disable=protected-access
+
+
+def user_row_response(user_id: int, row, fields=None):
+    """ Build response of a row selected by user_query, full
+        representations are cached
+    """
+    if row is None:
+        return jsonify({'error': f'User not found: id: {user_id}'}), 404
+
+    etag = user_etag(row.id, row.created_at, row.updated_at)
+
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    user_data = next(user_serializer.serialize_rows([row], fields))
+
+    if fields is None:
+        user_cache.set(user_id, {'etag': etag, 'user': user_data})
+
+    response = json_response(user_data)
+    response.set_etag(etag, weak=True)
+
+    return response
+
+
+def user_request(user_id: int):
+    """ Read sparse fieldset of user request, and answer the request when
+        user has not to be read from the database: with 400 on invalid
+        fieldset, or from cache
+
+        :return: sparse fieldset and the response, None when user has to
+                 be read from the database
+        :rtype: tuple
+    """
+    try:
+        fields = user_serializer.parse_fields(request.args.get('fields', None))
+    except ValueError as exception:
+        return None, (jsonify({'error': str(exception)}), 400)
+
+    cached = user_cache.get(user_id)
+
+    if cached is None:
+        return fields, None
+
+    if request.if_none_match.contains_weak(cached['etag']):
+        return fields, _not_modified(cached['etag'])
+
+    response = json_response(_select_fields(cached['user'], fields))
+    response.set_etag(cached['etag'], weak=True)
+
+    return fields, response
+
+
+def deleted_user_response(user_id: int, deleted_id):
+    """ Build response of an id returned by delete_user_statement """
+    if deleted_id is None:
+        return jsonify({'error': f'User not found: id: {user_id}'}), 404
+
+    user_cache.invalidate(user_id)
+    publish_user_event('user.deleted', user_id)
+
+    return jsonify({'message' : f'User {user_id} deleted'}), 202
+
+
+def consent_revoked_response(user_id: int):
+    """ Build response of a user deleted on consent revocation, once
+        committed
+    """
+    user_cache.invalidate(user_id)
+    publish_user_event('user.consent_revoked', user_id)
+
+    return jsonify({'message' : f'User {user_id} deleted'}), 202
+
+
+def publish_user_event(event_type: str, user_id: int, user_data=None):
+    """ Publish user mutation event to /users/events subscribers """
+    event_broker.publish(event_type, _user_event_data(user_id, user_data))
+
+
+def outbox_statement(event_type: str, user_id: int, user_data=None):
+    """ INSERT of outbox message of a user change, executed in the
+        transaction making the change
+    """
+    return OutboxMessage.insert_statement(event_type, [_user_event_data(user_id, user_data)])
+
+
+def removed_user_statements(user_ids, reason: str = UserTombstone.REASON_DELETED):
+    """ INSERTs of tombstones and outbox messages of deleted users,
+        executed in the deleting transaction
+    """
+    return (
+        UserTombstone.insert_statement(user_ids, reason),
+        OutboxMessage.insert_statement(
+            REMOVAL_EVENTS[reason], [_user_event_data(user_id) for user_id in user_ids]
+        ),
+    )
+
+
+def _user_event_data(user_id: int, user_data=None):
+    """ Payload of user mutation event, with user representation when it
+        is at hand
+    """
+    data = {'id': user_id}
+
+    if user_data is not None:
+        data['user'] = user_data
+
+    return data
+
+
+def delete_user_statement(user_id: int):
+    """ DELETE of a user, returning its id when it existed """
+    table = User.__table__
+
+    return sa.delete(table).where(table.c.id == user_id).returning(table.c.id)
+
+
+def update_user_statement(user_id: int, data: dict):
+    """ Single UPDATE ... RETURNING statement of the supplied fields, or None
+        when the update needs a loaded user: password change (hashing) or
+        consent revocation (deletion). With `If-Match`, only a user still
+        matching one of the ETags is updated.
+    """
+    try:
+        values = User.changed_record_values(data)
+    except ValueError:
+        return None
+
+    table = User.__table__
+    statement = sa.update(table).where(table.c.id == user_id)
+    condition = _if_match_condition(user_id)
+
+    if condition is not None:
+        statement = statement.where(condition)
+
+    return statement.values(values).returning(*user_serializer.columns())
+
+
+def if_match_guard_statement(user_id: int):
+    """ No-op UPDATE of a user still matching one of the `If-Match` ETags,
+        None without precondition. Run before user is loaded, it locks the
+        row, so an amendment made meanwhile either fails the guard or
+        waits for the amendment guarded.
+    """
+    condition = _if_match_condition(user_id)
+
+    if condition is None:
+        return None
+
+    table = User.__table__
+
+    return sa.update(table).where(table.c.id == user_id, condition).values(
+        updated_at=table.c.updated_at
+    )
+
+
+def _if_match_condition(user_id: int):
+    """ Condition of the `If-Match` precondition, None without one """
+    if not request.if_match:
+        return None
+
+    return user_version_condition(User, user_id, request.if_match)
+
+
+def user_id_query(user_id: int):
+    """ SELECT of the id of a user, telling whether user exists """
+    return sa.select(User._id).where(User._id == user_id) # pylint: disable=protected-access
+
+
+def unmatched_user_response(user_id: int, user_exists: bool):
+    """ Build response of an update matching no user: 412 when user exists
+        but no longer matches `If-Match`, 404 otherwise
+    """
+    if user_exists:
+        return jsonify({'error': f'User was modified: id: {user_id}'}), 412
+
+    return jsonify({'error': f'User not found: id: {user_id}'}), 404
+
+
+def updated_user_data(row):
+    """ Representation of a row returned by update_user_statement, None
+        when user was not found
+    """
+    return None if row is None else next(user_serializer.serialize_rows([row]))
+
+
+def updated_user_response(user_id: int, row, user_data):
+    """ Build response of a row returned by update_user_statement and its
+        representation
+    """
+    if row is None:
+        return jsonify({'error': f'User not found: id: {user_id}'}), 404
+
+    user_cache.invalidate(user_id)
+
+    publish_user_event('user.updated', user_id, user_data)
+
+    response = json_response(user_data)
+    response.set_etag(user_etag(row.id, row.created_at, row.updated_at), weak=True)
+
+    return response
+
+
+def amended_user_response(user: User, user_data):
+    """ Build response of a user amended through setters and its
+        representation, once committed
+    """
+    user_cache.invalidate(user.id)
+
+    publish_user_event('user.updated', user.id, user_data)
+
+    response = json_response(user_data)
+    response.set_etag(user_entity_etag(user), weak=True)
+
+    return response
+
+
+def apply_changes(user: User, data: dict):
+    """ Amend loaded user through setters of the supplied fields. Setters
+        hash passwords and raise UserConsentRevoked.
+    """
+    for name in UPDATABLE_FIELDS:
+        if name in data:
+            setattr(user, name, data[name])
+
+    if data.get("email_confirmed", None) is True:
+        user.set_email_verified()
@@ -1,41 +1,110 @@
 """ Users entity RESTfull controller handling JSON requests/responses """
 
-import os
-import json
-import jsonschema
-
-
 from flask import Blueprint, jsonify, current_app, request
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
 from project import db
+from project.http.user_requests import (
+    user_serializer,
+    amended_user_response, apply_changes, collection_page_response, collection_request,
+    consent_revoked_response, delete_user_statement, deleted_user_response,
+    if_match_guard_statement, outbox_statement, publish_user_event, removed_user_statements,
+    unmatched_user_response, update_user_statement, updated_user_data, updated_user_response,
+    user_batch_queries, user_batch_request, user_batch_response,
+    user_collection_query, user_entity_etag, user_id_query, user_query, user_request,
+    user_row_response, validate_new_user, validate_user_changes
+)
 from project.models.user import User
+from project.models.user_tombstone import UserTombstone
+from project.services.etags import collection_etag, collection_version_query
+from project.services.instrumentation import timed
+from project.services.serialization import json_response
+from project.exceptions.password_hasher_saturated import PasswordHasherSaturated
 from project.exceptions.user_consent_revoked import UserConsentRevoked
 
 controller_blueprint = Blueprint('user_resources', __name__)
 
-# Get the current script's directory path
-current_directory = os.path.dirname(os.path.abspath(__file__))
-
 
 @controller_blueprint.route('/users', methods=['GET'])
 def get_user_collection():
-    """ Handle GET request to get user entity collection """
+    """ Handle GET request to get user entity collection
+
+        Collection is paginated by keyset on user id: `limit` caps the page
+        size and `after` is the last id seen by the client. When more users
+        are available, link to the next page is sent in the `Link` header.
+        Collection sorted by another key is paginated by opaque `cursor`
+        of the next page link instead, holding sort key and id of the last
+        user seen.
+
+        `stream=json` or `stream=ndjson` streams the whole collection instead,
+        reading it from a server-side cursor in chunks.
+
+        `fields=id,email` picks fields of every item (sparse fieldset),
+        only those columns are selected from the database.
+
+        `email=` looks user up by email, case-insensitive. `verified=false`
+        lists users whose email is not verified (`true` verified ones).
+        `sort=-created_at` orders by creation, newest first; sort keys are
+        `id` (default) and `created_at`, descending with `-` prefix. Every
+        combination of filters and sort key is read in order from an index,
+        the verified filters from partial indexes of their rows, so neither
+        a temporary sort nor a scan of other users is needed.
+
+        Response carries weak ETag of the collection version, matching
+        `If-None-Match` is answered with 304 before any user is read.
+
+        `ids=1,2,3` looks listed users up instead, see get_user_batch.
+    """
+
+    if 'ids' in request.args:
+        return _get_user_batch()
+
+    with timed('select'):
+        version = db.session.execute(collection_version_query(User, UserTombstone)).one()
+    etag = collection_etag(version, request.query_string.decode('utf-8'))
+
+    arguments, response = collection_request(etag)
+
+    if response is not None:
+        return response
 
-    current_app.logger.info('Fetching user collection from the database.')
+    query = user_collection_query(arguments, db.engine.dialect.name)
 
-    # Query the database to get the collection of MyModule objects
-    user_collection = User.query.all()
+    # One extra row tells whether there is a next page
+    with timed('select'):
+        rows = db.session.execute(query.limit(arguments.limit + 1)).all()
 
-    # Convert the collection of MyModule objects into a list of dictionaries
-    my_module_list = [
-        {'id': item.id, 'name': item.name, 'email': item.email}
-        for item in user_collection
-    ]
+    return collection_page_response(rows, arguments, etag)
 
-    # Return the list of dictionaries as a JSON response
-    return jsonify(my_module_list)
+
+@controller_blueprint.route('/users/batch', methods=['POST'])
+def get_user_batch():
+    """ Handle POST request to look many users up by id, for lists too
+        long for `GET /users?ids=`. Payload is `{"ids": [1, 2, 3]}`.
+
+        Users are read from cache first, the rest by IN queries of up to
+        `USERS_BATCH_CHUNK_SIZE` ids. Response lists users in the order
+        of requested ids, with a not found marker for missing ones.
+        `fields=id,email` picks fields of every user.
+    """
+    return _get_user_batch()
+
+
+def _get_user_batch():
+    """ Answer batch lookup, from query string or from payload """
+    batch, response = user_batch_request()
+
+    if response is not None:
+        return response
+
+    rows = []
+
+    for query in user_batch_queries(batch):
+        with timed('select'):
+            rows += db.session.execute(query).all()
+
+    return user_batch_response(batch, rows)
 
 
 @controller_blueprint.route('/users', methods=['POST'])
@@ -45,21 +114,10 @@ def create_user():
     # Get the data from the POST request JSON payload
     data = request.get_json()
 
-    # Construct the full path to user_schema.json
-    schema_file_path = os.path.join(current_directory, 'user_create_schema.json')
-
-    # Load the JSON Schema from the file
-    with open(schema_file_path, mode='r', encoding='utf-8') as schema_file:
-        user_create_schema = json.load(schema_file)
+    invalid_data_response = validate_new_user(data)
 
-    # Validate the data against the JSON Schema
-    try:
-        jsonschema.validate(data, user_create_schema)
-    except jsonschema.ValidationError as exception:
-        # Provide a custom user-friendly error message
-        error_message = f"Invalid data received. {str(exception)}"
-
-        return jsonify({'error': error_message}), 400
+    if invalid_data_response is not None:
+        return invalid_data_response
 
     try:
         new_user = User(
@@ -73,10 +131,19 @@ def create_user():
         new_user.memo = data.get("memo", None)
 
         db.session.add(new_user)
-        db.session.commit()
+        with timed('commit'):
+            db.session.flush()
+            user_data = user_serializer.serialize(new_user)
+            db.session.execute(outbox_statement('user.created', new_user.id, user_data))
+            db.session.commit()
         current_app.logger.info('User entity created successfully.')
 
-        return jsonify(new_user.to_dict()), 201
+        publish_user_event('user.created', new_user.id, user_data)
+
+        response = json_response(user_data, 201)
+        response.set_etag(user_entity_etag(new_user), weak=True)
+
+        return response
 
     except IntegrityError as exception:
         db.session.rollback()
@@ -87,32 +154,41 @@ def create_user():
 
 @controller_blueprint.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id : int):
-    """ Handle GET request to get already existing user entity """
-    try:
-        user = User.query.filter_by(_id=user_id).one()
+    """ Handle GET request to get already existing user entity
 
-        return jsonify(user.to_dict()), 200
+        Response carries weak ETag of the user version. `If-None-Match`
+        is checked against cached version, or against record timestamps,
+        and answered with 304.
 
-    except NoResultFound:
+        `fields=id,email` picks fields of the response (sparse fieldset),
+        only those columns are selected from the database.
+    """
+    fields, response = user_request(user_id)
 
-        return jsonify({'error': f'User not found: id: {user_id}'}), 404
+    if response is not None:
+        return response
+
+    with timed('select'):
+        row = db.session.execute(user_query(user_id, fields)).one_or_none()
+
+    return user_row_response(user_id, row, fields)
 
 
 @controller_blueprint.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id : int):
-    """ Handle DELETE request to delete already existing user entity """
+    """ Handle DELETE request to delete already existing user entity, with
+        a single DELETE ... RETURNING statement, leaving a tombstone
+    """
 
     try:
-        user = User.query.filter_by(_id=user_id).one()
-         # Delete the user from the database
-        db.session.delete(user)
-        db.session.commit()
+        with timed('commit'):
+            deleted_id = db.session.execute(delete_user_statement(user_id)).scalar_one_or_none()
 
-        return jsonify({'message' : f'User {user_id} deleted'}), 202
+            if deleted_id is not None:
+                for statement in removed_user_statements([deleted_id]):
+                    db.session.execute(statement)
 
-    except NoResultFound:
-
-        return jsonify({'error': f'User not found: id: {id}'}), 404
+            db.session.commit()
 
     except Exception as exception: # pylint: disable=broad-except
         #@ToDo - find ways to test this exception
@@ -120,64 +196,96 @@ def delete_user(user_id : int):
 
         db.session.rollback()
 
-        return jsonify({'error': f'Error occurred while deleting user: {id}'}), 400
+        return jsonify({'error': f'Error occurred while deleting user: {user_id}'}), 400
+
+    return deleted_user_response(user_id, deleted_id)
 
 
 @controller_blueprint.route('/users/<int:user_id>', methods=['PUT', 'PATCH'])
-def update_user(user_id : int):
-    """ Handle PUT/PATH request to amend already existing user entity """
+def update_user(user_id : int): # pylint: disable=too-many-return-statements
+    """ Handle PUT/PATH request to amend already existing user entity
+
+        Only supplied fields are amended. Unless password or consent is
+        changed, the update is a single UPDATE ... RETURNING statement,
+        otherwise user is loaded and amended through its setters.
+
+        With `If-Match` header, user is amended only while its ETag still
+        matches, otherwise 412 is returned (optimistic concurrency). The
+        version seen is part of the WHERE clause of the UPDATE, so the
+        check and the amendment are atomic. ETags are weak, and compared
+        weakly, see user_version_condition.
+    """
 
     # Get the data from the POST request JSON payload
     data = request.get_json()
 
-    current_app.logger.error(f'Data received: {data}')
+    invalid_data_response = validate_user_changes(user_id, data)
 
+    if invalid_data_response is not None:
+        return invalid_data_response
 
-    # Construct the full path to user_schema.json
-    schema_file_path = os.path.join(current_directory, 'user_update_schema.json')
+    try:
+        statement = update_user_statement(user_id, data)
 
-    # Load the JSON Schema from the file
-    with open(schema_file_path, mode='r', encoding='utf-8') as schema_file:
-        user_create_schema = json.load(schema_file)
+        if statement is not None:
+            with timed('commit'):
+                row = db.session.execute(statement).one_or_none()
+                user_data = updated_user_data(row)
 
-    # Validate the data against the JSON Schema
-    try:
-        jsonschema.validate(data, user_create_schema)
-    except jsonschema.ValidationError as exception:
-        # Provide a custom user-friendly error message
-        error_message = f"Invalid data was received {str(exception)}"
-        current_app.logger.error(f'Error while User updating: {error_message}')
+                if row is not None:
+                    db.session.execute(outbox_statement('user.updated', user_id, user_data))
 
-        return jsonify({'error': error_message}), 400
+                db.session.commit()
 
-    try:
-        user = User.query.filter_by(_id=user_id).one()
+            if row is None and request.if_match:
+                user_exists = db.session.execute(user_id_query(user_id)).first() is not None
+
+                return unmatched_user_response(user_id, user_exists)
+
+            return updated_user_response(user_id, row, user_data)
+
+        guard = if_match_guard_statement(user_id)
+
+        with timed('select'):
+            if guard is not None and db.session.execute(guard).rowcount == 0:
+                user_exists = db.session.execute(user_id_query(user_id)).first() is not None
+                db.session.rollback()
 
-        user.password = data.get("password", user.password)
-        user.remember_token = data.get("remember_token", user.remember_token)
-        user.email = data.get("email", user.email)
-        user.name = data.get("name", user.name)
-        user.memo = data.get("memo", user.memo)
-        user.consent = data.get("consent", user.consent) # this should trigger deletion
+                return unmatched_user_response(user_id, user_exists)
 
-        if data.get("email_confirmed", None) is True:
-            user.set_email_verified()
+            user = User.query.filter_by(_id=user_id).one()
 
-        db.session.commit()
+        apply_changes(user, data)
 
-        return jsonify(user.to_dict()), 200
+        with timed('commit'):
+            db.session.flush()
+            user_data = user_serializer.serialize(user)
+            db.session.execute(outbox_statement('user.updated', user_id, user_data))
+            db.session.commit()
+
+        return amended_user_response(user, user_data)
 
     except UserConsentRevoked:
 
         db.session.delete(user)
-        db.session.commit()
 
-        return jsonify({'message' : f'User {user_id} deleted'}), 202
+        for statement in removed_user_statements([user_id], UserTombstone.REASON_CONSENT_REVOKED):
+            db.session.execute(statement)
+
+        with timed('commit'):
+            db.session.commit()
+
+        return consent_revoked_response(user_id)
 
     except NoResultFound:
 
         return jsonify({'error': f'User not found: id: {user_id}'}), 404
 
+    except PasswordHasherSaturated:
+        db.session.rollback()
+
+        raise
+
     except Exception as exception: # pylint: disable=broad-except
         # @ToDo find a way to test this while functional testing
         db.session.rollback()
@@ -0,0 +1,281 @@
+""" Users entity RESTfull controller, async variant
+
+Serves the same routes as project.http.users with `async def` views on
+the async engine, when the controller is listed in `ASYNC_CONTROLLERS`.
+Validation, statements, status codes, ETags, cache and error messages are
+the same, both controllers share project.http.user_requests. Password
+hashing runs off the event loop, in a worker thread.
+
+Served by a WSGI server, every request still holds its worker thread
+while its view runs on the shared loop, so async views do not serve more
+concurrent requests than sync ones: database waits of requests overlap on
+one loop and one connection pool, the number of requests in flight is
+still the number of threads. See project.services.async_db.
+"""
+# Views mirror the sync controller line by line
+# pylint: disable=duplicate-code
+
+import asyncio
+
+import sqlalchemy as sa
+
+from flask import Blueprint, jsonify, current_app, request
+from sqlalchemy.exc import IntegrityError
+
+from project import async_db
+from project.http.user_requests import (
+    user_serializer,
+    amended_user_response, apply_changes, collection_page_response, collection_request,
+    consent_revoked_response, delete_user_statement, deleted_user_response,
+    if_match_guard_statement, outbox_statement, publish_user_event, removed_user_statements,
+    unmatched_user_response, update_user_statement, updated_user_data, updated_user_response,
+    user_batch_queries, user_batch_request, user_batch_response,
+    user_collection_query, user_id_query, user_query, user_request, user_row_response,
+    validate_new_user, validate_user_changes
+)
+from project.models.user import User
+from project.models.user_tombstone import UserTombstone
+from project.services.etags import collection_etag, collection_version_query, user_etag
+from project.services.instrumentation import timed
+from project.services.serialization import json_response
+from project.exceptions.password_hasher_saturated import PasswordHasherSaturated
+from project.exceptions.user_consent_revoked import UserConsentRevoked
+
+# Same blueprint name as the sync controller, endpoints stay the same
+controller_blueprint = Blueprint('user_resources', __name__)
+
+@controller_blueprint.route('/users', methods=['GET'])
+async def get_user_collection():
+    """ Handle GET request to get user entity collection, see
+        project.http.users.get_user_collection
+    """
+
+    if 'ids' in request.args:
+        return await _get_user_batch()
+
+    async with async_db.session() as session:
+        with timed('select'):
+            version = (
+                await session.execute(collection_version_query(User, UserTombstone))
+            ).one()
+        etag = collection_etag(version, request.query_string.decode('utf-8'))
+
+        # Streamed collection is read by the request thread, through the sync session
+        arguments, response = collection_request(etag)
+
+        if response is not None:
+            return response
+
+        query = user_collection_query(arguments, async_db.engine.dialect.name)
+
+        # One extra row tells whether there is a next page
+        with timed('select'):
+            rows = (await session.execute(query.limit(arguments.limit + 1))).all()
+
+    return collection_page_response(rows, arguments, etag)
+
+
+@controller_blueprint.route('/users/batch', methods=['POST'])
+async def get_user_batch():
+    """ Handle POST request to look many users up by id, see
+        project.http.users.get_user_batch
+    """
+    return await _get_user_batch()
+
+
+async def _get_user_batch():
+    """ Answer batch lookup, from query string or from payload """
+    batch, response = user_batch_request()
+
+    if response is not None:
+        return response
+
+    rows = []
+
+    async with async_db.session() as session:
+        for query in user_batch_queries(batch):
+            with timed('select'):
+                rows += (await session.execute(query)).all()
+
+    return user_batch_response(batch, rows)
+
+
+@controller_blueprint.route('/users', methods=['POST'])
+async def create_user():
+    """ Handle POST request to create a new user entity """
+
+    data = request.get_json()
+    invalid_data_response = validate_new_user(data)
+
+    if invalid_data_response is not None:
+        return invalid_data_response
+
+    values = await asyncio.to_thread(
+        User.new_record_values,
+        data.get("email", None),
+        data.get("password", None),
+        data.get("consent", None),
+        data.get("name", None),
+        remember_token=data.get("remember_token", None),
+        memo=data.get("memo", None)
+    )
+
+    async with async_db.session() as session:
+        try:
+            with timed('commit'):
+                row = (await session.execute(
+                    sa.insert(User.__table__).values(values).returning(*user_serializer.columns())
+                )).one()
+                user_data = next(user_serializer.serialize_rows([row]))
+                await session.execute(outbox_statement('user.created', row.id, user_data))
+                await session.commit()
+        except IntegrityError as exception:
+            await session.rollback()
+            current_app.logger.error(f'Error creating User entity: {type(exception)}')
+
+            return jsonify({'error': 'Error creating User entity.'}), 400
+
+    current_app.logger.info('User entity created successfully.')
+
+    publish_user_event('user.created', row.id, user_data)
+
+    response = json_response(user_data, 201)
+    response.set_etag(user_etag(row.id, row.created_at, row.updated_at), weak=True)
+
+    return response
+
+
+@controller_blueprint.route('/users/<int:user_id>', methods=['GET'])
+async def get_user(user_id : int):
+    """ Handle GET request to get already existing user entity, see
+        project.http.users.get_user
+    """
+    fields, response = user_request(user_id)
+
+    if response is not None:
+        return response
+
+    async with async_db.session() as session:
+        with timed('select'):
+            row = (await session.execute(user_query(user_id, fields))).one_or_none()
+
+    return user_row_response(user_id, row, fields)
+
+
+@controller_blueprint.route('/users/<int:user_id>', methods=['DELETE'])
+async def delete_user(user_id : int):
+    """ Handle DELETE request to delete already existing user entity, see
+        project.http.users.delete_user
+    """
+
+    async with async_db.session() as session:
+        try:
+            with timed('commit'):
+                deleted_id = (
+                    await session.execute(delete_user_statement(user_id))
+                ).scalar_one_or_none()
+
+                if deleted_id is not None:
+                    for statement in removed_user_statements([deleted_id]):
+                        await session.execute(statement)
+
+                await session.commit()
+        except Exception as exception: # pylint: disable=broad-except
+            current_app.logger.error(f'Error while User deleting : {str(exception)}')
+            await session.rollback()
+
+            return jsonify({'error': f'Error occurred while deleting user: {user_id}'}), 400
+
+    return deleted_user_response(user_id, deleted_id)
+
+
+@controller_blueprint.route('/users/<int:user_id>', methods=['PUT', 'PATCH'])
+async def update_user(user_id : int): # pylint: disable=too-many-return-statements
+    """ Handle PUT/PATH request to amend already existing user entity, see
+        project.http.users.update_user. Setters run in a worker thread, off
+        the event loop, as they hash passwords.
+    """
+
+    data = request.get_json()
+    invalid_data_response = validate_user_changes(user_id, data)
+
+    if invalid_data_response is not None:
+        return invalid_data_response
+
+    statement = update_user_statement(user_id, data)
+
+    if statement is not None:
+        async with async_db.session() as session:
+            try:
+                with timed('commit'):
+                    row = (await session.execute(statement)).one_or_none()
+                    user_data = updated_user_data(row)
+
+                    if row is not None:
+                        await session.execute(
+                            outbox_statement('user.updated', user_id, user_data)
+                        )
+
+                    await session.commit()
+            except Exception as exception: # pylint: disable=broad-except
+                await session.rollback()
+                current_app.logger.error(f'Error while User updating : {str(exception)}')
+
+                return jsonify({'error': "Something went wrong"}), 400
+
+            if row is None and request.if_match:
+                user_exists = (await session.execute(user_id_query(user_id))).first() is not None
+
+                return unmatched_user_response(user_id, user_exists)
+
+        return updated_user_response(user_id, row, user_data)
+
+    guard = if_match_guard_statement(user_id)
+
+    async with async_db.session() as session:
+        with timed('select'):
+            if guard is not None and (await session.execute(guard)).rowcount == 0:
+                user_exists = (await session.execute(user_id_query(user_id))).first() is not None
+                await session.rollback()
+
+                return unmatched_user_response(user_id, user_exists)
+
+            user = await session.get(User, user_id)
+
+        if user is None:
+            return jsonify({'error': f'User not found: id: {user_id}'}), 404
+
+        try:
+            await asyncio.to_thread(apply_changes, user, data)
+
+            with timed('commit'):
+                await session.flush()
+                user_data = user_serializer.serialize(user)
+                await session.execute(outbox_statement('user.updated', user_id, user_data))
+                await session.commit()
+
+        except UserConsentRevoked:
+            await session.delete(user)
+
+            for statement in removed_user_statements(
+                [user_id], UserTombstone.REASON_CONSENT_REVOKED
+            ):
+                await session.execute(statement)
+
+            with timed('commit'):
+                await session.commit()
+
+            return consent_revoked_response(user_id)
+
+        except PasswordHasherSaturated:
+            await session.rollback()
+
+            raise
+
+        except Exception as exception: # pylint: disable=broad-except
+            await session.rollback()
+            current_app.logger.error(f'Error while User updating : {str(exception)}')
+
+            return jsonify({'error': "Something went wrong"}), 400
+
+    return amended_user_response(user, user_data)
@@ -0,0 +1,362 @@
+""" Users entity bulk import and deletion controller handling JSON/NDJSON requests """
+
+import json
+from datetime import datetime
+
+import jsonschema
+
+import sqlalchemy as sa
+from flask import Blueprint, Response, jsonify, current_app, request, stream_with_context
+from sqlalchemy.exc import IntegrityError
+
+from project import db, event_broker, schema_registry, user_cache
+from project.exceptions.password_hasher_saturated import PasswordHasherSaturated
+from project.http.user_requests import REMOVAL_EVENTS, removed_user_statements
+from project.models.outbox_message import OutboxMessage
+from project.models.user import User
+from project.models.user_tombstone import UserTombstone
+from project.services.batching import chunked
+from project.services.instrumentation import timed
+
+controller_blueprint = Blueprint('user_bulk_resources', __name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Tombstone reasons of bulk deletion actions
+DELETE_REASONS = {
+    'delete': UserTombstone.REASON_DELETED,
+    'revoke_consent': UserTombstone.REASON_CONSENT_REVOKED,
+}
+
+
+@controller_blueprint.route('/users/bulk', methods=['POST'])
+def create_user_collection():
+    """ Handle POST request to create many user entities at once
+
+        Payload is a JSON array of user entities, or NDJSON stream with
+        one user entity per line. Every item is validated against the user
+        create schema, valid items are inserted `USERS_BULK_BATCH_SIZE` at
+        a time. Result is reported per item, so invalid or duplicate user
+        does not prevent other users from being created.
+    """
+
+    if request.mimetype == NDJSON_MIMETYPE:
+        items = _read_ndjson_items()
+    else:
+        data = request.get_json(silent=True)
+
+        if not isinstance(data, list):
+            return jsonify({'error': 'Invalid data received. JSON array expected.'}), 400
+
+        items = ((item, None) for item in data)
+
+    batch_size = current_app.config['USERS_BULK_BATCH_SIZE']
+    results = []
+
+    for batch in chunked(enumerate(items), batch_size):
+        results += _import_batch(batch)
+
+    created = 0
+
+    for result in results:
+        if result['status'] == 201:
+            event_broker.publish('user.created', {'id': result['id']})
+            created += 1
+
+    current_app.logger.info(f'Bulk import: {created} of {len(results)} users created.')
+
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results,
+    }), 200
+
+
+def _read_ndjson_items():
+    """ Yield (data, error) pair for every non empty line of request body """
+    for line in request.stream:
+        if not line.strip():
+            continue
+
+        try:
+            yield json.loads(line), None
+        except ValueError:
+            yield None, 'Invalid data received. Malformed JSON line.'
+
+
+def _import_batch(batch):
+    """ Validate and insert batch of (index, (data, error)) items
+
+        :return: per item results, in the order of the batch
+        :rtype: list
+    """
+    results = {}
+    records = []
+
+    for index, (data, error) in batch:
+        if error is None:
+            try:
+                with timed('validate'):
+                    schema_registry.validate('user_create_schema', data)
+            except jsonschema.ValidationError as exception:
+                error = f'Invalid data received. {exception.message}'
+
+        if error is not None:
+            results[index] = {'index': index, 'status': 400, 'error': error}
+            continue
+
+        try:
+            records.append((index, User.new_record_values(
+                email=data.get('email', None),
+                password=data.get('password', None),
+                consent=data.get('consent', None),
+                name=data.get('name', None),
+                remember_token=data.get('remember_token', None),
+                memo=data.get('memo', None)
+            )))
+        except PasswordHasherSaturated as exception:
+            results[index] = {'index': index, 'status': 503, 'error': exception.message}
+
+    if records:
+        results.update(_insert_records(records))
+
+    return [results[index] for index, _ in batch]
+
+
+def _insert_records(records):
+    """ Insert (index, values) records with a single multi-row INSERT,
+        and their outbox messages
+
+        When any record violates a constraint, batch is rolled back and
+        records are inserted one by one, so only offending records fail.
+
+        :return: index to result mapping
+        :rtype: dict
+    """
+    table = User.__table__
+    statement = sa.insert(table).returning(table.c.id, sort_by_parameter_order=True)
+
+    try:
+        with timed('insert'):
+            user_ids = db.session.execute(
+                statement,
+                [values for _, values in records]
+            ).scalars().all()
+            db.session.execute(_created_users_statement(user_ids))
+            db.session.commit()
+
+        return {
+            index: {'index': index, 'status': 201, 'id': user_id}
+            for (index, _), user_id in zip(records, user_ids)
+        }
+
+    except IntegrityError:
+        db.session.rollback()
+
+    results = {}
+    statement = sa.insert(table).returning(table.c.id)
+
+    for index, values in records:
+        try:
+            user_id = db.session.execute(statement, values).scalar_one()
+            db.session.execute(_created_users_statement([user_id]))
+            db.session.commit()
+
+            results[index] = {'index': index, 'status': 201, 'id': user_id}
+
+        except IntegrityError as exception:
+            db.session.rollback()
+            current_app.logger.error(f'Error creating User entity: {type(exception)}')
+
+            results[index] = {'index': index, 'status': 400, 'error': 'Error creating User entity.'}
+
+    return results
+
+
+def _created_users_statement(user_ids):
+    """ INSERT of outbox messages of created users """
+    return OutboxMessage.insert_statement('user.created', [{'id': user_id} for user_id in user_ids])
+
+
+@controller_blueprint.route('/users/bulk/delete', methods=['POST'], defaults={'action': 'delete'})
+@controller_blueprint.route(
+    '/users/bulk/revoke-consent', methods=['POST'], defaults={'action': 'revoke_consent'}
+)
+def delete_user_collection(action: str):
+    """ Handle POST request to delete many user entities at once, or to
+        revoke their consent, which deletes them as well
+
+        Payload lists up to `USERS_BULK_MAX_IDS` user `ids`, or a `filter`
+        of users by `email`, `verified` and `created_before`. Users are
+        deleted by set-based DELETE statements of up to
+        `USERS_BULK_BATCH_SIZE` users, each committed on its own, and
+        dropped from the user cache, leaving the same state as revoking
+        consent of every user one by one. Filtered users are deleted only
+        while they still match the filter.
+
+        With `dry_run`, matching users are only counted. When NDJSON is
+        accepted, progress of every batch is streamed as a line, followed
+        by the summary line. The stream only reports progress: when client
+        disconnects, remaining batches are still deleted before the
+        response is closed.
+    """
+
+    data = request.get_json(silent=True)
+
+    try:
+        with timed('validate'):
+            schema_registry.validate('user_bulk_delete_schema', data)
+
+        max_ids = current_app.config['USERS_BULK_MAX_IDS']
+
+        if len(data.get('ids', ())) > max_ids:
+            raise ValueError(f'At most {max_ids} user ids can be deleted at once')
+
+        condition = _bulk_delete_condition(data)
+    except jsonschema.ValidationError as exception:
+        return jsonify({'error': f'Invalid data received. {exception.message}'}), 400
+    except ValueError as exception:
+        return jsonify({'error': f'Invalid data received. {str(exception)}'}), 400
+
+    ids = list(dict.fromkeys(data['ids'])) if 'ids' in data else None
+
+    with timed('select'):
+        matched_ids = _matching_ids(condition, ids)
+
+    summary = {
+        'action': action,
+        'dry_run': data.get('dry_run', False),
+        'matched': len(matched_ids),
+        'deleted': 0,
+    }
+
+    if ids is not None:
+        summary['not_found'] = sorted(set(ids) - set(matched_ids))
+
+    if summary['dry_run']:
+        return jsonify(summary), 200
+
+    progress = _delete_batches(action, summary, matched_ids, condition)
+
+    accepted = request.accept_mimetypes.best_match(('application/json', NDJSON_MIMETYPE))
+
+    if accepted != NDJSON_MIMETYPE:
+        for _ in progress:
+            pass
+
+        return jsonify(summary), 200
+
+    def generate():
+        try:
+            for line in progress:
+                yield json.dumps(line) + '\n'
+
+            yield json.dumps(summary) + '\n'
+        finally:
+            # Closed early, deletion is finished all the same
+            for _ in progress:
+                pass
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def _bulk_delete_condition(data: dict):
+    """ Build WHERE clause of users matching bulk deletion filter, None
+        when users are listed by id
+
+        Raises: ValueError on malformed created_before
+    """
+    # pylint: disable=protected-access
+    if 'filter' not in data:
+        return None
+
+    user_filter = data['filter']
+    conditions = []
+
+    if 'email' in user_filter:
+        conditions.append(User.email_equals(user_filter['email'], db.engine.dialect.name))
+
+    if 'verified' in user_filter:
+        conditions.append(
+            User._email_verified_at.is_not(None) if user_filter['verified']
+            else User._email_verified_at.is_(None)
+        )
+
+    if 'created_before' in user_filter:
+        try:
+            created_before = User.stored_timestamp(
+                datetime.fromisoformat(user_filter['created_before'])
+            )
+        except ValueError as exception:
+            raise ValueError('created_before must be an ISO 8601 date-time') from exception
+
+        conditions.append(User._created_at < created_before)
+
+    return sa.and_(*conditions)
+
+
+def _matching_ids(condition, ids):
+    """ Select ids of users to delete: listed ones that exist, by IN queries
+        of up to `USERS_BULK_BATCH_SIZE` ids, or ones matching condition
+
+        :return: user ids, in id order for filtered users
+        :rtype: list
+    """
+    # pylint: disable=protected-access
+    if ids is None:
+        return db.session.execute(
+            sa.select(User._id).where(condition).order_by(User._id)
+        ).scalars().all()
+
+    matched_ids = []
+
+    for chunk in chunked(ids, current_app.config['USERS_BULK_BATCH_SIZE']):
+        matched_ids += db.session.execute(
+            sa.select(User._id).where(User._id.in_(chunk))
+        ).scalars().all()
+
+    return matched_ids
+
+
+def _delete_batches(action: str, summary: dict, user_ids, condition=None):
+    """ Delete users `USERS_BULK_BATCH_SIZE` at a time, one DELETE ...
+        RETURNING statement, tombstones and outbox INSERTs and commit per batch,
+        updating summary. With a filter condition, users which stopped
+        matching it since they were selected are kept.
+
+        :return: generator of progress of every batch
+    """
+    table = User.__table__
+    batch_size = current_app.config['USERS_BULK_BATCH_SIZE']
+
+    for batch, chunk in enumerate(chunked(user_ids, batch_size), start=1):
+        with timed('commit'):
+            statement = sa.delete(table).where(table.c.id.in_(chunk))
+
+            if condition is not None:
+                statement = statement.where(condition)
+
+            deleted_ids = db.session.execute(statement.returning(table.c.id)).scalars().all()
+
+            if deleted_ids:
+                for statement in removed_user_statements(deleted_ids, DELETE_REASONS[action]):
+                    db.session.execute(statement)
+
+            db.session.commit()
+
+        for user_id in deleted_ids:
+            user_cache.invalidate(user_id)
+            event_broker.publish(REMOVAL_EVENTS[DELETE_REASONS[action]], {'id': user_id})
+
+        summary['deleted'] += len(deleted_ids)
+        current_app.logger.info(
+            f'Bulk {action}: batch {batch}, {summary["deleted"]} of {summary["matched"]} '
+            'users deleted.'
+        )
+
+        yield {
+            'batch': batch,
+            'deleted': len(deleted_ids),
+            'total_deleted': summary['deleted'],
+            'matched': summary['matched'],
+        }
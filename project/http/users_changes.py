@@ -0,0 +1,173 @@
+""" Users change feed controller, reporting created, updated and deleted
+users since a resumable token
+"""
+
+import base64
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from flask import Blueprint, jsonify, current_app, request
+
+from project import db
+from project.http.user_requests import get_limit_argument, user_serializer
+from project.models.user import User
+from project.models.user_tombstone import UserTombstone
+from project.services.instrumentation import timed
+from project.services.serialization import datetime_formatter, json_response
+
+controller_blueprint = Blueprint('user_change_resources', __name__)
+
+# Kinds of changes, in their order among changes made at the same time
+UPSERT = 0
+DELETE = 1
+
+
+@controller_blueprint.route('/users/changes', methods=['GET'])
+def get_user_changes():
+    """ Handle GET request to get users changed since `since` token
+
+        Changes are ordered by when users were written: `upsert` carries
+        current representation of a created or updated user, `delete` the
+        id of a deleted user and the reason, read from tombstones. A user
+        updated many times is reported once, at its latest change.
+
+        Up to `limit` changes are returned with `next` token to pass as
+        `since` on the following request, also when no more changes are
+        available yet (`has_more` false). Without `since` the feed starts
+        from the beginning.
+
+        Changes younger than `USERS_CHANGES_SETTLE_SECONDS` are held back,
+        so writes committed late with an earlier timestamp are not skipped.
+        Both reads are keyset range scans of their indexes.
+    """
+
+    try:
+        position = _decode_token(request.args.get('since', None))
+        limit = get_limit_argument()
+    except ValueError as exception:
+        return jsonify({'error': str(exception)}), 400
+
+    horizon = datetime.now() - timedelta(seconds=current_app.config['USERS_CHANGES_SETTLE_SECONDS'])
+
+    # One extra change of each kind tells whether there are more changes
+    with timed('select'):
+        user_rows = db.session.execute(
+            _user_changes_query(position, horizon).limit(limit + 1)
+        ).all()
+        tombstone_rows = db.session.execute(
+            _tombstone_changes_query(position, horizon).limit(limit + 1)
+        ).all()
+
+    changes = sorted(
+        [(row.changed_at, UPSERT, row.id, row) for row in user_rows]
+        + [(row.deleted_at, DELETE, row.id, row) for row in tombstone_rows],
+        key=lambda change: change[:3]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    if changes:
+        position = changes[-1][:3]
+
+    return json_response({
+        'changes': _serialize_changes(changes),
+        'next': None if position is None else _encode_token(position),
+        'has_more': has_more,
+    })
+
+
+def _user_changes_query(position, horizon: datetime):
+    """ Build SELECT of users written after position, up to horizon """
+    # pylint: disable=protected-access
+    changed_at = User.changed_at()
+    query = sa.select(*user_serializer.columns(), changed_at.label('changed_at')).where(
+        changed_at <= horizon
+    )
+
+    if position is not None:
+        timestamp, kind, row_id = position
+
+        query = query.where(
+            sa.tuple_(changed_at, User._id) > sa.tuple_(timestamp, row_id) if kind == UPSERT
+            else changed_at > timestamp
+        )
+
+    return query.order_by(changed_at, User._id)
+
+
+def _tombstone_changes_query(position, horizon: datetime):
+    """ Build SELECT of tombstones written after position, up to horizon """
+    # pylint: disable=protected-access
+    query = sa.select(
+        UserTombstone._id.label('id'),
+        UserTombstone._user_id.label('user_id'),
+        UserTombstone._deleted_at.label('deleted_at'),
+        UserTombstone._reason.label('reason')
+    ).where(UserTombstone._deleted_at <= horizon)
+
+    if position is not None:
+        timestamp, kind, row_id = position
+
+        query = query.where(
+            sa.tuple_(UserTombstone._deleted_at, UserTombstone._id) > sa.tuple_(timestamp, row_id)
+            if kind == DELETE
+            else UserTombstone._deleted_at >= timestamp
+        )
+
+    return query.order_by(UserTombstone._deleted_at, UserTombstone._id)
+
+
+def _serialize_changes(changes):
+    """ Build representations of (timestamp, kind, id, row) changes """
+    format_datetime = datetime_formatter()
+    user_rows = [row for _, kind, _, row in changes if kind == UPSERT]
+    users = dict(zip(
+        (row.id for row in user_rows),
+        user_serializer.serialize_rows(user_rows)
+    ))
+    items = []
+
+    for timestamp, kind, _, row in changes:
+        if kind == UPSERT:
+            items.append({
+                'op': 'upsert',
+                'id': row.id,
+                'changed_at': format_datetime(timestamp),
+                'user': users[row.id],
+            })
+        else:
+            items.append({
+                'op': 'delete',
+                'id': row.user_id,
+                'changed_at': format_datetime(timestamp),
+                'reason': row.reason,
+            })
+
+    return items
+
+
+def _encode_token(position):
+    """ Encode (timestamp, kind, id) position of the feed as opaque token """
+    timestamp, kind, row_id = position
+
+    return base64.urlsafe_b64encode(f'{timestamp.isoformat()}|{kind}|{row_id}'.encode()).decode()
+
+
+def _decode_token(token: str):
+    """ Decode token of _encode_token, None when not given
+
+        Raises: ValueError on malformed token
+    """
+    if token is None:
+        return None
+
+    try:
+        timestamp, kind, row_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+        position = (datetime.fromisoformat(timestamp), int(kind), int(row_id))
+    except (UnicodeError, ValueError) as exception:
+        raise ValueError(f'Invalid change feed token: {token}') from exception
+
+    if position[1] not in (UPSERT, DELETE):
+        raise ValueError(f'Invalid change feed token: {token}')
+
+    return position
@@ -0,0 +1,89 @@
+""" Users mutation events controller, streaming server-sent events """
+
+from flask import Blueprint, Response, jsonify, current_app, request
+
+from project import event_broker
+from project.services.serialization import dumps
+
+controller_blueprint = Blueprint('user_event_resources', __name__)
+
+# Events published by users controllers
+USER_EVENTS = ('user.created', 'user.updated', 'user.deleted', 'user.consent_revoked')
+
+# Milliseconds clients wait before reconnecting a dropped stream
+RECONNECT_DELAY = 3000
+
+
+@controller_blueprint.route('/users/events', methods=['GET'])
+def get_user_events():
+    """ Handle GET request to stream user mutation events (text/event-stream)
+
+        Every event carries `id` of the user, created and updated ones
+        their representation as `user` when the controller had it at hand.
+        `types=user.deleted,user.consent_revoked` picks event types.
+
+        Events are queued per subscriber, see EventBroker. Comment line is
+        sent every `EVENTS_HEARTBEAT_SECONDS` without events, so idle
+        connections stay open. When the subscriber queue overflows with
+        `disconnect` policy, queued events are sent and `overflow` event
+        ends the stream; client should resync from /users/changes. Above
+        `EVENTS_MAX_SUBSCRIBERS` streams per worker, requests are rejected
+        with 503.
+    """
+
+    try:
+        types = _parse_types(request.args.get('types', None))
+    except ValueError as exception:
+        return jsonify({'error': str(exception)}), 400
+
+    subscription = event_broker.subscribe(types)
+
+    if subscription is None:
+        return jsonify({'error': 'Too many event subscribers, retry later'}), 503
+
+    response = Response(
+        _stream_events(subscription, current_app.config['EVENTS_HEARTBEAT_SECONDS']),
+        mimetype='text/event-stream'
+    )
+    response.call_on_close(lambda: event_broker.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    # Reverse proxies must pass events on as they come
+    response.headers['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+def _stream_events(subscription, heartbeat: float):
+    """ Yield server-sent events of the subscription, until it overflows
+        and queued events are sent
+    """
+    yield f'retry: {RECONNECT_DELAY}\n\n'
+
+    while True:
+        event = subscription.get(timeout=0 if subscription.overflowed else heartbeat)
+
+        if event is not None:
+            yield f'event: {event["type"]}\ndata: {dumps(event["data"]).decode("utf-8")}\n\n'
+        elif subscription.overflowed:
+            break
+        else:
+            yield ': keep-alive\n\n'
+
+    yield 'event: overflow\ndata: {}\n\n'
+
+
+def _parse_types(value: str):
+    """ Parse comma separated event types, None when not given
+
+        Raises: ValueError on unknown event type
+    """
+    if value is None:
+        return None
+
+    types = frozenset(name.strip() for name in value.split(',') if name.strip())
+    unknown = types.difference(USER_EVENTS)
+
+    if not types or unknown:
+        raise ValueError(f'Unknown event types: {", ".join(sorted(unknown))}')
+
+    return types
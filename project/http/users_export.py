@@ -0,0 +1,78 @@
+""" Users table export controller, streaming CSV, NDJSON or Parquet, and
+the `flask export_users` command
+"""
+
+from datetime import datetime
+
+import click
+from flask import Blueprint, Response, jsonify, current_app, request, stream_with_context
+
+from project import db
+from project.services.user_export import UserExport, user_serializer
+
+# Commands are registered at the top level of `flask` CLI
+controller_blueprint = Blueprint('user_export_resources', __name__, cli_group=None)
+
+
+@controller_blueprint.route('/users/export', methods=['GET'])
+def export_user_collection():
+    """ Handle GET request to export every user, see UserExport
+
+        `format=csv` (default), `ndjson` or `parquet` picks the encoding,
+        `fields=id,email` the exported columns. `since=` ISO 8601 datetime
+        exports only users written after it, in local time unless it has a
+        UTC offset; response `X-Export-Watermark` header is the value to
+        pass on the next export.
+    """
+
+    export_format = request.args.get('format', 'csv')
+    since = request.args.get('since', None)
+
+    try:
+        export = UserExport(
+            db.session,
+            export_format,
+            fields=user_serializer.parse_fields(request.args.get('fields', None)),
+            since=None if since is None else datetime.fromisoformat(since),
+            chunk_size=current_app.config['USERS_EXPORT_CHUNK_SIZE'],
+            settle_seconds=current_app.config['USERS_CHANGES_SETTLE_SECONDS']
+        )
+    except ValueError as exception:
+        return jsonify({'error': str(exception)}), 400
+
+    current_app.logger.info(f'Exporting users written since {since}.')
+
+    response = Response(stream_with_context(iter(export)), mimetype=export.mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=users.{export_format}'
+
+    if export.watermark is not None:
+        response.headers['X-Export-Watermark'] = export.watermark.isoformat()
+
+    return response
+
+
+@controller_blueprint.cli.command('export_users')
+@click.option('--format', 'export_format', default='csv', help='csv, ndjson or parquet.')
+@click.option('--output', default='-', help='File to write, standard output by default.')
+@click.option('--since', default=None, help='Export users written after ISO datetime.')
+@click.option('--fields', default=None, help='Comma separated fields to export.')
+def export_users(export_format, output, since, fields):
+    """Export users table, or users written since a watermark."""
+    try:
+        export = UserExport(
+            db.session,
+            export_format,
+            fields=user_serializer.parse_fields(fields),
+            since=None if since is None else datetime.fromisoformat(since),
+            chunk_size=current_app.config['USERS_EXPORT_CHUNK_SIZE'],
+            settle_seconds=current_app.config['USERS_CHANGES_SETTLE_SECONDS']
+        )
+    except ValueError as exception:
+        raise click.ClickException(str(exception)) from exception
+
+    with click.open_file(output, 'wb') as stream:
+        for data in export:
+            stream.write(data)
+
+    watermark = None if export.watermark is None else export.watermark.isoformat()
+    click.echo(f'Exported {export.rows} users, watermark: {watermark}', err=True)
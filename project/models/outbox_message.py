@@ -0,0 +1,104 @@
+"""
+    Outbox message DB entity
+"""
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import DateTime, Integer, String, Text
+from project import db
+
+from project.services.serialization import dumps
+
+
+class OutboxMessage(db.Model):
+    """
+    User change waiting to be delivered to downstream systems
+
+    The following attributes of a message are stored in this table:
+        * event_type - user.created, user.updated, user.deleted or
+                       user.consent_revoked
+        * payload - JSON encoded event data
+        * created_at - when the change was committed
+        * available_at - when message may be claimed by a dispatcher, NULL
+                         once delivery is given up
+        * attempts - number of delivery attempts
+        * last_error - error of the last failed attempt
+
+    Messages are written by the statement returned by insert_statement(),
+    in the transaction changing users, and deleted once delivered.
+    """
+
+    __tablename__ = 'outbox_messages'
+
+    _id             = db.Column('id', Integer(), primary_key=True, autoincrement=True)
+    _event_type     = db.Column('event_type', String(40), nullable=False)
+    _payload        = db.Column('payload', Text(), nullable=False)
+    _created_at     = db.Column('created_at', DateTime(), nullable=False)
+    _available_at   = db.Column('available_at', DateTime(), nullable=True)
+    _attempts       = db.Column('attempts', Integer(), nullable=False, default=0)
+    _last_error     = db.Column('last_error', Text(), nullable=True)
+
+    __table_args__ = (
+        # Claim order of dispatchers, parked messages are left out
+        db.Index('ix_outbox_messages_available_at_id', _available_at, _id),
+    )
+
+    @classmethod
+    def insert_statement(cls, event_type: str, payloads):
+        """Build multi-row INSERT of messages of user changes
+
+            :param event_type: event name, like user.created
+            :param payloads: JSON compatible event data of every change
+            :return: insert statement, None when there is no change
+        """
+        now = datetime.now()
+        values = [
+            {
+                'event_type': event_type,
+                'payload': dumps(payload).decode('utf-8'),
+                'created_at': now,
+                'available_at': now,
+                'attempts': 0,
+            }
+            for payload in payloads
+        ]
+
+        if not values:
+            return None
+
+        return sa.insert(cls.__table__).values(values)
+
+    @property
+    def event_type(self):
+        """
+            :return: event name
+            :rtype: str
+        """
+        return self._event_type
+
+    @property
+    def payload(self):
+        """
+            :return: JSON encoded event data
+            :rtype: str
+        """
+        return self._payload
+
+    @property
+    def attempts(self):
+        """
+            :return: number of delivery attempts
+            :rtype: int
+        """
+        return self._attempts
+
+    @property
+    def last_error(self):
+        """
+            :return: error of the last failed attempt
+            :rtype: str
+        """
+        return self._last_error
+
+    def __repr__(self):
+        return f'<OutboxMessage: {self._event_type} {self._id}>'
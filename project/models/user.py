@@ -3,12 +3,12 @@
 """
 from datetime import datetime
 
+import sqlalchemy as sa
 from sqlalchemy import DateTime, Integer, String, Boolean
-from sqlalchemy.orm import class_mapper
-from werkzeug.security import check_password_hash, generate_password_hash
-from project import db
+from project import db, password_hasher
 
 from project.exceptions.user_consent_revoked import UserConsentRevoked
+from project.services.serialization import serializer_for
 
 # pylint: disable=too-many-instance-attributes
 class User(db.Model):
@@ -40,6 +40,51 @@ class User(db.Model):
 
     _hidden_columns = ['password']
 
+    __table_args__ = (
+        # Case-insensitive email lookups, see email_equals(): lower(email)
+        # expression index, NOCASE collation being the SQLite native way.
+        # Followed by the keyset of either collection order
+        db.Index('ix_users_email_lower_id', sa.func.lower(_email), _id).ddl_if(
+            dialect='postgresql'
+        ),
+        db.Index(
+            'ix_users_email_lower_created_at_id', sa.func.lower(_email), _created_at, _id
+        ).ddl_if(dialect='postgresql'),
+        db.Index('ix_users_email_nocase_id', _email.collate('NOCASE'), _id).ddl_if(
+            dialect='sqlite'
+        ),
+        db.Index(
+            'ix_users_email_nocase_created_at_id', _email.collate('NOCASE'), _created_at, _id
+        ).ddl_if(dialect='sqlite'),
+        # Keyset of the collection ordered by creation, the primary key
+        # serving the order by id
+        db.Index('ix_users_created_at_id', _created_at, _id),
+        # Keysets of either collection order of unverified and of verified
+        # users, partial indexes of the rows of either filter
+        db.Index(
+            'ix_users_unverified_id', _id,
+            sqlite_where=_email_verified_at.is_(None),
+            postgresql_where=_email_verified_at.is_(None)
+        ),
+        db.Index(
+            'ix_users_unverified_created_at_id', _created_at, _id,
+            sqlite_where=_email_verified_at.is_(None),
+            postgresql_where=_email_verified_at.is_(None)
+        ),
+        db.Index(
+            'ix_users_verified_id', _id,
+            sqlite_where=_email_verified_at.is_not(None),
+            postgresql_where=_email_verified_at.is_not(None)
+        ),
+        db.Index(
+            'ix_users_verified_created_at_id', _created_at, _id,
+            sqlite_where=_email_verified_at.is_not(None),
+            postgresql_where=_email_verified_at.is_not(None)
+        ),
+        # Keyset of the change feed and of incremental exports, see changed_at()
+        db.Index('ix_users_changed_at_id', sa.func.coalesce(_updated_at, _created_at), _id),
+    )
+
     def __init__(self, email: str, password: str, consent: bool, name: str = ''):
         """Create a new User object using the email address and hashing the
         plaintext password using Werkzeug.Security.
@@ -54,6 +99,93 @@ class User(db.Model):
         self._consent = consent
         self._name = name
 
+    # pylint: disable=too-many-arguments
+    @classmethod
+    def new_record_values(cls, email: str, password: str, consent: bool, name: str = '', *,
+                          remember_token: str = None, memo: str = None):
+        """Build column values of a new user record, applying the same rules
+        as the constructor. Used for bulk inserts, where no User objects
+        are created.
+
+            :return: column name to value mapping
+            :rtype: dict
+        """
+
+        if not consent:
+            raise ValueError("Cannot add user without consent")
+
+        return {
+            'email': email,
+            'password': cls._generate_password_hash(password) if not password is None else None,
+            'created_at': datetime.now(),
+            'consent': consent,
+            'name': name,
+            'remember_token': remember_token,
+            'memo': memo,
+        }
+
+    @classmethod
+    def changed_record_values(cls, changes: dict):
+        """Build column values of a user record update, applying the same
+        rules as the setters. Used for updates issued without loading the
+        user. Password changes and consent revocation need the setters.
+
+            Raises: ValueError when changes need the setters
+
+            :param changes: new values of remember_token, email, name, memo
+                            and consent, email_confirmed flag
+            :return: column name to value mapping
+            :rtype: dict
+        """
+
+        if 'password' in changes or changes.get('consent', True) is not True:
+            raise ValueError("Password and consent changes need a loaded user")
+
+        values = {
+            name: changes[name]
+            for name in ('remember_token', 'email', 'name', 'memo', 'consent')
+            if name in changes
+        }
+        values['updated_at'] = datetime.now()
+
+        if changes.get('email_confirmed', None) is True:
+            values['email_verified_at'] = values['updated_at']
+
+        return values
+
+    @classmethod
+    def email_equals(cls, email: str, dialect_name: str):
+        """Case-insensitive email comparison, in the form the email index of
+        the database dialect is used for
+
+            :param email: email to look up
+            :param dialect_name: database dialect, like sqlite or postgresql
+            :return: SQL expression
+        """
+        if dialect_name == 'sqlite':
+            return cls._email.collate('NOCASE') == email
+
+        return sa.func.lower(cls._email) == sa.func.lower(email)
+
+    @classmethod
+    def changed_at(cls):
+        """When user record was last written: updated_at, or created_at of
+        never updated users. Indexed together with the user id.
+
+            :return: SQL expression
+        """
+        return sa.func.coalesce(cls._updated_at, cls._created_at)
+
+    @staticmethod
+    def stored_timestamp(value: datetime):
+        """Convert datetime to the way user timestamps are stored, naive
+        local time, so it can be compared with them. Datetime with a UTC
+        offset is converted, naive one is taken as it is.
+
+            :return: naive datetime
+        """
+        return value if value.tzinfo is None else value.astimezone().replace(tzinfo=None)
+
     @property
     # pylint: disable=invalid-name
     def id(self):
@@ -218,7 +350,7 @@ class User(db.Model):
             :return: is password match
             :rtype: bool
         """
-        return check_password_hash(self._password, password_plaintext)
+        return password_hasher.check(self._password, password_plaintext)
 
     def _after_setter_called(self):
         """
@@ -236,7 +368,7 @@ class User(db.Model):
             :return: hash string for password
             :rtype: str
         """
-        return generate_password_hash(password_plaintext)
+        return password_hasher.hash(password_plaintext)
 
     def __repr__(self):
         return f'<User: {self._email}>'
@@ -249,6 +381,4 @@ class User(db.Model):
             :return: user entity related columns in a dictionary
             :rtype: dict
         """
-        columns = [c.key for c in class_mapper(self.__class__).columns]
-
-        return {col: getattr(self, col) for col in columns if col not in self._hidden_columns}
+        return serializer_for(self.__class__).to_dict(self)
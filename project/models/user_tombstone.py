@@ -0,0 +1,83 @@
+"""
+    Deleted user DB entity
+"""
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import DateTime, Integer, String
+from project import db
+
+
+class UserTombstone(db.Model):
+    """
+    Record of a deleted user, so the change feed reports deletions
+
+    The following attributes of a tombstone are stored in this table:
+        * user_id - ID of the deleted user
+        * deleted_at - when user was deleted
+        * reason - deleted, or consent_revoked
+
+    Tombstones are written by the statement returned by insert_statement(),
+    in the transaction deleting users.
+    """
+
+    __tablename__ = 'user_tombstones'
+
+    REASON_DELETED = 'deleted'
+    REASON_CONSENT_REVOKED = 'consent_revoked'
+
+    _id         = db.Column('id', Integer(), primary_key=True, autoincrement=True)
+    _user_id    = db.Column('user_id', Integer(), nullable=False)
+    _deleted_at = db.Column('deleted_at', DateTime(), nullable=False)
+    _reason     = db.Column('reason', String(20), nullable=False)
+
+    __table_args__ = (
+        # Keyset of the change feed
+        db.Index('ix_user_tombstones_deleted_at_id', _deleted_at, _id),
+    )
+
+    @classmethod
+    def insert_statement(cls, user_ids, reason: str = REASON_DELETED):
+        """Build multi-row INSERT of tombstones of deleted users
+
+            :param user_ids: IDs of deleted users
+            :param reason: why users were deleted
+            :return: insert statement, None when no user was deleted
+        """
+        deleted_at = datetime.now()
+        values = [
+            {'user_id': user_id, 'deleted_at': deleted_at, 'reason': reason}
+            for user_id in user_ids
+        ]
+
+        if not values:
+            return None
+
+        return sa.insert(cls.__table__).values(values)
+
+    @property
+    def user_id(self):
+        """
+            :return: ID of the deleted user
+            :rtype: int
+        """
+        return self._user_id
+
+    @property
+    def deleted_at(self):
+        """
+            :return: when user was deleted
+            :rtype: datetime.datetime
+        """
+        return self._deleted_at
+
+    @property
+    def reason(self):
+        """
+            :return: why user was deleted
+            :rtype: str
+        """
+        return self._reason
+
+    def __repr__(self):
+        return f'<UserTombstone: {self._user_id}>'
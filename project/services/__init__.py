@@ -0,0 +1,2 @@
+"""Application services shared by API controllers
+"""
@@ -0,0 +1,141 @@
+"""
+    Async SQLAlchemy engine and the event loop running async views
+"""
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+# Async drivers of the sync database URL schemes
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+# Sync engine options async engines accept as well
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+
+def async_database_url(database_url: str):
+    """
+        Switch database URL to the async driver of its backend
+
+        Raises: ValueError for backend without async driver
+
+        :param database_url: SQLALCHEMY_DATABASE_URI
+        :return: URL of the async driver
+        :rtype: str
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver for database backend: {backend}')
+
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+class AsyncDatabase():
+    """
+    Async engine (aiosqlite or asyncpg) used by async controllers, listed
+    in `ASYNC_CONTROLLERS` config. Nothing is created when the list is empty.
+
+    Flask runs every coroutine view in a fresh event loop, which async
+    connection pools cannot be shared across. Instead, coroutines of all
+    request threads run on a single loop owned by this extension, in a
+    background thread, so connections are pooled and their I/O waits
+    overlap. The loop thread is started on first use, and again in a
+    forked worker.
+
+    Under a WSGI server this does not raise concurrency: the request
+    thread blocks until its coroutine is done, so requests in flight are
+    still capped by the number of threads. What changes is that their
+    queries share one loop and one pool of async connections.
+    """
+
+    def __init__(self, app=None):
+        self.engine = None
+        self.sessionmaker = None
+        self.loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create async engine and run app coroutines on the shared loop
+
+            :param app: Flask application
+        """
+        app.extensions['async_db'] = self
+
+        if not app.config.get('ASYNC_CONTROLLERS', ()):
+            return
+
+        database_url = app.config.get('ASYNC_DATABASE_URI', None) or async_database_url(
+            app.config['SQLALCHEMY_DATABASE_URI']
+        )
+        engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+
+        self.engine = create_async_engine(
+            database_url,
+            **{name: engine_options[name] for name in POOL_OPTIONS if name in engine_options}
+        )
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        app.async_to_sync = self.async_to_sync
+
+    def _event_loop(self):
+        """:return: running shared event loop, started when needed"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=self.loop.run_forever,
+                        name='async-db-loop',
+                        daemon=True
+                    ).start()
+                    self._pid = os.getpid()
+
+        return self.loop
+
+    def run(self, coroutine):
+        """
+            Run coroutine on the shared loop and wait for its result, the
+            calling thread is blocked meanwhile. Context variables of the
+            calling thread, like Flask request context, are visible to the
+            coroutine.
+
+            :param coroutine: coroutine object
+            :return: coroutine result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._event_loop()).result()
+
+    def async_to_sync(self, function):
+        """
+            Replacement of Flask.async_to_sync, running coroutine views on
+            the shared loop
+
+            :param function: coroutine function
+            :return: sync function
+        """
+        def wrapper(*args, **kwargs):
+            return self.run(function(*args, **kwargs))
+
+        return wrapper
+
+    @asynccontextmanager
+    async def session(self):
+        """Async session of a request, closed when the block ends"""
+        async with self.sessionmaker() as session:
+            yield session
+
+    def dispose(self):
+        """Close pooled connections"""
+        if self.engine is not None:
+            self.run(self.engine.dispose())
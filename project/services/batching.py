@@ -0,0 +1,27 @@
+"""
+    Helpers for processing large collections in fixed size batches
+"""
+
+
+def chunked(iterable, size: int):
+    """
+        Group items of iterable in lists of given size, the last list
+        may be shorter
+
+        :param iterable: items to group
+        :param size: maximal number of items in a list
+        :type size: int
+
+        :return: generator of item lists
+    """
+    chunk = []
+
+    for item in iterable:
+        chunk.append(item)
+
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
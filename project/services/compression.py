@@ -0,0 +1,271 @@
+"""
+    Response compression negotiated by Accept-Encoding: whole bodies or
+    streamed chunk by chunk, with compressed bodies cached by ETag
+"""
+import threading
+import zlib
+
+from flask import request
+
+from project.services.instrumentation import timed
+from project.services.user_cache import LRUCacheBackend, NullCacheBackend
+
+try:
+    import brotli # pylint: disable=import-error
+except ImportError: # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard # pylint: disable=import-error
+except ImportError: # pragma: no cover
+    zstandard = None
+
+DEFAULT_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+
+DEFAULT_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+
+
+class GzipEncoder():
+    """gzip content coding, by zlib"""
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes):
+        """:return: whole body compressed"""
+        compressor = self._compressor()
+
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks):
+        """:return: generator of compressed chunks, each flushed so clients
+                    receive it right away
+        """
+        compressor = self._compressor()
+
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        yield compressor.flush()
+
+    def _compressor(self):
+        # gzip container, without file name and modification time
+        return zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+class BrotliEncoder():
+    """br content coding, needs brotli package"""
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes):
+        """:return: whole body compressed"""
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self, chunks):
+        """:return: generator of compressed chunks, each flushed"""
+        compressor = brotli.Compressor(quality=self.level)
+
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+
+        yield compressor.finish()
+
+
+class ZstdEncoder():
+    """zstd content coding, needs zstandard package"""
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes):
+        """:return: whole body compressed"""
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self, chunks):
+        """:return: generator of compressed chunks, each flushed"""
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+        yield compressor.flush()
+
+
+def available_encoders():
+    """
+        :return: content coding to encoder class mapping of installed
+                 codecs, preferred coding first
+        :rtype: dict
+    """
+    encoders = {}
+
+    if zstandard is not None:
+        encoders['zstd'] = ZstdEncoder
+
+    if brotli is not None:
+        encoders['br'] = BrotliEncoder
+
+    encoders['gzip'] = GzipEncoder
+
+    return encoders
+
+
+class ResponseCompressor():
+    """
+    Compress responses in the content coding negotiated by `Accept-Encoding`:
+    zstd or br when zstandard or brotli package is installed, gzip otherwise,
+    preferred in this order among codings client accepts equally. Levels of
+    every coding are set by `COMPRESSION_LEVELS`.
+
+    Only `COMPRESSION_MIMETYPES` responses are compressed, so already
+    compressed exports and server-sent events are left alone. Bodies
+    shorter than `COMPRESSION_MIN_SIZE` bytes are sent as they are.
+    Streamed responses are compressed chunk by chunk as they are sent,
+    every chunk flushed. Bodies of responses with ETag are cached once
+    compressed, up to `COMPRESSION_CACHE_MAX_ENTRIES` of them, so repeated
+    representations are not compressed again. ETags are weak, they stay
+    the same in every coding.
+
+    No request hook is registered unless `COMPRESSION_ENABLED` is on, turn
+    it off behind a proxy compressing responses already.
+    """
+
+    def __init__(self, app=None):
+        self.encoders = {}
+        self.min_size = 1024
+        self.mimetypes = frozenset(DEFAULT_MIMETYPES)
+        self.cache = NullCacheBackend()
+        self._counters = {'responses': 0, 'cache_hits': 0, 'bytes_in': 0, 'bytes_out': 0}
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create encoders and cache configured for application, and
+        register compression request hook when compression is enabled
+
+            :param app: Flask application
+        """
+        levels = {**DEFAULT_LEVELS, **app.config.get('COMPRESSION_LEVELS', {})}
+        self.encoders = {
+            coding: encoder(levels[coding]) for coding, encoder in available_encoders().items()
+        }
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.mimetypes = frozenset(app.config.get('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES))
+
+        max_entries = app.config.get('COMPRESSION_CACHE_MAX_ENTRIES', 1000)
+        self.cache = LRUCacheBackend(
+            max_entries, app.config.get('COMPRESSION_CACHE_TTL', 300)
+        ) if max_entries > 0 else NullCacheBackend()
+
+        app.extensions['compressor'] = self
+
+        if not app.config.get('COMPRESSION_ENABLED', True):
+            return
+
+        app.after_request(self._compress_response)
+
+    def metrics(self):
+        """
+            :return: number of compressed responses, of bodies served from
+                     cache, and bytes before and after compression
+            :rtype: dict
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def _compress_response(self, response):
+        if not self._is_compressible(response):
+            return response
+
+        if not response.is_streamed and len(response.get_data()) < self.min_size:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        coding = request.accept_encodings.best_match(tuple(self.encoders))
+
+        if coding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(self.encoders[coding], response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            with timed('compress'):
+                response.set_data(self._compress(coding, response))
+
+        response.headers['Content-Encoding'] = coding
+
+        return response
+
+    def _is_compressible(self, response):
+        return (
+            200 <= response.status_code < 300
+            and response.status_code not in (204, 206)
+            and response.mimetype in self.mimetypes
+            and 'Content-Encoding' not in response.headers
+            and not response.direct_passthrough
+            and not response.cache_control.no_transform
+        )
+
+    def _compress(self, coding: str, response):
+        """Compress body, or take it from cache when it was compressed
+        already. Cached body is checked against checksum of the response
+        body, so representations sharing ETag are never mixed up."""
+        body = response.get_data()
+        etag, _ = response.get_etag()
+        key = (request.full_path, etag, coding) if etag and request.method == 'GET' else None
+        checksum = zlib.crc32(body)
+        cached = self.cache.get(key) if key is not None else None
+
+        if cached is not None and cached[0] == checksum:
+            compressed = cached[1]
+        else:
+            compressed = self.encoders[coding].compress(body)
+            cached = None
+
+            if key is not None:
+                self.cache.set(key, (checksum, compressed))
+
+        self._count(len(body), len(compressed), cache_hit=cached is not None)
+
+        return compressed
+
+    def _stream(self, encoder, chunks):
+        """Compress chunks of streamed body, closing the original iterable
+        once the response is closed"""
+        bytes_in = 0
+        bytes_out = 0
+
+        def encoded_chunks():
+            nonlocal bytes_in
+
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+
+                if chunk:
+                    bytes_in += len(chunk)
+
+                    yield chunk
+
+        try:
+            for compressed in encoder.stream(encoded_chunks()):
+                bytes_out += len(compressed)
+
+                yield compressed
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+            self._count(bytes_in, bytes_out)
+
+    def _count(self, bytes_in: int, bytes_out: int, cache_hit: bool = False):
+        with self._lock:
+            self._counters['responses'] += 1
+            self._counters['cache_hits'] += cache_hit
+            self._counters['bytes_in'] += bytes_in
+            self._counters['bytes_out'] += bytes_out
@@ -0,0 +1,187 @@
+"""
+    Registry of API controllers, with optional lazy import of rarely used
+    controllers
+"""
+import functools
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from flask import Flask
+
+from project.http import CONTROLLERS, ENTRY_POINT_GROUP
+
+# Methods Flask adds to every rule on its own
+IMPLICIT_METHODS = frozenset(('HEAD', 'OPTIONS'))
+
+
+@functools.cache
+def controller_modules():
+    """
+        Controller modules listed in the registry, followed by modules of
+        the controller entry point group. Resolved once per process.
+
+        :return: module names
+        :rtype: tuple
+    """
+    plugins = tuple(
+        entry_point.module
+        for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP)
+    )
+
+    return CONTROLLERS + tuple(module for module in plugins if module not in CONTROLLERS)
+
+
+class LazyView():
+    """
+    View function imported from `module:function` on the first call, so
+    controller module is not imported while the app boots.
+    """
+
+    def __init__(self, import_name: str):
+        self.import_name = import_name
+        self.__name__ = import_name.rpartition(':')[2]
+        self._view = None
+        self._lock = threading.Lock()
+
+    @property
+    def view(self):
+        """:return: imported view function"""
+        if self._view is None:
+            with self._lock:
+                if self._view is None:
+                    module_name, _, function_name = self.import_name.partition(':')
+                    self._view = getattr(importlib.import_module(module_name), function_name)
+
+        return self._view
+
+    def __call__(self, *args, **kwargs):
+        return self.view(*args, **kwargs) # pylint: disable=not-callable
+
+
+def module_modified_at(module_name: str):
+    """
+        :return: modification time of module source, without importing it
+        :rtype: int
+    """
+    return os.stat(importlib.util.find_spec(module_name).origin).st_mtime_ns
+
+
+def build_manifest(module_names):
+    """
+        Import controllers and describe URL rules of their blueprints
+
+        :param module_names: controller module names
+        :return: module name to source modification time and URL rules
+        :rtype: dict
+    """
+    manifest = {}
+
+    for module_name in module_names:
+        blueprint = importlib.import_module(module_name).controller_blueprint
+
+        scratch_app = Flask(__name__)
+        scratch_app.register_blueprint(blueprint)
+
+        rules = []
+
+        for rule in scratch_app.url_map.iter_rules():
+            if not rule.endpoint.startswith(f'{blueprint.name}.'):
+                continue
+
+            view = scratch_app.view_functions[rule.endpoint]
+            rules.append({
+                'rule': rule.rule,
+                'endpoint': rule.endpoint,
+                'view': f'{view.__module__}:{view.__qualname__}',
+                'methods': sorted(rule.methods - IMPLICIT_METHODS),
+            })
+
+        manifest[module_name] = {
+            'modified_at': module_modified_at(module_name),
+            'rules': rules,
+        }
+
+    return manifest
+
+
+def write_manifest(path: str, module_names):
+    """
+        Write URL rules manifest of controllers, used to register lazy
+        controllers without importing them
+
+        :return: manifest written
+        :rtype: dict
+    """
+    manifest = build_manifest(module_names)
+
+    with open(path, mode='w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    return manifest
+
+
+def lazy_rules(path: str, module_name: str):
+    """
+        :return: URL rules of controller from manifest, None when manifest
+                 is missing or older than controller source
+        :rtype: list
+    """
+    try:
+        with open(path, mode='r', encoding='utf-8') as manifest_file:
+            entry = json.load(manifest_file).get(module_name, None)
+    except (OSError, ValueError):
+        return None
+
+    if entry is None or entry['modified_at'] != module_modified_at(module_name):
+        return None
+
+    return entry['rules']
+
+
+def register_lazy_controller(app, rules):
+    """Register URL rules of a controller with lazily imported views"""
+    for rule in rules:
+        app.add_url_rule(
+            rule['rule'],
+            endpoint=rule['endpoint'],
+            view_func=LazyView(rule['view']),
+            methods=rule['methods']
+        )
+
+
+def import_time_report(root_directory: str, limit: int = 25):
+    """
+        Boot the app in a fresh interpreter with `-X importtime` and collect
+        the slowest imports
+
+        :param root_directory: directory `project` package is imported from
+        :param limit: number of imports to report
+        :type limit: int
+
+        :return: (self us, cumulative us, module) tuples, slowest first
+        :rtype: list
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from project import create_app; create_app()'],
+        cwd=root_directory,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    imports = []
+
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_time, cumulative_time, module = line[len('import time:'):].split('|')
+        imports.append((int(self_time), int(cumulative_time), module.rstrip()))
+
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:limit]
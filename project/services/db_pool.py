@@ -0,0 +1,97 @@
+"""
+    Database connection pool instrumentation
+"""
+import logging
+import threading
+import time
+
+from sqlalchemy import exc, make_url
+from sqlalchemy.pool import QueuePool
+
+# SQLAlchemy names pool loggers after the pool class module, which puts
+# them under the app logger. Keep them as quiet as sqlalchemy.pool is.
+logging.getLogger(__name__).setLevel(logging.WARNING)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool recording how long checkouts wait for a connection and how
+    many of them time out, on top of the pool counters QueuePool keeps.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.wait_metrics = {
+            'count': 0,
+            'total_seconds': 0.0,
+            'max_seconds': 0.0,
+            'timeouts': 0,
+        }
+        self._metrics_lock = threading.Lock()
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        timed_out = False
+
+        try:
+            return super()._do_get()
+
+        except exc.TimeoutError:
+            timed_out = True
+
+            raise
+
+        finally:
+            duration = time.perf_counter() - started_at
+
+            with self._metrics_lock:
+                self.wait_metrics['count'] += 1
+                self.wait_metrics['total_seconds'] += duration
+                self.wait_metrics['max_seconds'] = max(self.wait_metrics['max_seconds'], duration)
+                self.wait_metrics['timeouts'] += int(timed_out)
+
+
+def configure_pool(app):
+    """
+        Make engine use InstrumentedQueuePool, unless another pool class
+        is configured or database has no pool (in-memory SQLite). Must be
+        called before the database extension is initialised.
+
+        :param app: Flask application
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    if 'poolclass' in options or url.database in (None, '', ':memory:'):
+        return
+
+    options['poolclass'] = InstrumentedQueuePool
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def pool_metrics(engine):
+    """
+        :param engine: SQLAlchemy engine
+
+        :return: pool size, checked out, idle and overflow connections,
+                 checkout wait time when pool is instrumented
+        :rtype: dict
+    """
+    pool = engine.pool
+    metrics = {'pool': type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        metrics.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'timeout': pool.timeout(),
+        })
+
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._metrics_lock: # pylint: disable=protected-access
+            metrics['wait'] = dict(pool.wait_metrics)
+
+    return metrics
@@ -0,0 +1,102 @@
+"""
+    Entity tags of user resources, derived from record timestamps
+"""
+import datetime
+import hashlib
+
+import sqlalchemy as sa
+
+
+def user_etag(user_id: int, created_at, updated_at):
+    """
+        Weak ETag value of a single user, changes on every mutation
+        since setters stamp updated_at
+
+        :param user_id: user ID
+        :type user_id: int
+        :param created_at: when user record was created
+        :type created_at: datetime.datetime
+        :param updated_at: when user record was updated, if ever
+        :type updated_at: datetime.datetime
+
+        :return: ETag value, without quotes and weak marker
+        :rtype: str
+    """
+    version = updated_at or created_at
+
+    return f'{user_id}-{version.strftime("%Y%m%d%H%M%S%f")}'
+
+
+def collection_version_query(model, tombstone_model):
+    """
+        Query of what changes whenever a collection changes: highest id,
+        latest change timestamp and highest tombstone id. Inserts, updates
+        and deletes all move at least one of them.
+
+        Every value is a MIN/MAX of its own subquery, read from one end of
+        an index, so the cost does not grow with the number of records.
+
+        :param model: User model class
+        :param tombstone_model: UserTombstone model class, deletes write
+                                tombstones
+        :return: select statement returning single row
+    """
+    # pylint: disable=protected-access,not-callable
+    return sa.select(
+        sa.select(sa.func.max(model._id)).scalar_subquery(),
+        sa.select(sa.func.max(model.changed_at())).scalar_subquery(),
+        sa.select(sa.func.max(tombstone_model._id)).scalar_subquery()
+    )
+
+
+def user_version_condition(model, user_id: int, etags):
+    """
+        Condition matching the user record while one of the ETags is
+        still its ETag, see user_etag
+
+        Weak ETags are compared on purpose, against RFC 9110 which asks
+        `If-Match` for strong comparison: user ETags are only ever weak,
+        strong comparison would fail every precondition but `*`. The
+        version they carry is the record timestamp, stamped on every
+        mutation, so a matching one still proves the record unchanged.
+
+        :param model: User model class
+        :param user_id: user ID
+        :type user_id: int
+        :param etags: `If-Match` ETags
+        :type etags: werkzeug.datastructures.ETags
+
+        :return: SQL expression, None when every version matches (`*`)
+    """
+    if etags.star_tag:
+        return None
+
+    versions = []
+
+    for etag in etags.as_set(include_weak=True):
+        etag_user_id, _, version = etag.partition('-')
+
+        try:
+            if int(etag_user_id) == user_id:
+                versions.append(datetime.datetime.strptime(version, '%Y%m%d%H%M%S%f'))
+        except ValueError:
+            continue
+
+    return model.changed_at().in_(versions)
+
+
+def collection_etag(version_row, variant: str = ''):
+    """
+        Weak ETag value of a collection representation
+
+        :param version_row: row returned by collection_version_query
+        :param variant: what else shapes representation, like query string
+        :type variant: str
+
+        :return: ETag value, without quotes and weak marker
+        :rtype: str
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(repr((tuple(version_row), variant)).encode('utf-8'))
+
+    return digest.hexdigest()
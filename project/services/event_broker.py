@@ -0,0 +1,384 @@
+"""
+    Fan-out of user mutation events to stream subscribers, with pluggable
+    backends
+"""
+import contextlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from project.services.serialization import dumps
+
+# What a full subscriber queue does with a new event
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'disconnect')
+
+# Seconds a failed listener waits before subscribing again, doubled on
+# every further failure up to the maximum
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription():
+    """
+    Bounded queue of events of a single subscriber. When the subscriber
+    falls behind and the queue is full, `policy` decides:
+        * drop_oldest - oldest queued event is dropped for the new one
+        * drop_newest - new event is dropped
+        * disconnect - subscription is overflowed, its stream ends and the
+          client is expected to resync, e.g. from the change feed
+
+    Publishers never wait for subscribers.
+    """
+
+    def __init__(self, max_size: int, policy: str, types=None):
+        self.policy = policy
+        self.types = types
+        self.dropped = 0
+        self.overflowed = False
+        self._queue = queue.Queue(max_size)
+
+    def put(self, event: dict):
+        """Queue event, unless filtered out, applying overflow policy"""
+        if self.types is not None and event['type'] not in self.types:
+            return
+
+        try:
+            self._queue.put_nowait(event)
+
+            return
+        except queue.Full:
+            self.dropped += 1
+
+        if self.policy == 'disconnect':
+            self.overflowed = True
+        elif self.policy == 'drop_oldest':
+            try:
+                self._queue.get_nowait()
+                self._queue.put_nowait(event)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def get(self, timeout: float):
+        """
+            :param timeout: seconds to wait for an event
+            :return: next event, None when none came in time
+            :rtype: dict
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class NullEventBackend():
+    """Backend dropping every event, used when events are disabled"""
+
+    def start(self, dispatch):
+        """Nothing is ever dispatched"""
+
+    def publish(self, event):
+        """Drop event"""
+
+    def listen(self):
+        """Nothing to listen to"""
+
+
+class LocalEventBackend():
+    """Backend dispatching events to subscribers of the publishing process"""
+
+    def __init__(self):
+        self._dispatch = None
+
+    def start(self, dispatch):
+        """Dispatch published events with given function"""
+        self._dispatch = dispatch
+
+    def publish(self, event):
+        """Dispatch event right away"""
+        self._dispatch(event)
+
+    def listen(self):
+        """Published events are dispatched by publish()"""
+
+
+class SharedEventBackend():
+    """
+    Backend fanning events out across worker processes through a
+    Redis-like publish/subscribe channel.
+
+    `client` needs `publish(channel, message)` and `pubsub()`, returning
+    an object with `subscribe(channel)`, `listen()`, yielding messages
+    as dictionaries with `type` and `data`, and `close()`. Events are sent
+    as JSON.
+
+    A process listens to the channel only once it has subscribers, in a
+    background thread, started again in a forked worker. When the channel
+    fails, e.g. on a lost connection, the failure is logged and the thread
+    subscribes again after `reconnect_delay` seconds, doubled on every
+    further failure; events published meanwhile are lost.
+    """
+
+    def __init__(
+        self, client, channel: str = 'users:events', reconnect_delay: float = RECONNECT_DELAY
+    ):
+        self.client = client
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._dispatch = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self, dispatch):
+        """Dispatch received events with given function"""
+        self._dispatch = dispatch
+
+    def publish(self, event):
+        """Send event to every listening process"""
+        self.client.publish(self.channel, dumps(event))
+
+    def listen(self):
+        """Start listening thread of this process, unless running already"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(
+                    target=self._receive,
+                    args=(self._subscribe(),),
+                    name='event-broker-listener',
+                    daemon=True
+                ).start()
+                self._pid = os.getpid()
+
+    def _subscribe(self):
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(self.channel)
+
+        return pubsub
+
+    def _receive(self, pubsub):
+        delay = self.reconnect_delay
+
+        try:
+            while True:
+                try:
+                    if pubsub is None:
+                        pubsub = self._subscribe()
+
+                    for message in pubsub.listen():
+                        delay = self.reconnect_delay
+
+                        if message['type'] == 'message':
+                            self._dispatch(json.loads(message['data']))
+                except Exception: # pylint: disable=broad-exception-caught
+                    logger.exception(
+                        'Event channel %s failed, subscribing again in %ss', self.channel, delay
+                    )
+
+                if pubsub is not None:
+                    with contextlib.suppress(Exception):
+                        pubsub.close()
+
+                    pubsub = None
+
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            # Thread ended after all, next subscriber starts another one
+            self._pid = None
+
+
+class InMemoryPubSubClient():
+    """
+    Local stand-in for a Redis client, implementing the publish/subscribe
+    subset used by SharedEventBackend. Useful for tests and single process
+    deployments.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message):
+        """Deliver message to every subscriber of the channel"""
+        with self._lock:
+            subscribers = [messages for name, messages in self._subscribers if name == channel]
+
+        for messages in subscribers:
+            messages.put({'type': 'message', 'channel': channel, 'data': message})
+
+        return len(subscribers)
+
+    def pubsub(self):
+        """:return: new subscriber of this client"""
+        return _InMemoryPubSub(self)
+
+    def _subscribe(self, channel: str, messages):
+        with self._lock:
+            self._subscribers.append((channel, messages))
+
+    def _unsubscribe(self, messages):
+        with self._lock:
+            self._subscribers = [
+                subscriber for subscriber in self._subscribers if subscriber[1] is not messages
+            ]
+
+
+class _InMemoryPubSub():
+    """Subscriber of InMemoryPubSubClient"""
+
+    def __init__(self, client):
+        self._client = client
+        self._messages = queue.Queue()
+
+    def subscribe(self, channel: str):
+        """Receive messages published on the channel"""
+        self._client._subscribe(channel, self._messages) # pylint: disable=protected-access
+
+    def listen(self):
+        """:return: generator of received messages, waiting for them"""
+        while True:
+            yield self._messages.get()
+
+    def close(self):
+        """Stop receiving messages"""
+        self._client._unsubscribe(self._messages) # pylint: disable=protected-access
+
+
+class EventBroker():
+    """
+    Publishes user mutation events and fans them out to subscribers of
+    this process, each with its own bounded queue, see Subscription.
+
+    Backend is picked by `EVENTS_BACKEND`:
+        * local - events reach subscribers of the publishing process (default)
+        * redis - shared channel at `EVENTS_URL`, needs redis package
+        * memory - shared channel backed by an in-memory stand-in
+        * none - events disabled
+
+    With several worker processes, a subscriber only sees events of every
+    worker through a shared backend.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullEventBackend()
+        self.queue_size = 100
+        self.policy = 'drop_oldest'
+        self.max_subscribers = 100
+        # Events published, and dropped by closed subscriptions
+        self._counters = {'published': 0, 'dropped': 0}
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create backend configured for application
+
+            Raises: ValueError on unknown backend or overflow policy
+
+            :param app: Flask application
+        """
+        self.queue_size = app.config.get('EVENTS_QUEUE_SIZE', 100)
+        self.policy = app.config.get('EVENTS_OVERFLOW_POLICY', 'drop_oldest')
+        self.max_subscribers = app.config.get('EVENTS_MAX_SUBSCRIBERS', 100)
+
+        if self.policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown event overflow policy: {self.policy}')
+
+        self.backend = self._create_backend(app.config)
+        self.backend.start(self._dispatch)
+
+        app.extensions['event_broker'] = self
+
+    def publish(self, event_type: str, data: dict):
+        """
+            :param event_type: event name, like user.created
+            :type event_type: str
+            :param data: JSON compatible event payload
+            :type data: dict
+        """
+        self.backend.publish({'type': event_type, 'data': data})
+
+        with self._lock:
+            self._counters['published'] += 1
+
+    def subscribe(self, types=None):
+        """
+            :param types: event types to receive, all when None
+            :type types: frozenset
+
+            :return: new subscription, None when there are too many
+            :rtype: Subscription
+        """
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                return None
+
+            subscription = Subscription(self.queue_size, self.policy, types)
+            self._subscriptions.add(subscription)
+
+        self.backend.listen()
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+            Stop delivering events to the subscription
+
+            :param subscription: subscription of subscribe()
+        """
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.discard(subscription)
+                self._counters['dropped'] += subscription.dropped
+
+    def metrics(self):
+        """
+            :return: backend name, subscriber count, published and dropped
+                     event counters
+            :rtype: dict
+        """
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'subscribers': len(self._subscriptions),
+                'published': self._counters['published'],
+                'dropped': self._counters['dropped'] + sum(
+                    subscription.dropped for subscription in self._subscriptions
+                ),
+            }
+
+    def _dispatch(self, event: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            subscription.put(event)
+
+    @staticmethod
+    def _create_backend(config):
+        backend = config.get('EVENTS_BACKEND', 'local')
+
+        if backend == 'local':
+            return LocalEventBackend()
+
+        if backend == 'memory':
+            return SharedEventBackend(InMemoryPubSubClient())
+
+        if backend == 'redis':
+            import redis # pylint: disable=import-outside-toplevel,import-error
+
+            return SharedEventBackend(redis.Redis.from_url(config['EVENTS_URL']))
+
+        if backend == 'none':
+            return NullEventBackend()
+
+        raise ValueError(f'Unknown event backend: {backend}')
@@ -0,0 +1,228 @@
+"""
+    Request timing instrumentation: phase timers, SQL query statistics,
+    Server-Timing header and latency histograms in Prometheus text format
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram():
+    """Cumulative histogram of observed values, Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Count value in its bucket"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+            :return: (upper bound, count of values up to it) pairs, ending
+                     with +Inf bound
+            :rtype: list
+        """
+        total = 0
+        result = []
+
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append(('+Inf' if bound == float('inf') else repr(bound), total))
+
+        return result
+
+
+@contextmanager
+def timed(phase: str):
+    """
+        Measure block of code as a phase of the current request, phases
+        with the same name add up. Outside of requests nothing is recorded.
+
+        :param phase: phase name, reported in Server-Timing header
+        :type phase: str
+    """
+    started_at = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started_at)
+
+
+def record_phase(phase: str, duration: float):
+    """Add duration, in seconds, to phase of the current request"""
+    timings = _request_timings()
+
+    if timings is not None:
+        timings['phases'][phase] = timings['phases'].get(phase, 0.0) + duration
+
+
+def _request_timings():
+    if not has_request_context():
+        return None
+
+    return g.get('request_timings', None)
+
+
+def _before_cursor_execute(conn, *_):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, *_):
+    _finish_query(conn)
+
+
+def _handle_error(context):
+    # after_cursor_execute is not fired for a failed statement, its start
+    # time is popped here so the stack of a pooled connection stays balanced
+    if context.connection is not None and context.execution_context is not None:
+        _finish_query(context.connection)
+
+
+def _finish_query(conn):
+    query_started_at = conn.info.get('query_started_at', None)
+
+    if not query_started_at:
+        return
+
+    started_at = query_started_at.pop()
+    timings = _request_timings()
+
+    if timings is not None:
+        timings['queries'] += 1
+        timings['query_seconds'] += time.perf_counter() - started_at
+
+
+class Instrumentation():
+    """
+    Time every request, its phases and its SQL queries.
+
+    Adds `Server-Timing` header to responses when `SERVER_TIMING` is on,
+    and keeps latency and query histograms per blueprint route, rendered
+    by render_prometheus().
+    """
+
+    def __init__(self, app=None):
+        self.buckets = DEFAULT_BUCKETS
+        self.server_timing = True
+        self._latency = {}
+        self._queries = {}
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register request hooks and SQL query listeners
+
+            :param app: Flask application
+        """
+        self.buckets = app.config.get('METRICS_LATENCY_BUCKETS', DEFAULT_BUCKETS)
+        self.server_timing = app.config.get('SERVER_TIMING', True)
+        self._latency = {}
+        self._queries = {}
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        app.extensions['instrumentation'] = self
+
+    @staticmethod
+    def _start_request():
+        g.request_timings = {
+            'started_at': time.perf_counter(),
+            'phases': {},
+            'queries': 0,
+            'query_seconds': 0.0,
+        }
+
+    def _finish_request(self, response):
+        timings = _request_timings()
+
+        if timings is None:
+            return response
+
+        duration = time.perf_counter() - timings['started_at']
+        labels = (
+            request.blueprint or '',
+            request.url_rule.rule if request.url_rule else 'unmatched',
+            request.method
+        )
+
+        with self._lock:
+            if labels not in self._latency:
+                self._latency[labels] = Histogram(self.buckets)
+                self._queries[labels] = Histogram((1, 2, 5, 10, 20, 50, 100))
+
+            self._latency[labels].observe(duration)
+            self._queries[labels].observe(timings['queries'])
+
+        if self.server_timing:
+            metrics = [
+                f'{phase};dur={seconds * 1000:.3f}'
+                for phase, seconds in timings['phases'].items()
+            ]
+            metrics.append(
+                f'db;dur={timings["query_seconds"] * 1000:.3f};desc="{timings["queries"]} queries"'
+            )
+            metrics.append(f'total;dur={duration * 1000:.3f}')
+
+            response.headers['Server-Timing'] = ', '.join(metrics)
+
+        return response
+
+    def render_prometheus(self):
+        """
+            :return: request latency and SQL query count histograms in
+                     Prometheus text exposition format
+            :rtype: str
+        """
+        lines = []
+
+        with self._lock:
+            self._render_histograms(
+                lines,
+                'http_request_duration_seconds',
+                'Request latency by blueprint route.',
+                self._latency
+            )
+            self._render_histograms(
+                lines,
+                'http_request_sql_queries',
+                'SQL queries executed per request by blueprint route.',
+                self._queries
+            )
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, name, description, histograms):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+
+        for (blueprint, route, method), histogram in sorted(histograms.items()):
+            labels = f'blueprint="{blueprint}",route="{route}",method="{method}"'
+
+            for bound, count in histogram.cumulative_counts():
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
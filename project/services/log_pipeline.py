@@ -0,0 +1,191 @@
+"""
+    Non-blocking logging pipeline: request threads enqueue log records,
+    a background listener thread formats and writes them to a rotating file
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = (
+    '%(asctime)s %(levelname)s %(threadName)s-%(thread)d: %(message)s '
+    '[in %(filename)s:%(lineno)d]'
+)
+
+# Formats tracebacks of records before they are queued
+EXCEPTION_FORMATTER = logging.Formatter()
+
+
+# pylint: disable=too-few-public-methods
+class JsonFormatter(logging.Formatter):
+    """Format log record as a single line JSON object"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': f'{record.threadName}-{record.thread}',
+            'message': record.getMessage(),
+            'file': record.filename,
+            'line': record.lineno,
+        }
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Formatted by DroppingQueueHandler.prepare()
+            entry['exception'] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let through one of every `rate` records logged from the same call site,
+    for records below WARNING. Rate can be overridden per record with
+    `extra={'sample_rate': n}`. Warnings and errors are never sampled out.
+    """
+
+    def __init__(self, rate: int = 1):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', self.rate)
+
+        if rate <= 1 or record.levelno >= logging.WARNING:
+            return True
+
+        with self._lock:
+            call_site = (record.pathname, record.lineno)
+            count = self._counters[call_site]
+            self._counters[call_site] = count + 1
+
+            if count % rate == 0:
+                return True
+
+            self.sampled_out += 1
+
+            return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler dropping records, instead of blocking or raising,
+    while the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        """Copy record with its message merged, for the listener thread.
+        Unlike QueueHandler.prepare(), traceback is not merged into the
+        message but kept formatted in `exc_text`, so formatters still see
+        it apart."""
+        exc_text = record.exc_text
+
+        if record.exc_info:
+            exc_text = EXCEPTION_FORMATTER.formatException(record.exc_info)
+
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class LogPipeline():
+    """
+    Attach queue handler to the app logger and run a listener thread
+    writing queued records to a rotating log file.
+
+    Configured by LOG_FILE, LOG_LEVEL, LOG_FORMAT (json or text),
+    LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE and LOG_SAMPLE_RATE.
+    """
+
+    def __init__(self):
+        self.handler = None
+        self.sampling_filter = None
+        self._listener = None
+        self._logger = None
+
+        atexit.register(self.stop)
+
+    def init_app(self, app, log_file: str):
+        """Replace pipeline of a previously configured app, if any
+
+            :param app: Flask application
+            :param log_file: path of the log file
+        """
+        self.stop()
+
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=app.config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+            backupCount=app.config.get('LOG_BACKUP_COUNT', 20),
+            delay=True
+        )
+
+        if app.config.get('LOG_FORMAT', 'json') == 'json':
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        self.sampling_filter = SamplingFilter(app.config.get('LOG_SAMPLE_RATE', 1))
+        self.handler = DroppingQueueHandler(queue.Queue(app.config.get('LOG_QUEUE_SIZE', 10000)))
+        self.handler.addFilter(self.sampling_filter)
+
+        self._listener = QueueListener(self.handler.queue, file_handler)
+        self._listener.start()
+
+        self._logger = app.logger
+        self._logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+        self._logger.addHandler(self.handler)
+
+    def stop(self):
+        """Detach queue handler, write out queued records and stop listener"""
+        if self._logger is not None:
+            self._logger.removeHandler(self.handler)
+            self._logger = None
+
+        if self._listener is not None:
+            self._listener.stop()
+
+            for handler in self._listener.handlers:
+                handler.close()
+
+            self._listener = None
+
+    def metrics(self):
+        """
+            :return: queued, dropped and sampled out record counts
+            :rtype: dict
+        """
+        if self.handler is None:
+            return {'queued': 0, 'dropped': 0, 'sampled_out': 0}
+
+        return {
+            'queued': self.handler.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'sampled_out': self.sampling_filter.sampled_out,
+        }
@@ -0,0 +1,350 @@
+"""
+    Delivery of outbox messages to downstream systems, in batches
+"""
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from project.services.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Table of project.models.outbox_message, looked up in the metadata of the
+# app database so this module does not import the app package
+OUTBOX_TABLE = 'outbox_messages'
+
+# pylint: disable=too-few-public-methods
+
+class LogSink():
+    """Sink writing every message to the application log"""
+
+    def deliver(self, messages):
+        """:return: no failed message"""
+        for message in messages:
+            logger.info('Outbox message %s: %s %s', message['id'], message['type'], message['data'])
+
+        return {}
+
+
+class MemorySink():
+    """Sink keeping delivered messages, useful for tests"""
+
+    def __init__(self):
+        self.messages = []
+
+    def deliver(self, messages):
+        """:return: no failed message"""
+        self.messages += messages
+
+        return {}
+
+
+class WebhookSink():
+    """Sink POSTing every batch as a JSON array to `url`. Batch fails as a
+    whole on connection error or non 2xx response."""
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, messages):
+        """:return: no failed message, raises otherwise"""
+        request = urllib.request.Request(
+            self.url,
+            data=dumps(messages),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+
+        # Only configured http(s) URLs are requested
+        with urllib.request.urlopen(request, timeout=self.timeout): # nosec B310
+            pass
+
+        return {}
+
+
+# pylint: disable=too-many-instance-attributes
+class OutboxDispatcher():
+    """
+    Claims undelivered outbox messages `OUTBOX_BATCH_SIZE` at a time and
+    delivers them to the sink picked by `OUTBOX_SINK`:
+        * log - application log (default)
+        * webhook - POST of every batch to `OUTBOX_WEBHOOK_URL`
+        * memory - in-process list, see MemorySink
+
+    Batch is claimed by a single UPDATE ... RETURNING, leasing messages for
+    `OUTBOX_LEASE_SECONDS`: on Postgres its subquery locks rows with
+    FOR UPDATE SKIP LOCKED, so concurrent dispatchers claim distinct
+    batches; SQLite serialises writers anyway and ignores the clause.
+    Messages are delivered outside of the claiming transaction, delivered
+    ones are deleted. Failed ones are retried with exponential backoff
+    from `OUTBOX_RETRY_SECONDS`, and parked after `OUTBOX_MAX_ATTEMPTS`.
+    A dispatcher dying mid-batch leaves messages to be claimed again once
+    the lease expires, so delivery is at least once.
+
+    Messages are delivered in id order, but a retried message waits for its
+    backoff while later messages go on, so it can be delivered after later
+    changes of the same user. Consumers order changes of a user by message
+    `id` (or `created_at`) and skip older ones, as they do for duplicates.
+
+    Dispatcher runs as `flask outbox dispatch` worker, or in a background
+    thread of every app process with `OUTBOX_DISPATCHER_THREAD`.
+    """
+
+    def __init__(self, app=None):
+        self.db = None
+        self.sink = LogSink()
+        self.options = {}
+        self.counters = {'dispatched': 0, 'failed': 0, 'parked': 0, 'batches': 0}
+        # Throughput of the last batch and delay of its oldest message
+        self.last_batch = {'throughput': 0.0, 'lag_seconds': 0.0}
+        self.stopping = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create sink configured for application, and start dispatcher
+        thread of every process when enabled
+
+            :param app: Flask application
+        """
+        config = app.config
+        self.options = {
+            'batch_size': config.get('OUTBOX_BATCH_SIZE', 100),
+            'lease_seconds': config.get('OUTBOX_LEASE_SECONDS', 60),
+            'retry_seconds': config.get('OUTBOX_RETRY_SECONDS', 1),
+            'max_attempts': config.get('OUTBOX_MAX_ATTEMPTS', 10),
+            'poll_seconds': config.get('OUTBOX_POLL_SECONDS', 1),
+        }
+        self.sink = self._create_sink(config)
+        self.db = app.extensions.get('sqlalchemy', None)
+
+        app.extensions['outbox'] = self
+
+        if config.get('OUTBOX_DISPATCHER_THREAD', False):
+            app.before_request(lambda: self._start_thread(app))
+
+    def claim(self):
+        """
+            Lease next batch of available messages
+
+            :return: claimed messages, in id order
+            :rtype: list
+        """
+        table = self._table()
+        now = datetime.now()
+        claimable = sa.select(table.c.id).where(
+            table.c.available_at <= now
+        ).order_by(table.c.available_at, table.c.id).limit(
+            self.options['batch_size']
+        ).with_for_update(skip_locked=True)
+
+        rows = self.db.session.execute(
+            sa.update(table).where(table.c.id.in_(claimable)).values(
+                available_at=now + timedelta(seconds=self.options['lease_seconds']),
+                attempts=table.c.attempts + 1
+            ).returning(
+                table.c.id, table.c.event_type, table.c.payload, table.c.created_at,
+                table.c.attempts
+            )
+        ).all()
+        self.db.session.commit()
+
+        return sorted(rows, key=lambda row: row.id)
+
+    def dispatch_batch(self):
+        """
+            Claim and deliver a batch of messages
+
+            :return: number of claimed messages
+            :rtype: int
+        """
+        rows = self.claim()
+
+        if not rows:
+            return 0
+
+        started_at = time.perf_counter()
+        messages = [
+            {
+                'id': row.id,
+                'type': row.event_type,
+                'data': json.loads(row.payload),
+                'created_at': row.created_at.isoformat(),
+                'attempts': row.attempts,
+            }
+            for row in rows
+        ]
+
+        try:
+            errors = self.sink.deliver(messages)
+        except Exception as exception: # pylint: disable=broad-except
+            errors = {message['id']: f'{type(exception).__name__}: {exception}'
+                      for message in messages}
+
+        self._settle(rows, errors)
+
+        delivered = len(rows) - len(errors)
+        elapsed = time.perf_counter() - started_at
+
+        with self._lock:
+            self.counters['dispatched'] += delivered
+            self.counters['failed'] += len(errors)
+            self.counters['batches'] += 1
+            self.last_batch = {
+                'throughput': delivered / elapsed if elapsed > 0 else 0.0,
+                'lag_seconds': (datetime.now() - rows[0].created_at).total_seconds(),
+            }
+
+        return len(rows)
+
+    def run(self, once: bool = False):
+        """
+            Dispatch batches until stopped, waiting `OUTBOX_POLL_SECONDS`
+            whenever less than a full batch was available
+
+            :param once: stop once no message is available
+        """
+        while not self.stopping.is_set():
+            try:
+                claimed = self.dispatch_batch()
+            except Exception: # pylint: disable=broad-except
+                self.db.session.rollback()
+                logger.exception('Outbox dispatch failed')
+                claimed = 0
+
+            if claimed < self.options['batch_size']:
+                if once:
+                    return
+
+                self.stopping.wait(self.options['poll_seconds'])
+
+    def status(self):
+        """
+            :return: number of pending and parked messages, and age in
+                     seconds of the oldest pending one
+            :rtype: dict
+        """
+        table = self._table()
+        pending = table.c.available_at.is_not(None)
+        # pylint: disable=not-callable
+        row = self.db.session.execute(sa.select(
+            sa.func.count().filter(pending).label('pending'),
+            sa.func.count().filter(table.c.available_at.is_(None)).label('parked'),
+            sa.func.min(table.c.created_at).filter(pending).label('oldest'),
+        )).one()
+
+        return {
+            'pending': row.pending,
+            'parked': row.parked,
+            'lag_seconds': 0.0 if row.oldest is None else (
+                datetime.now() - row.oldest
+            ).total_seconds(),
+        }
+
+    def requeue_parked(self):
+        """
+            Make parked messages available again, with attempts reset
+
+            :return: number of requeued messages
+            :rtype: int
+        """
+        table = self._table()
+        result = self.db.session.execute(
+            sa.update(table).where(table.c.available_at.is_(None)).values(
+                available_at=datetime.now(), attempts=0
+            )
+        )
+        self.db.session.commit()
+
+        return result.rowcount
+
+    def metrics(self):
+        """
+            :return: sink name, dispatcher counters of this process and
+                     last batch throughput and lag
+            :rtype: dict
+        """
+        with self._lock:
+            return {'sink': type(self.sink).__name__, **self.counters, **self.last_batch}
+
+    def _settle(self, rows, errors):
+        """Delete delivered messages, schedule retry of failed ones or park
+        them, in a single transaction"""
+        table = self._table()
+        delivered_ids = [row.id for row in rows if row.id not in errors]
+        now = datetime.now()
+
+        if delivered_ids:
+            self.db.session.execute(sa.delete(table).where(table.c.id.in_(delivered_ids)))
+
+        for row in rows:
+            if row.id not in errors:
+                continue
+
+            parked = row.attempts >= self.options['max_attempts']
+            retry_at = now + timedelta(
+                seconds=self.options['retry_seconds'] * 2 ** (row.attempts - 1)
+            )
+
+            self.db.session.execute(sa.update(table).where(table.c.id == row.id).values(
+                available_at=None if parked else retry_at,
+                last_error=errors[row.id]
+            ))
+
+            if parked:
+                logger.error('Outbox message %s parked: %s', row.id, errors[row.id])
+
+                with self._lock:
+                    self.counters['parked'] += 1
+
+        self.db.session.commit()
+
+    def _table(self):
+        """:return: outbox table of the app database"""
+        return self.db.metadata.tables[OUTBOX_TABLE]
+
+    def _start_thread(self, app):
+        """Start dispatcher thread of this process, unless running already"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(
+                    target=self._run_thread,
+                    args=(app,),
+                    name='outbox-dispatcher',
+                    daemon=True
+                ).start()
+                self._pid = os.getpid()
+
+    def _run_thread(self, app):
+        with app.app_context():
+            self.run()
+
+    @staticmethod
+    def _create_sink(config):
+        sink = config.get('OUTBOX_SINK', 'log')
+
+        if sink == 'log':
+            return LogSink()
+
+        if sink == 'memory':
+            return MemorySink()
+
+        if sink == 'webhook':
+            return WebhookSink(
+                config['OUTBOX_WEBHOOK_URL'], config.get('OUTBOX_WEBHOOK_TIMEOUT', 10)
+            )
+
+        raise ValueError(f'Unknown outbox sink: {sink}')
@@ -0,0 +1,188 @@
+"""
+    Password hashing backend running werkzeug hashes in a process pool
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from project.exceptions.password_hasher_saturated import PasswordHasherSaturated
+from project.services.instrumentation import record_phase
+
+
+# pylint: disable=too-many-instance-attributes
+class PasswordHasher():
+    """
+    Hash and check passwords with werkzeug.security, optionally in a
+    bounded pool of worker processes.
+
+    Key derivation is CPU bound and holds the GIL, so running it in the
+    request thread stalls every other thread of the worker. With
+    `PASSWORD_HASH_WORKERS` above zero, hashes run in separate processes
+    while the request thread waits with GIL released. Number of hashes
+    queued or running is capped by `PASSWORD_HASH_MAX_PENDING`, above that
+    PasswordHasherSaturated is raised instead of queueing more work. It is
+    raised as well when the hash does not finish within
+    `PASSWORD_HASH_TIMEOUT` seconds; the hash keeps its pending slot until
+    the worker is done with it.
+
+    Without init_app, or with zero workers, hashes run in calling thread.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'pbkdf2'
+        self.salt_length = 16
+        self.workers = 0
+        self.timeout = None
+        self._slots = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._metrics = self._empty_metrics()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure hasher from application config
+
+            :param app: Flask application
+        """
+        self.shutdown()
+
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.salt_length = app.config.get('PASSWORD_HASH_SALT_LENGTH', self.salt_length)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', None)
+
+        max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', None)
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending else None
+        self._metrics = self._empty_metrics()
+
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password_plaintext: str):
+        """
+            :param password_plaintext: Password to hash
+            :type password_plaintext: str
+
+            :return: hash string for password
+            :rtype: str
+        """
+        return self._run(
+            'hash',
+            generate_password_hash,
+            password_plaintext,
+            self.method,
+            self.salt_length
+        )
+
+    def check(self, password_hash: str, password_plaintext: str):
+        """
+            :param password_hash: stored password hash
+            :type password_hash: str
+            :param password_plaintext: Password to check
+            :type password_plaintext: str
+
+            :return: is password match
+            :rtype: bool
+        """
+        return self._run('check', check_password_hash, password_hash, password_plaintext)
+
+    def metrics(self):
+        """
+            :return: operation counts and latency, rejected operations
+            :rtype: dict
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._metrics['pending'],
+                'rejected': self._metrics['rejected'],
+                'hash': dict(self._metrics['hash']),
+                'check': dict(self._metrics['check']),
+            }
+
+    def shutdown(self):
+        """Stop worker processes, if any were started"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, operation: str, function, *args):
+        # pylint: disable-next=consider-using-with
+        if self._slots is not None and not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics['rejected'] += 1
+
+            raise PasswordHasherSaturated()
+
+        with self._lock:
+            self._metrics['pending'] += 1
+
+        started_at = time.perf_counter()
+        future = None
+
+        try:
+            if self.workers:
+                future = self._get_executor().submit(function, *args)
+                # Slot is released once the worker is done, not when waiting times out
+                future.add_done_callback(self._release)
+
+                return future.result(self.timeout)
+
+            return function(*args)
+
+        except TimeoutError as exception:
+            # concurrent.futures.TimeoutError is the builtin one since Python 3.11
+            with self._lock:
+                self._metrics['rejected'] += 1
+
+            raise PasswordHasherSaturated() from exception
+
+        finally:
+            duration = time.perf_counter() - started_at
+            self._record(operation, duration)
+            record_phase(f'password_{operation}', duration)
+
+            if future is None:
+                self._release()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Workers are spawned on first use, so they are never forked
+                # from a multithreaded process or before a server forks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+
+            return self._executor
+
+    def _record(self, operation: str, duration: float):
+        with self._lock:
+            metrics = self._metrics[operation]
+
+            metrics['count'] += 1
+            metrics['total_seconds'] += duration
+            metrics['max_seconds'] = max(metrics['max_seconds'], duration)
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._metrics['pending'] -= 1
+
+        if self._slots is not None:
+            self._slots.release()
+
+    @staticmethod
+    def _empty_metrics():
+        return {
+            'pending': 0,
+            'rejected': 0,
+            'hash': {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0},
+            'check': {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0},
+        }
@@ -0,0 +1,136 @@
+"""
+    On-demand profiling of individual requests with cProfile
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+from datetime import datetime
+
+from flask import g, request
+
+HEADER = 'X-Profile'
+QUERY_ARGUMENT = '_profile'
+
+# Keys profiles can be summarised by, abbreviations like tottime included
+SORT_KEYS = tuple(pstats.Stats.sort_arg_dict_default)
+
+
+class RequestProfiler():
+    """
+    Profile requests asking for it with `X-Profile` header or `_profile`
+    query argument, and store profiles as `.prof` files (pstats format).
+
+    Only active when `PROFILING_ENABLED` is on, otherwise no request hook
+    is registered at all. When `PROFILING_TOKEN` is set, header or query
+    argument must carry the token. At most `PROFILING_MAX_FILES` newest
+    profiles are kept in `PROFILING_DIRECTORY`.
+
+    Only the request thread is profiled, from before_request to
+    after_request hooks: bodies of streamed responses (stream_with_context
+    generators) are produced after the profile is stored, and async views
+    run on the event loop thread, so their work is missing from profiles.
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.token = None
+        self.max_files = 100
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register profiling request hooks, when profiling is enabled
+
+            :param app: Flask application
+        """
+        self.directory = app.config.get('PROFILING_DIRECTORY', None) or os.path.join(
+            app.instance_path,
+            'profiles'
+        )
+        self.token = app.config.get('PROFILING_TOKEN', None)
+        self.max_files = app.config.get('PROFILING_MAX_FILES', 100)
+
+        app.extensions['request_profiler'] = self
+
+        if not app.config.get('PROFILING_ENABLED', False):
+            return
+
+        app.before_request(self._start_profile)
+        app.after_request(self._stop_profile)
+
+    def _is_requested(self):
+        value = request.headers.get(HEADER, None) or request.args.get(QUERY_ARGUMENT, None)
+
+        if value is None:
+            return False
+
+        return value == self.token if self.token else value not in ('', '0')
+
+    def _start_profile(self):
+        if not self._is_requested():
+            return
+
+        g.request_profile = cProfile.Profile()
+        g.request_profile.enable()
+
+    def _stop_profile(self, response):
+        profile = g.pop('request_profile', None)
+
+        if profile is None:
+            return response
+
+        profile.disable()
+
+        endpoint = re.sub(r'[^\w.]+', '_', request.endpoint or 'unmatched')
+        profile_id = f'{datetime.now().strftime("%Y%m%dT%H%M%S%f")}-{request.method}-{endpoint}'
+
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(os.path.join(self.directory, f'{profile_id}.prof'))
+        self._remove_old_profiles()
+
+        response.headers['X-Profile-Id'] = profile_id
+
+        return response
+
+    def _remove_old_profiles(self):
+        for profile_id in self.list_profiles()[self.max_files:]:
+            os.remove(self._path(profile_id))
+
+    def _path(self, profile_id: str):
+        return os.path.join(self.directory, f'{os.path.basename(profile_id)}.prof')
+
+    def list_profiles(self):
+        """
+            :return: stored profile ids, newest first
+            :rtype: list
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        return sorted(
+            (name[:-len('.prof')] for name in os.listdir(self.directory) if name.endswith('.prof')),
+            reverse=True
+        )
+
+    def summary(self, profile_id: str, limit: int = 20, sort: str = 'cumulative'):
+        """
+            Hottest functions of a stored profile
+
+            Raises: FileNotFoundError for unknown profile. Sort key is
+            validated against SORT_KEYS by the caller
+
+            :param profile_id: profile id, as listed by list_profiles
+            :param limit: number of functions to report
+            :param sort: pstats sort key, like cumulative or time
+
+            :return: pstats report
+            :rtype: str
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(self._path(profile_id), stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+
+        return stream.getvalue()
@@ -0,0 +1,95 @@
+"""
+    Registry of compiled JSON Schema validators
+"""
+import json
+import os
+import threading
+
+import jsonschema
+
+
+class SchemaRegistry():
+    """
+    Load JSON Schemas from a directory once and keep a compiled validator
+    per schema, shared by every request handler.
+
+    Schemas are checked against their meta-schema when they are loaded,
+    not on every validation. With `SCHEMA_AUTO_RELOAD` enabled, schema file
+    modification time is checked on access and changed schemas are
+    recompiled, which is handy while developing.
+    """
+
+    def __init__(self, schema_directory: str, app=None):
+        self.schema_directory = schema_directory
+        self.auto_reload = False
+        self._validators = {}
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Compile every schema found in schema directory
+
+            :param app: Flask application
+        """
+        self.auto_reload = app.config.get('SCHEMA_AUTO_RELOAD', False)
+
+        for filename in sorted(os.listdir(self.schema_directory)):
+            if filename.endswith('.json'):
+                self._load(filename[:-len('.json')])
+
+        app.extensions['schema_registry'] = self
+
+    def validator(self, name: str):
+        """
+            :param name: schema name, file name without .json extension
+            :type name: str
+
+            :return: compiled validator for the schema
+            :rtype: jsonschema.protocols.Validator
+        """
+        entry = self._validators.get(name, None)
+
+        if entry is None or (self.auto_reload and entry[0] != self._modified_at(name)):
+            entry = self._load(name)
+
+        return entry[1]
+
+    def validate(self, name: str, data):
+        """
+            Validate data against named schema
+
+            Raises: jsonschema.ValidationError
+
+            :param name: schema name
+            :type name: str
+            :param data: decoded JSON payload
+        """
+        self.validator(name).validate(data)
+
+    def _path(self, name: str):
+        return os.path.join(self.schema_directory, f'{name}.json')
+
+    def _modified_at(self, name: str):
+        return os.stat(self._path(name)).st_mtime_ns
+
+    def _load(self, name: str):
+        """Read, check and compile schema, replacing cached validator"""
+        with self._lock:
+            modified_at = self._modified_at(name)
+
+            with open(self._path(name), mode='r', encoding='utf-8') as schema_file:
+                schema = json.load(schema_file)
+
+            validator_class = jsonschema.validators.validator_for(schema)
+            validator_class.check_schema(schema)
+
+            validator = validator_class(
+                schema,
+                format_checker=validator_class.FORMAT_CHECKER
+            )
+
+            self._validators[name] = (modified_at, validator)
+
+            return self._validators[name]
@@ -0,0 +1,216 @@
+"""
+    Serialisation of model instances to JSON, with column plans computed
+    once per model class
+"""
+import datetime
+import functools
+import json
+
+from flask import Response, current_app, has_app_context
+from sqlalchemy import DateTime, inspect
+from werkzeug.http import http_date
+
+try:
+    import orjson # pylint: disable=import-error
+except ImportError: # pragma: no cover
+    orjson = None
+
+DATETIME_FORMATTERS = {
+    'http': http_date,
+    'iso': datetime.datetime.isoformat,
+}
+
+
+class ModelSerializer():
+    """
+    Visible column plan of a model class: (field name, mapped attribute,
+    is datetime) for every column not listed in model `_hidden_columns`.
+
+    Values are read from mapped attributes directly, and datetimes are
+    formatted while the dictionary is built, so a representation is made
+    in a single pass over the plan.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+        mapper = inspect(model)
+        hidden_columns = getattr(model, '_hidden_columns', [])
+
+        self.plan = tuple(
+            (
+                # Plain str, column keys are str subclasses orjson rejects
+                str(column.key),
+                mapper.get_property_by_column(column).key,
+                isinstance(column.type, DateTime)
+            )
+            for column in mapper.columns
+            if column.key not in hidden_columns
+        )
+        self.field_names = tuple(name for name, _, _ in self.plan)
+
+    def to_dict(self, instance, fields=None):
+        """
+            :param instance: model instance
+            :param fields: names of fields to include, all when None
+            :type fields: frozenset
+
+            :return: field values as they are stored
+            :rtype: dict
+        """
+        return {
+            name: getattr(instance, attribute)
+            for name, attribute, _ in self.plan
+            if fields is None or name in fields
+        }
+
+    def serialize(self, instance, fields=None):
+        """
+            :param instance: model instance
+            :param fields: names of fields to include, all when None
+            :type fields: frozenset
+
+            :return: JSON compatible representation, datetimes formatted
+                     as configured by JSON_DATETIME_FORMAT
+            :rtype: dict
+        """
+        format_datetime = datetime_formatter()
+        data = {}
+
+        for name, attribute, is_datetime in self.plan:
+            if fields is not None and name not in fields:
+                continue
+
+            value = getattr(instance, attribute)
+
+            if is_datetime and value is not None:
+                value = format_datetime(value)
+
+            data[name] = value
+
+        return data
+
+    def columns(self, fields=None):
+        """
+            Column expressions for a column-limited SELECT, labelled with
+            field names
+
+            :param fields: names of fields to select, all when None
+            :type fields: frozenset
+
+            :return: labelled columns, in plan order
+            :rtype: list
+        """
+        return [
+            getattr(self.model, attribute).label(name)
+            for name, attribute, _ in self.plan
+            if fields is None or name in fields
+        ]
+
+    def serialize_rows(self, rows, fields=None):
+        """
+            Serialise result rows of a SELECT of columns()
+
+            :param rows: iterable of result rows
+            :param fields: names of fields to include, all selected when None
+            :type fields: frozenset
+
+            :return: generator of JSON compatible representations
+        """
+        format_datetime = datetime_formatter()
+        row_plan = None
+
+        for row in rows:
+            mapping = row._mapping # pylint: disable=protected-access
+
+            if row_plan is None:
+                row_plan = [
+                    (name, is_datetime)
+                    for name, _, is_datetime in self.plan
+                    if name in mapping and (fields is None or name in fields)
+                ]
+
+            data = {}
+
+            for name, is_datetime in row_plan:
+                value = mapping[name]
+
+                if is_datetime and value is not None:
+                    value = format_datetime(value)
+
+                data[name] = value
+
+            yield data
+
+    def parse_fields(self, value: str, allowed=None):
+        """
+            Parse sparse fieldset, comma separated field names
+
+            Raises: ValueError when unknown field is requested
+
+            :param value: `fields` query argument, or None
+            :type value: str
+            :param allowed: names allowed in fieldset, all visible when None
+
+            :return: requested field names, None when fieldset not given
+            :rtype: frozenset
+        """
+        if value is None:
+            return None
+
+        fields = frozenset(field.strip() for field in value.split(',') if field.strip())
+        unknown = fields.difference(self.field_names if allowed is None else allowed)
+
+        if not fields or unknown:
+            raise ValueError(f'Unknown fields requested: {", ".join(sorted(unknown))}')
+
+        return fields
+
+
+@functools.cache
+def serializer_for(model):
+    """
+        :param model: model class
+        :return: serializer with column plan of the model class
+        :rtype: ModelSerializer
+    """
+    return ModelSerializer(model)
+
+
+def datetime_formatter():
+    """
+        :return: function formatting datetime as configured by
+                 JSON_DATETIME_FORMAT, HTTP date by default
+    """
+    datetime_format = 'http'
+
+    if has_app_context():
+        datetime_format = current_app.config.get('JSON_DATETIME_FORMAT', datetime_format)
+
+    return DATETIME_FORMATTERS[datetime_format]
+
+
+def dumps(data):
+    """
+        Encode JSON compatible data, with orjson when it is installed
+
+        :return: encoded JSON
+        :rtype: bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data) # pylint: disable=no-member
+
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(data, status: int = 200):
+    """
+        Build JSON response without a round trip through jsonify
+
+        :param data: JSON compatible data
+        :param status: HTTP status code
+        :type status: int
+
+        :rtype: flask.Response
+    """
+    return Response(dumps(data), status=status, mimetype='application/json')
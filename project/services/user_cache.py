@@ -0,0 +1,335 @@
+"""
+    Read-through cache of user representations with pluggable backends
+"""
+import fnmatch
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import json as flask_json
+
+
+class NullCacheBackend():
+    """Backend caching nothing, used when cache is disabled"""
+
+    evictions = 0
+
+    def get(self, _key):
+        """:return: always None"""
+        return None
+
+    def get_many(self, _keys):
+        """:return: always empty mapping"""
+        return {}
+
+    def set(self, key, value):
+        """Ignore value"""
+
+    def delete(self, key):
+        """Nothing to delete"""
+
+    def clear(self):
+        """Nothing to clear"""
+
+
+class LRUCacheBackend():
+    """
+    In-process cache keeping up to `max_entries` most recently used values,
+    each valid for `ttl` seconds. Values are stored as they are, without
+    copying or serialisation.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """:return: cached value, None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def get_many(self, keys):
+        """:return: key to value mapping of cached values, missing or
+                    expired ones left out
+        """
+        values = {}
+
+        for key in keys:
+            value = self.get(key)
+
+            if value is not None:
+                values[key] = value
+
+        return values
+
+    def set(self, key, value):
+        """Store value, evicting least recently used one when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove value, if cached"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every value"""
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedCacheBackend():
+    """
+    Cache shared by every worker process, stored in a Redis-like server.
+
+    `client` needs `get(key)`, `mget(keys)`, `set(key, value, ex=seconds)`,
+    `delete(*keys)` and `scan_iter(match=pattern)`, values are stored as
+    JSON under `prefix`. Expiry and eviction are handled by the server, so
+    evictions are not counted here.
+    """
+
+    evictions = 0
+
+    def __init__(self, client, ttl: float, prefix: str = 'users:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        """:return: cached value, None when missing"""
+        value = self.client.get(f'{self.prefix}{key}')
+
+        return None if value is None else json.loads(value)
+
+    def get_many(self, keys):
+        """:return: key to value mapping of cached values, read by a single
+                    MGET round trip
+        """
+        keys = list(keys)
+
+        if not keys:
+            return {}
+
+        values = self.client.mget([f'{self.prefix}{key}' for key in keys])
+
+        return {
+            key: json.loads(value) for key, value in zip(keys, values) if value is not None
+        }
+
+    def set(self, key, value):
+        """Store value encoded as JSON by the app JSON provider"""
+        self.client.set(f'{self.prefix}{key}', flask_json.dumps(value), ex=int(self.ttl))
+
+    def delete(self, key):
+        """Remove value, if cached"""
+        self.client.delete(f'{self.prefix}{key}')
+
+    def clear(self):
+        """Remove every value under the prefix, stored by any process.
+        Keys are found by SCAN, in batches, so the server is not blocked"""
+        batch = []
+
+        for key in self.client.scan_iter(match=f'{self.prefix}*'):
+            batch.append(key)
+
+            if len(batch) == 500:
+                self.client.delete(*batch)
+                batch = []
+
+        if batch:
+            self.client.delete(*batch)
+
+
+class InMemoryCacheClient():
+    """
+    Local stand-in for a Redis client, implementing the subset used by
+    SharedCacheBackend. Useful for tests and single process deployments.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """:return: stored value, None when missing or expired"""
+        with self._lock:
+            expires_at, value = self._values.get(key, (None, None))
+
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._values[key]
+
+                return None
+
+            return value
+
+    def mget(self, keys):
+        """:return: list of stored values, None for missing or expired ones"""
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        """Store value for `ex` seconds"""
+        with self._lock:
+            self._values[key] = (None if ex is None else time.monotonic() + ex, value)
+
+    def delete(self, *keys):
+        """Remove values"""
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+    def scan_iter(self, match='*'):
+        """:return: iterator of stored keys matching glob-style pattern"""
+        with self._lock:
+            keys = list(self._values)
+
+        return iter([key for key in keys if fnmatch.fnmatchcase(key, match)])
+
+
+class UserCache():
+    """
+    Cache of user representations keyed by user id, in front of the
+    database for user lookups by id, single or batched.
+
+    Backend is picked by `USER_CACHE_BACKEND`:
+        * lru - in-process LRU cache with TTL (default)
+        * redis - shared cache at `USER_CACHE_URL`, needs redis package
+        * memory - shared cache backed by an in-memory stand-in
+        * none - caching disabled
+
+    Controllers mutating users must call invalidate() once changes are
+    committed.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCacheBackend()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create backend configured for application
+
+            :param app: Flask application
+        """
+        self.backend = self._create_backend(app.config)
+        self.hits = 0
+        self.misses = 0
+
+        app.extensions['user_cache'] = self
+
+    def get(self, user_id: int):
+        """
+            :param user_id: user ID
+            :type user_id: int
+
+            :return: cached user representation, None on cache miss
+            :rtype: dict
+        """
+        value = self.backend.get(user_id) # pylint: disable=assignment-from-none
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def get_many(self, user_ids):
+        """
+            :param user_ids: user IDs
+            :type user_ids: list
+
+            :return: user ID to cached user representation mapping, users
+                     missing from cache left out
+            :rtype: dict
+        """
+        values = self.backend.get_many(user_ids)
+
+        with self._lock:
+            self.hits += len(values)
+            self.misses += len(user_ids) - len(values)
+
+        return values
+
+    def set(self, user_id: int, value: dict):
+        """
+            :param user_id: user ID
+            :type user_id: int
+            :param value: user representation
+            :type value: dict
+        """
+        self.backend.set(user_id, value)
+
+    def invalidate(self, user_id: int):
+        """
+            Drop cached user representation
+
+            :param user_id: user ID
+            :type user_id: int
+        """
+        self.backend.delete(user_id)
+
+    def clear(self):
+        """Drop every cached user representation"""
+        self.backend.clear()
+
+    def metrics(self):
+        """
+            :return: backend name, hit, miss and eviction counters
+            :rtype: dict
+        """
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+        }
+
+    @staticmethod
+    def _create_backend(config):
+        backend = config.get('USER_CACHE_BACKEND', 'lru')
+        ttl = config.get('USER_CACHE_TTL', 60)
+
+        if backend == 'lru':
+            return LRUCacheBackend(config.get('USER_CACHE_MAX_ENTRIES', 10000), ttl)
+
+        if backend == 'memory':
+            return SharedCacheBackend(InMemoryCacheClient(), ttl)
+
+        if backend == 'redis':
+            import redis # pylint: disable=import-outside-toplevel,import-error
+
+            return SharedCacheBackend(redis.Redis.from_url(config['USER_CACHE_URL']), ttl)
+
+        if backend == 'none':
+            return NullCacheBackend()
+
+        raise ValueError(f'Unknown user cache backend: {backend}')
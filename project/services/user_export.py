@@ -0,0 +1,244 @@
+"""
+    Export of the users table as CSV, NDJSON or Parquet, read in chunks
+"""
+import csv
+import datetime
+import io
+
+import sqlalchemy as sa
+
+from project.models.user import User
+from project.services.serialization import dumps, serializer_for
+
+try:
+    import pyarrow # pylint: disable=import-error
+    import pyarrow.parquet # pylint: disable=import-error
+except ImportError: # pragma: no cover
+    pyarrow = None
+
+user_serializer = serializer_for(User)
+
+
+class CsvWriter():
+    """CSV with a header line, datetimes in ISO 8601"""
+
+    mimetype = 'text/csv'
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._writer.writerow(fields)
+
+    def write(self, rows):
+        """:return: encoded lines of the rows, with header before first ones"""
+        self._writer.writerows(
+            [value.isoformat() if isinstance(value, datetime.datetime) else value
+             for value in row]
+            for row in rows
+        )
+
+        return self._drain()
+
+    def close(self):
+        """:return: pending output"""
+        return self._drain()
+
+    def _drain(self):
+        data = self._buffer.getvalue().encode('utf-8')
+        self._buffer.seek(0)
+        self._buffer.truncate()
+
+        return data
+
+
+class NdjsonWriter():
+    """A JSON object per line, datetimes in ISO 8601"""
+
+    mimetype = 'application/x-ndjson'
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def write(self, rows):
+        """:return: encoded lines of the rows"""
+        return b''.join(
+            dumps({
+                name: value.isoformat() if isinstance(value, datetime.datetime) else value
+                for name, value in zip(self.fields, row)
+            }) + b'\n'
+            for row in rows
+        )
+
+    def close(self):
+        """:return: nothing is pending"""
+        return b''
+
+
+class _ParquetSink():
+    """Writable file object handing out what was written since last drain"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        """Keep written bytes until drained"""
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+
+        return len(data)
+
+    def tell(self):
+        """:return: number of bytes written so far"""
+        return self._position
+
+    def flush(self):
+        """Nothing to flush"""
+
+    def close(self):
+        """Mark sink closed"""
+        self.closed = True
+
+    def drain(self):
+        """:return: bytes written since last drain"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+
+        return data
+
+
+class ParquetWriter():
+    """
+    Parquet file with a row group per chunk, built column by column from
+    the rows. Footer is written on close(), so the file is complete only
+    once every chunk is written.
+    """
+
+    mimetype = 'application/vnd.apache.parquet'
+
+    ARROW_TYPES = {
+        int: 'int64',
+        str: 'string',
+        bool: 'bool_',
+        datetime.datetime: 'timestamp',
+    }
+
+    def __init__(self, fields):
+        if pyarrow is None:
+            raise ValueError('Parquet export needs pyarrow package')
+
+        columns = User.__table__.c
+        self.fields = fields
+        self.schema = pyarrow.schema([
+            (name, self._arrow_type(columns[name].type.python_type)) for name in fields
+        ])
+        self._sink = _ParquetSink()
+        self._writer = pyarrow.parquet.ParquetWriter(self._sink, self.schema)
+
+    def write(self, rows):
+        """:return: encoded row group of the rows"""
+        columns = list(zip(*rows))
+        self._writer.write_batch(pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+
+        return self._sink.drain()
+
+    def close(self):
+        """:return: file footer"""
+        self._writer.close()
+
+        return self._sink.drain()
+
+    def _arrow_type(self, python_type):
+        name = self.ARROW_TYPES[python_type]
+
+        return pyarrow.timestamp('us') if name == 'timestamp' else getattr(pyarrow, name)()
+
+
+EXPORT_WRITERS = {
+    'csv': CsvWriter,
+    'ndjson': NdjsonWriter,
+    'parquet': ParquetWriter,
+}
+
+
+class UserExport():
+    """
+    Export of visible user columns, optionally limited to users written
+    after `since` watermark.
+
+    Rows are plain tuples of a column-limited SELECT, read from a
+    server-side cursor `chunk_size` at a time, and every chunk is encoded
+    as a whole, so memory usage does not depend on the size of the table
+    and no ORM entity is hydrated.
+
+    `watermark` is when the latest exported user was written, but no later
+    than `settle_seconds` ago, so writes committed late with an earlier
+    timestamp are left for the next export rather than skipped. Passed as
+    `since` to the next export, it exports users created or updated in the
+    meantime. Deleted users are not tracked by exports.
+
+    Timestamps are stored as naive local time, `since` with a UTC offset
+    is converted to it.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, session, export_format: str, *, fields=None, since=None,
+                 chunk_size: int = 1000, settle_seconds: float = 0):
+        if export_format not in EXPORT_WRITERS:
+            raise ValueError(
+                f'Unsupported export format: {export_format}, '
+                f'use one of: {", ".join(EXPORT_WRITERS)}'
+            )
+
+        self.session = session
+        self.fields = [name for name in user_serializer.field_names
+                       if fields is None or name in fields]
+        self.since = None if since is None else User.stored_timestamp(since)
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.writer = EXPORT_WRITERS[export_format](self.fields)
+
+        # Upper bound of the export, users written while it runs are left
+        # for the next one
+        self.watermark = session.execute(sa.select(sa.func.max(User.changed_at()))).scalar()
+        horizon = datetime.datetime.now() - datetime.timedelta(seconds=settle_seconds)
+
+        if self.watermark is not None and self.watermark > horizon:
+            self.watermark = horizon
+
+        if self.since is not None and (self.watermark is None or self.watermark < self.since):
+            self.watermark = self.since
+
+    @property
+    def mimetype(self):
+        """:return: MIME type of the export format"""
+        return self.writer.mimetype
+
+    def query(self):
+        """:return: SELECT of exported users, ordered by id"""
+        # pylint: disable=protected-access
+        query = sa.select(*user_serializer.columns(frozenset(self.fields))).order_by(User._id)
+
+        if self.since is not None:
+            query = query.where(User.changed_at() > self.since)
+
+        return query.where(User.changed_at() <= self.watermark)
+
+    def __iter__(self):
+        """:return: generator of encoded export, chunk by chunk"""
+        if self.watermark is not None:
+            result = self.session.execute(
+                self.query(), execution_options={'yield_per': self.chunk_size}
+            )
+
+            for rows in result.partitions():
+                self.rows += len(rows)
+
+                yield self.writer.write(rows)
+
+        yield self.writer.close()
@@ -2,13 +2,16 @@
 """
 import os
 import sys
+from unittest import mock
+
 import pytest
 
 # Assuming conftest.py is inside the tests directory
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # pylint: disable=wrong-import-position
-from project import create_app, db # pylint: disable=import-error
+import config # pylint: disable=import-error
+from project import async_db, create_app, db, ensure_schema # pylint: disable=import-error
 from project.models.user import User # pylint: disable=import-error
 # pylint: enable=wrong-import-position
 
@@ -33,7 +36,26 @@ def test_client():
 
     # Set the Testing configuration prior to creating the Flask application
     os.environ['CONFIG_TYPE'] = 'config.TestingConfig'
-    flask_app = create_app()
+
+    yield from _app_test_client(create_app())
+
+
+@pytest.fixture(scope='module')
+def async_test_client():
+    """Prepare instance of Flask app serving users controller async, see
+    test_client.
+    """
+
+    os.environ['CONFIG_TYPE'] = 'config.TestingConfig'
+
+    with mock.patch.object(config.TestingConfig, 'ASYNC_CONTROLLERS', ('project.http.users',)):
+        flask_app = create_app()
+
+    yield from _app_test_client(flask_app)
+
+
+def _app_test_client(flask_app):
+    ensure_schema(flask_app)
 
     # Create a test client using the Flask application
     with flask_app.test_client() as testing_client:
@@ -41,6 +63,7 @@ def test_client():
         with flask_app.app_context():
             yield testing_client  # this is where the testing happens!
 
+            async_db.dispose()
             db.session.remove()
             db.drop_all()
 
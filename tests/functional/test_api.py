@@ -1,6 +1,13 @@
 """Functional tests for the API"""
+import json
 import re
 
+import sqlalchemy as sa
+
+from project import db, password_hasher, user_cache # pylint: disable=import-error
+from project.exceptions.password_hasher_saturated import PasswordHasherSaturated # pylint: disable=import-error
+from project.models.user import User # pylint: disable=import-error
+
 
 def test_default_status_response(test_client):
     """GIVEN a Flask application configured for testing
@@ -485,3 +492,350 @@ def test_user_revoke_consent(test_client):
 
     assert response.status_code == 404
     assert response.is_json
+
+
+def test_get_user_collection_keyset_pagination(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users' page is requested (GET) with a limit smaller than
+    the number of users
+
+    THEN response must contain a single page and link to the next page,
+    following links must return every user exactly once
+    """
+
+    for index in range(3):
+        data = {
+            'email': f'page{index}@example.com',
+            'name': f'page{index}',
+            'consent' : True
+        }
+        response = test_client.post('/users', json=data)
+        assert response.status_code == 201
+
+    expected_ids = [user['id'] for user in test_client.get('/users').json]
+
+    response = test_client.get('/users?limit=2')
+
+    assert response.status_code == 200
+    assert len(response.json) == 2
+    assert 'rel="next"' in response.headers['Link']
+
+    received_ids = []
+    url = '/users?limit=2'
+
+    while url:
+        response = test_client.get(url)
+        assert response.status_code == 200
+
+        received_ids += [user['id'] for user in response.json]
+
+        link = response.headers.get('Link', None)
+        url = re.match(r'^<(.+)>; rel="next"$', link).group(1) if link else None
+
+    assert received_ids == expected_ids
+    assert received_ids == sorted(received_ids)
+
+
+def test_get_user_collection_with_invalid_cursor(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users' page is requested (GET) with invalid limit or after
+
+    THEN response must return an error 400
+    """
+
+    for query in ('limit=0', 'limit=abc', 'after=-1', 'stream=xml'):
+        response = test_client.get(f'/users?{query}')
+
+        assert response.status_code == 400
+        assert response.is_json
+
+
+def test_stream_user_collection(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users' page is requested (GET) in stream mode
+
+    THEN response must contain the whole collection as JSON array or NDJSON
+    """
+
+    expected = test_client.get(f'/users?limit={10 ** 6}').json
+
+    response = test_client.get('/users?stream=json')
+
+    assert response.status_code == 200
+    assert response.is_json
+    assert response.json == expected
+
+    response = test_client.get('/users?stream=ndjson')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = response.get_data(as_text=True).splitlines()
+
+    assert [json.loads(line) for line in lines] == expected
+
+
+def test_create_user_when_password_hasher_saturated(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN adding a new user with password while password hasher
+    is saturated
+
+    THEN response must return an error 503 with Retry-After header
+    """
+
+    def saturated_hash(_password_plaintext):
+        raise PasswordHasherSaturated()
+
+    monkeypatch.setattr(password_hasher, 'hash', saturated_hash)
+
+    data = {
+        'email': 'saturated@example.com',
+        'name': 'saturated',
+        'password': 'password123',
+        'consent' : True,
+    }
+
+    response = test_client.post('/users', json=data)
+
+    assert response.status_code == 503
+    assert response.is_json
+    assert 'Retry-After' in response.headers
+
+
+def test_get_password_hasher_metrics(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/diagnostics/password-hasher' page is requested (GET)
+
+    THEN response must contain hashing metrics
+    """
+
+    response = test_client.get('/diagnostics/password-hasher')
+
+    assert response.status_code == 200
+    assert 'hash' in response.json
+    assert 'rejected' in response.json
+
+
+def test_cached_user_is_invalidated_on_update(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user is requested twice, updated and requested again
+
+    THEN second request must be served from cache, request after update
+    must return updated user
+    """
+
+    data = {
+        'email': 'cached@example.com',
+        'name': 'cached',
+        'consent' : True
+    }
+
+    response = test_client.post('/users', json=data)
+    user_id = response.json['id']
+
+    test_client.get(f'/users/{user_id}')
+    hits = test_client.get('/diagnostics/user-cache').json['hits']
+
+    response = test_client.get(f'/users/{user_id}')
+
+    assert response.json['name'] == 'cached'
+    assert test_client.get('/diagnostics/user-cache').json['hits'] == hits + 1
+
+    response = test_client.patch(f'/users/{user_id}', json={'name': 'renamed'})
+
+    assert response.status_code == 200
+
+    response = test_client.get(f'/users/{user_id}')
+
+    assert response.status_code == 200
+    assert response.json['name'] == 'renamed'
+
+
+def test_get_user_with_sparse_fieldset(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user and user collection are requested with fields argument
+
+    THEN response must contain only requested fields, unknown fields
+    must return an error 400
+    """
+
+    data = {
+        'email': 'sparse@example.com',
+        'name': 'sparse',
+        'consent' : True
+    }
+
+    user_id = test_client.post('/users', json=data).json['id']
+
+    response = test_client.get(f'/users/{user_id}?fields=id,email')
+
+    assert response.status_code == 200
+    assert response.json == {'id': user_id, 'email': 'sparse@example.com'}
+
+    response = test_client.get('/users?fields=email')
+
+    assert response.status_code == 200
+    assert all(list(item) == ['email'] for item in response.json)
+
+    response = test_client.get(f'/users/{user_id}?fields=password')
+
+    assert response.status_code == 400
+    assert response.is_json
+
+
+def test_sparse_fieldset_limits_selected_columns(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user and user collection are requested with fields argument
+
+    THEN only requested columns must be selected from the database
+    """
+
+    data = {
+        'email': 'projection@example.com',
+        'name': 'projection',
+        'memo': 'large memo',
+        'consent' : True
+    }
+
+    user_id = test_client.post('/users', json=data).json['id']
+    user_cache.clear()
+
+    statements = []
+
+    def record_statement(_conn, _cursor, statement, *_):
+        statements.append(statement)
+
+    engine = db.engine
+    sa.event.listen(engine, 'before_cursor_execute', record_statement)
+
+    try:
+        response = test_client.get(f'/users/{user_id}?fields=email')
+        collection_response = test_client.get('/users?fields=memo')
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', record_statement)
+
+    assert response.json == {'email': 'projection@example.com'}
+    assert {'memo': 'large memo'} in collection_response.json
+
+    selects = [statement for statement in statements if 'FROM users' in statement]
+
+    assert all('remember_token' not in statement for statement in selects)
+    assert 'users.email' in selects[0]
+    assert 'users.memo' not in selects[0]
+    assert 'users.memo' in selects[-1]
+    assert 'users.name' not in selects[-1]
+
+
+def test_get_db_pool_metrics(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/diagnostics/db-pool' page is requested (GET)
+
+    THEN response must contain connection pool usage
+    """
+
+    response = test_client.get('/diagnostics/db-pool')
+
+    assert response.status_code == 200
+    assert response.json['pool'] == 'InstrumentedQueuePool'
+    assert response.json['checked_out'] >= 1
+    assert response.json['wait']['count'] > 0
+
+
+def test_update_and_delete_user_single_statement(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user name is amended and user is deleted
+
+    THEN update must issue a single statement, password must not be
+    part of it, and its outbox message insert, deletion a single
+    statement, its tombstone and outbox message inserts
+    """
+
+    data = {
+        'email': 'single.statement@example.com',
+        'name': 'single',
+        'password': 'password123',
+        'consent' : True
+    }
+
+    user_id = test_client.post('/users', json=data).json['id']
+
+    statements = []
+
+    def record_statement(_conn, _cursor, statement, *_):
+        statements.append(statement)
+
+    engine = db.engine
+    sa.event.listen(engine, 'before_cursor_execute', record_statement)
+
+    try:
+        response = test_client.patch(f'/users/{user_id}', json={'name': 'renamed'})
+        update_statements = list(statements)
+        statements.clear()
+
+        delete_response = test_client.delete(f'/users/{user_id}')
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', record_statement)
+
+    assert response.status_code == 200
+    assert response.json['name'] == 'renamed'
+    assert response.json['updated_at'] is not None
+    assert response.headers['ETag']
+    assert len(update_statements) == 2
+    assert update_statements[0].startswith('UPDATE users SET')
+    assert 'RETURNING' in update_statements[0]
+    assert 'password' not in update_statements[0].split('RETURNING')[0]
+    assert update_statements[1].startswith('INSERT INTO outbox_messages')
+
+    assert delete_response.status_code == 202
+    assert len(statements) == 3
+    assert statements[0].startswith('DELETE FROM users')
+    assert statements[1].startswith('INSERT INTO user_tombstones')
+    assert statements[2].startswith('INSERT INTO outbox_messages')
+
+    response = test_client.delete(f'/users/{user_id}')
+
+    assert response.status_code == 404
+    assert response.json == {'error': f'User not found: id: {user_id}'}
+    assert test_client.patch(f'/users/{user_id}', json={'name': 'x'}).status_code == 404
+
+
+def test_update_user_keeps_password_hash(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user is amended through setters, with If-Match, without password
+
+    THEN stored password hash must not be hashed again
+    """
+
+    data = {
+        'email': 'keep.password@example.com',
+        'name': 'keep',
+        'password': 'password123',
+        'consent' : True
+    }
+
+    response = test_client.post('/users', json=data)
+    user_id = response.json['id']
+
+    response = test_client.patch(
+        f'/users/{user_id}',
+        json={'memo': 'memo'},
+        headers={'If-Match': response.headers['ETag']}
+    )
+
+    assert response.status_code == 200
+
+    user = db.session.get(User, user_id)
+    db.session.refresh(user)
+
+    assert user.is_password_correct('password123')
@@ -0,0 +1,171 @@
+"""Functional tests for the async variant of the users controller"""
+import inspect
+
+from project import user_cache # pylint: disable=import-error
+
+
+def test_async_views_registered(async_test_client):
+    """GIVEN a Flask application serving users controller async
+
+    WHEN its views are inspected
+
+    THEN users views must be coroutine functions on the usual endpoints
+    """
+
+    view_functions = async_test_client.application.view_functions
+
+    assert inspect.iscoroutinefunction(view_functions['user_resources.get_user'])
+    assert inspect.iscoroutinefunction(view_functions['user_resources.get_user_collection'])
+    assert not inspect.iscoroutinefunction(
+        view_functions['user_bulk_resources.create_user_collection']
+    )
+
+
+def test_async_user_lifecycle(async_test_client):
+    """GIVEN a Flask application serving users controller async
+
+    WHEN user is created, read, listed, amended and deleted
+
+    THEN responses must match the sync controller ones
+    """
+
+    response = async_test_client.post('/users', json={
+        'email': 'async@example.com',
+        'name': 'Async',
+        'password': 'password123',
+        'consent': True
+    })
+
+    assert response.status_code == 201
+    assert 'password' not in response.json
+    user_id = response.json['id']
+    etag = response.headers['ETag']
+
+    response = async_test_client.post('/users', json={
+        'email': 'async@example.com',
+        'name': 'Async',
+        'consent': True
+    })
+
+    assert response.status_code == 400
+    assert response.json == {'error': 'Error creating User entity.'}
+
+    user_cache.clear()
+    response = async_test_client.get(f'/users/{user_id}')
+
+    assert response.status_code == 200
+    assert response.json['email'] == 'async@example.com'
+    assert response.headers['ETag'] == etag
+    assert async_test_client.get(
+        f'/users/{user_id}', headers={'If-None-Match': etag}
+    ).status_code == 304
+
+    response = async_test_client.get('/users?fields=email&limit=1')
+
+    assert response.status_code == 200
+    assert response.json[0] == {'email': 'async@example.com'}
+
+    response = async_test_client.get('/users?stream=ndjson&fields=email')
+
+    assert response.status_code == 200
+    assert response.data == b'{"email":"async@example.com"}\n'
+
+    response = async_test_client.patch(f'/users/{user_id}', json={'memo': 'async memo'})
+
+    assert response.status_code == 200
+    assert response.json['memo'] == 'async memo'
+    assert async_test_client.get(f'/users/{user_id}').json['memo'] == 'async memo'
+
+    response = async_test_client.patch(
+        f'/users/{user_id}',
+        json={'name': 'Outdated'},
+        headers={'If-Match': etag}
+    )
+
+    assert response.status_code == 412
+
+    response = async_test_client.delete(f'/users/{user_id}')
+
+    assert response.status_code == 202
+    assert async_test_client.get(f'/users/{user_id}').status_code == 404
+    assert async_test_client.delete(f'/users/{user_id}').json == {
+        'error': f'User not found: id: {user_id}'
+    }
+
+
+def test_async_consent_revoked(async_test_client):
+    """GIVEN a Flask application serving users controller async
+
+    WHEN user consent is revoked, or invalid update is sent
+
+    THEN user must be deleted, invalid update rejected
+    """
+
+    user_id = async_test_client.post('/users', json={
+        'email': 'async-consent@example.com',
+        'name': 'Consent',
+        'consent': True
+    }).json['id']
+
+    assert async_test_client.patch(f'/users/{user_id}', json={'unknown': 1}).status_code == 400
+
+    response = async_test_client.patch(f'/users/{user_id}', json={'consent': False})
+
+    assert response.status_code == 202
+    assert async_test_client.get(f'/users/{user_id}').status_code == 404
+
+
+def test_async_user_batch(async_test_client):
+    """GIVEN a Flask application serving users controller async
+
+    WHEN users are looked up by a list of ids
+
+    THEN users must be listed in the order of requested ids
+    """
+
+    user_id = async_test_client.post('/users', json={
+        'email': 'async-batch@example.com',
+        'name': 'Batch',
+        'consent': True
+    }).json['id']
+
+    user_cache.clear()
+
+    assert async_test_client.get(f'/users?ids={user_id + 1},{user_id}&fields=id').json == [
+        {'id': user_id + 1, 'error': f'User not found: id: {user_id + 1}'},
+        {'id': user_id},
+    ]
+    assert async_test_client.post(
+        '/users/batch', json={'ids': [user_id]}
+    ).json[0]['email'] == 'async-batch@example.com'
+
+
+def test_async_outbox(async_test_client):
+    """GIVEN a Flask application serving users controller async
+
+    WHEN a user is created, updated with and without its setters, and
+    deleted
+
+    THEN every change must be written to the outbox
+    """
+
+    dispatcher = async_test_client.application.extensions['outbox']
+    dispatcher.run(once=True)
+    dispatcher.sink.messages.clear()
+
+    user_id = async_test_client.post('/users', json={
+        'email': 'async-outbox@example.com',
+        'name': 'Outbox',
+        'consent': True
+    }).json['id']
+    async_test_client.patch(f'/users/{user_id}', json={'name': 'Renamed'})
+    async_test_client.patch(f'/users/{user_id}', json={'password': 'password456'})
+    async_test_client.delete(f'/users/{user_id}')
+
+    dispatcher.run(once=True)
+
+    assert [message['type'] for message in dispatcher.sink.messages] == [
+        'user.created', 'user.updated', 'user.updated', 'user.deleted'
+    ]
+    assert dispatcher.sink.messages[1]['data']['user']['name'] == 'Renamed'
+    assert dispatcher.sink.messages[2]['data']['user']['name'] == 'Renamed'
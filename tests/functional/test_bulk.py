@@ -0,0 +1,294 @@
+"""Functional tests for the bulk user import API"""
+import json
+from datetime import datetime, timedelta, timezone
+
+from project.http import users_bulk # pylint: disable=import-error
+
+
+def test_bulk_create_users_from_json_array(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/bulk' page is requested by (POST) with JSON array,
+    containing valid, invalid and duplicate users
+
+    THEN valid users must be created, other items must be reported as failed
+    """
+
+    test_client.application.config['USERS_BULK_BATCH_SIZE'] = 2
+
+    data = [
+        {'email': 'bulk1@example.com', 'name': 'bulk1', 'consent': True},
+        {'email': 'bulk2@example.com', 'name': 'bulk2', 'consent': True,
+         'password': 'password123'},
+        {'email': 'bulk1@example.com', 'name': 'duplicate', 'consent': True},
+        {'email': 'bulk3@example.com', 'consent': True},
+        {'email': 'bulk4@example.com', 'name': 'bulk4', 'consent': True},
+    ]
+
+    response = test_client.post('/users/bulk', json=data)
+
+    assert response.status_code == 200
+    assert response.is_json
+
+    json_data = response.json
+
+    assert json_data['created'] == 3
+    assert json_data['failed'] == 2
+    assert [result['index'] for result in json_data['results']] == [0, 1, 2, 3, 4]
+    assert [result['status'] for result in json_data['results']] == [201, 201, 400, 400, 201]
+
+    response = test_client.get(f"/users/{json_data['results'][1]['id']}")
+
+    assert response.status_code == 200
+    assert response.json['email'] == 'bulk2@example.com'
+    assert 'password' not in response.json
+
+
+def test_bulk_create_users_from_ndjson(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/bulk' page is requested by (POST) with NDJSON stream
+
+    THEN every valid line must create a user, malformed line must fail
+    """
+
+    lines = [
+        json.dumps({'email': 'ndjson1@example.com', 'name': 'ndjson1', 'consent': True}),
+        '{"email": ',
+        '',
+        json.dumps({'email': 'ndjson2@example.com', 'name': 'ndjson2', 'consent': True}),
+    ]
+
+    response = test_client.post(
+        '/users/bulk',
+        data='\n'.join(lines),
+        content_type='application/x-ndjson'
+    )
+
+    assert response.status_code == 200
+
+    json_data = response.json
+
+    assert json_data['created'] == 2
+    assert [result['status'] for result in json_data['results']] == [201, 400, 201]
+
+
+def test_bulk_create_users_with_invalid_payload(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/bulk' page is requested by (POST) with JSON object
+
+    THEN response must return an error 400
+    """
+
+    response = test_client.post('/users/bulk', json={'email': 'bulk@example.com'})
+
+    assert response.status_code == 400
+    assert response.is_json
+
+
+def test_bulk_delete_users_by_ids(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/bulk/revoke-consent' page is requested by (POST) with
+    ids of cached, uncached and unknown users, first as a dry run
+
+    THEN dry run must only count users, then listed users must be deleted
+    in batches and dropped from cache
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_BULK_BATCH_SIZE', 2)
+
+    user_ids = [
+        result['id'] for result in test_client.post('/users/bulk', json=[
+            {'email': f'revoke{index}@example.com', 'name': 'revoke', 'consent': True}
+            for index in range(3)
+        ]).json['results']
+    ]
+    unknown_id = user_ids[-1] + 100
+
+    assert test_client.get(f'/users/{user_ids[0]}').status_code == 200
+
+    payload = {'ids': user_ids + [unknown_id], 'dry_run': True}
+    response = test_client.post('/users/bulk/revoke-consent', json=payload)
+
+    assert response.status_code == 200
+    assert response.json == {
+        'action': 'revoke_consent',
+        'dry_run': True,
+        'matched': 3,
+        'deleted': 0,
+        'not_found': [unknown_id],
+    }
+    assert test_client.get(f'/users/{user_ids[1]}').status_code == 200
+
+    payload['dry_run'] = False
+    response = test_client.post('/users/bulk/revoke-consent', json=payload)
+
+    assert response.status_code == 200
+    assert response.json['deleted'] == 3
+
+    for user_id in user_ids:
+        assert test_client.get(f'/users/{user_id}').status_code == 404
+
+
+def test_bulk_delete_users_by_filter_with_progress(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/bulk/delete' page is requested by (POST) with a filter
+    of unverified users, accepting NDJSON
+
+    THEN matching users must be deleted, progress streamed per batch and
+    verified user kept
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_BULK_BATCH_SIZE', 2)
+
+    test_client.post('/users/bulk/delete', json={'filter': {'verified': False}})
+
+    user_ids = [
+        result['id'] for result in test_client.post('/users/bulk', json=[
+            {'email': f'sweep{index}@example.com', 'name': 'sweep', 'consent': True}
+            for index in range(4)
+        ]).json['results']
+    ]
+    assert test_client.patch(
+        f'/users/{user_ids[0]}', json={'email_confirmed': True}
+    ).status_code == 200
+
+    response = test_client.post(
+        '/users/bulk/delete',
+        json={'filter': {'verified': False, 'created_before': '2999-01-01T00:00:00'}},
+        headers={'Accept': 'application/x-ndjson'}
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in response.data.splitlines()]
+
+    assert [line.get('total_deleted') for line in lines[:-1]] == [2, 3]
+    assert lines[-1] == {'action': 'delete', 'dry_run': False, 'matched': 3, 'deleted': 3}
+    assert test_client.get(f'/users/{user_ids[0]}').status_code == 200
+    assert test_client.get(f'/users/{user_ids[3]}').status_code == 404
+
+
+def test_bulk_delete_finished_when_progress_not_read(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/bulk/delete' page is requested by (POST) accepting
+    NDJSON, and the response is closed after the first progress line
+
+    THEN every listed user must be deleted all the same
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_BULK_BATCH_SIZE', 2)
+
+    user_ids = [
+        result['id'] for result in test_client.post('/users/bulk', json=[
+            {'email': f'disconnect{index}@example.com', 'name': 'disconnect', 'consent': True}
+            for index in range(5)
+        ]).json['results']
+    ]
+
+    response = test_client.post(
+        '/users/bulk/delete',
+        json={'ids': user_ids},
+        headers={'Accept': 'application/x-ndjson'},
+        buffered=False
+    )
+
+    assert json.loads(next(response.response))['total_deleted'] == 2
+
+    response.close()
+
+    for user_id in user_ids:
+        assert test_client.get(f'/users/{user_id}').status_code == 404
+
+
+def test_bulk_delete_filter_with_utc_offset(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN users are deleted by a dry run filter of users created before a
+    date-time with a UTC offset other than the local one
+
+    THEN the cutoff must be compared in the time users are stamped with
+    """
+
+    test_client.post('/users/bulk', json=[
+        {'email': 'offset.cutoff@example.com', 'name': 'offset', 'consent': True}
+    ])
+    local_time = datetime.now().astimezone()
+    offset = timezone(local_time.utcoffset() + timedelta(hours=10))
+
+    for delta, matched in ((timedelta(hours=-1), 0), (timedelta(hours=1), 1)):
+        response = test_client.post('/users/bulk/delete', json={
+            'filter': {
+                'email': 'offset.cutoff@example.com',
+                'created_before': (local_time + delta).astimezone(offset).isoformat()
+            },
+            'dry_run': True
+        })
+
+        assert response.status_code == 200
+        assert response.json['matched'] == matched
+
+
+def test_bulk_delete_keeps_users_no_longer_matching(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN users are deleted by filter of unverified users, and one of the
+    selected users is verified before its batch is deleted
+
+    THEN verified user must be kept
+    """
+
+    user_ids = [
+        result['id'] for result in test_client.post('/users/bulk', json=[
+            {'email': f'rematch{index}@example.com', 'name': 'rematch', 'consent': True}
+            for index in range(2)
+        ]).json['results']
+    ]
+    assert test_client.patch(
+        f'/users/{user_ids[1]}', json={'email_confirmed': True}
+    ).status_code == 200
+
+    # Verified user is selected as if it was verified after the selection
+    matching_ids = users_bulk._matching_ids # pylint: disable=protected-access
+    monkeypatch.setattr(users_bulk, '_matching_ids', lambda condition, ids: (
+        matching_ids(condition, ids) + [user_ids[1]]
+    ))
+
+    response = test_client.post('/users/bulk/delete', json={
+        'filter': {'verified': False, 'email': 'rematch0@example.com'}
+    })
+
+    assert response.json['matched'] == 2
+    assert response.json['deleted'] == 1
+    assert test_client.get(f'/users/{user_ids[0]}').status_code == 404
+    assert test_client.get(f'/users/{user_ids[1]}').status_code == 200
+
+
+def test_bulk_delete_users_with_invalid_payload(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/bulk/delete' page is requested by (POST) without ids
+    or filter, with both, with too many ids or with malformed filter
+
+    THEN response must return an error 400
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_BULK_MAX_IDS', 2)
+
+    for payload in (
+        {},
+        {'ids': [1], 'filter': {'verified': True}},
+        {'ids': []},
+        {'ids': [1, 2, 3]},
+        {'filter': {}},
+        {'filter': {'created_before': 'yesterday'}},
+    ):
+        response = test_client.post('/users/bulk/delete', json=payload)
+
+        assert response.status_code == 400
+        assert 'Invalid data received.' in response.json['error']
@@ -0,0 +1,122 @@
+"""Functional tests for the users change feed"""
+import sqlalchemy as sa
+
+from project import db # pylint: disable=import-error
+from project.http.users_changes import ( # pylint: disable=import-error
+    UPSERT, _decode_token, _tombstone_changes_query, _user_changes_query
+)
+
+
+def _create_user(test_client, email):
+    user = {'email': email, 'name': 'feed', 'consent': True}
+
+    return test_client.post('/users', json=user).json['id']
+
+
+def _read_feed(test_client, since, limit=2):
+    """ Follow the feed from since token until no more changes are available
+
+        :return: changes and the last token
+    """
+    changes = []
+
+    while True:
+        response = test_client.get(
+            '/users/changes', query_string={'limit': limit, **({'since': since} if since else {})}
+        )
+        assert response.status_code == 200
+
+        changes += response.json['changes']
+        since = response.json['next']
+
+        if not response.json['has_more']:
+            return changes, since
+
+
+def test_user_changes_feed(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN users are created, updated, deleted and consent revoked, and the
+    change feed is followed page by page from a token
+
+    THEN every change must be reported once, deletions with their reason,
+    in the order of the changes
+    """
+
+    _, since = _read_feed(test_client, None)
+
+    first_id = _create_user(test_client, 'feed1@example.com')
+    second_id = _create_user(test_client, 'feed2@example.com')
+    third_id = _create_user(test_client, 'feed3@example.com')
+
+    assert test_client.patch(f'/users/{first_id}', json={'name': 'renamed'}).status_code == 200
+    assert test_client.delete(f'/users/{second_id}').status_code == 202
+    assert test_client.patch(f'/users/{third_id}', json={'consent': False}).status_code == 202
+
+    changes, since = _read_feed(test_client, since)
+
+    assert [(change['op'], change['id']) for change in changes] == [
+        ('upsert', first_id),
+        ('delete', second_id),
+        ('delete', third_id),
+    ]
+    assert changes[0]['user']['name'] == 'renamed'
+    assert 'password' not in changes[0]['user']
+    assert [change.get('reason') for change in changes[1:]] == ['deleted', 'consent_revoked']
+
+    fourth_id = _create_user(test_client, 'feed4@example.com')
+    response = test_client.post('/users/bulk/revoke-consent', json={'ids': [fourth_id]})
+    assert response.json['deleted'] == 1
+
+    changes, next_since = _read_feed(test_client, since)
+
+    # Created and deleted in between, only the deletion is left
+    assert [(change['op'], change['id'], change.get('reason')) for change in changes] == [
+        ('delete', fourth_id, 'consent_revoked'),
+    ]
+    assert _read_feed(test_client, next_since) == ([], next_since)
+
+
+def test_user_changes_invalid_token(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN change feed is requested with malformed token or limit
+
+    THEN response must be 400
+    """
+
+    assert test_client.get('/users/changes?since=garbage').status_code == 400
+    assert test_client.get('/users/changes?limit=0').status_code == 400
+
+
+def test_user_changes_queries_use_indexes(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN query plans of change feed reads are explained
+
+    THEN users and tombstones must be searched by their changed at indexes
+    """
+
+    if db.engine.dialect.name != 'sqlite':
+        return
+
+    user_id = _create_user(test_client, 'feed-plan@example.com')
+    token = test_client.get('/users/changes').json['next']
+    position = _decode_token(token)
+    horizon = position[0]
+
+    assert position[1] == UPSERT
+    assert position[2] >= user_id
+
+    for query in (_user_changes_query(position, horizon),
+                  _tombstone_changes_query(position, horizon)):
+        statement = query.limit(10).compile(
+            dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}
+        )
+        plan = ' | '.join(
+            row[-1] for row in db.session.execute(sa.text(f'EXPLAIN QUERY PLAN {statement}'))
+        )
+
+        assert 'USING INDEX ix_users_changed_at_id' in plan or \
+            'USING INDEX ix_user_tombstones_deleted_at_id' in plan
+        assert 'TEMP B-TREE' not in plan
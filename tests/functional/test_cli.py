@@ -14,3 +14,82 @@ def test_initialize_database(cli_test_client):
 
     assert output.exit_code == 0
     assert 'Initialized the database!' in output.output
+
+
+def test_create_schema(cli_test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the 'flask create_schema' command is called on initialized database
+
+    THEN no table must be created and existing data must be kept
+    """
+
+    output = cli_test_client.invoke(args=['create_schema'])
+
+    assert output.exit_code == 0
+    assert 'Database schema is up to date.' in output.output
+
+
+def test_list_controllers(cli_test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the 'flask controllers list' command is called
+
+    THEN every registered controller must be listed
+    """
+
+    output = cli_test_client.invoke(args=['controllers', 'list'])
+
+    assert output.exit_code == 0
+    assert 'project.http.users' in output.output
+
+
+def test_profile_imports(cli_test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the 'flask controllers importtime' command is called
+
+    THEN slowest imports of app boot must be reported
+    """
+
+    output = cli_test_client.invoke(args=['controllers', 'importtime', '--limit', '5'])
+
+    assert output.exit_code == 0
+    assert 'cumulative' in output.output
+    assert len(output.output.splitlines()) == 6
+
+
+def test_show_unknown_profile(cli_test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the 'flask profiles show' command is called with unknown profile
+
+    THEN command must fail with an error message
+    """
+
+    output = cli_test_client.invoke(args=['profiles', 'show', 'missing'])
+
+    assert output.exit_code == 1
+    assert 'Unknown profile: missing' in output.output
+
+
+def test_show_profile_unknown_sort_key(cli_test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the 'flask profiles show' command is called with unknown sort key
+
+    THEN command must fail with a usage error listing sort keys, while
+    pstats abbreviations like tottime must be accepted
+    """
+
+    output = cli_test_client.invoke(args=['profiles', 'show', 'missing', '--sort', 'hottest'])
+
+    assert output.exit_code == 2
+    assert "Invalid value for '--sort'" in output.output
+    assert 'cumulative' in output.output
+
+    for sort in ('tottime', 'cumtime', 'ncalls'):
+        output = cli_test_client.invoke(args=['profiles', 'show', 'missing', '--sort', sort])
+
+        assert output.exit_code == 1
+        assert 'Unknown profile: missing' in output.output
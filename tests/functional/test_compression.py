@@ -0,0 +1,125 @@
+"""Functional tests for the response compression"""
+import gzip
+
+import pytest
+
+from project import compressor # pylint: disable=import-error
+
+
+def _create_users(test_client, count):
+    response = test_client.post('/users/bulk', json=[
+        {'email': f'compressed{index}@example.com', 'name': 'compressed', 'consent': True}
+        for index in range(count)
+    ])
+    assert response.status_code == 200
+
+
+def test_collection_compressed_and_cached(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users' page is requested with and without gzip accepted,
+    twice
+
+    THEN page must be compressed only when accepted, varying on
+    Accept-Encoding, and compressed once
+    """
+
+    _create_users(test_client, 50)
+
+    plain = test_client.get('/users?limit=50')
+    response = test_client.get('/users?limit=50', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'] == plain.headers['ETag']
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data)
+    assert gzip.decompress(response.data) == plain.data
+    assert 'compress;dur=' in response.headers['Server-Timing']
+
+    cache_hits = compressor.metrics()['cache_hits']
+    repeated = test_client.get('/users?limit=50', headers={'Accept-Encoding': 'gzip'})
+
+    assert repeated.data == response.data
+    assert compressor.metrics()['cache_hits'] == cache_hits + 1
+
+    not_modified = test_client.get('/users?limit=50', headers={
+        'Accept-Encoding': 'gzip',
+        'If-None-Match': response.headers['ETag']
+    })
+
+    assert not_modified.status_code == 304
+    assert 'Content-Encoding' not in not_modified.headers
+
+    metrics = test_client.get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE compression_cache_hits_total counter' in metrics
+    assert f'compression_cache_hits_total {cache_hits + 1}' in metrics
+
+
+def test_small_and_unaccepted_responses_not_compressed(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN response is shorter than the minimum size, or client accepts
+    identity only
+
+    THEN response must be sent as it is
+    """
+
+    response = test_client.get('/users?limit=1', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+
+    response = test_client.get('/users?limit=50', headers={'Accept-Encoding': 'identity'})
+
+    assert 'Content-Encoding' not in response.headers
+
+    response = test_client.get('/users?limit=50', headers={'Accept-Encoding': 'gzip;q=0'})
+
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_preferred_coding_negotiated(test_client):
+    """GIVEN a Flask application with zstandard and brotli installed
+
+    WHEN client accepts several codings
+
+    THEN zstd must be preferred among equally accepted codings, client
+    preference otherwise
+    """
+
+    zstandard = pytest.importorskip('zstandard')
+    brotli = pytest.importorskip('brotli')
+
+    plain = test_client.get('/users?limit=50')
+    response = test_client.get('/users?limit=50', headers={'Accept-Encoding': 'gzip, br, zstd'})
+
+    assert response.headers['Content-Encoding'] == 'zstd'
+    assert zstandard.ZstdDecompressor().decompress(response.data) == plain.data
+
+    response = test_client.get('/users?limit=50', headers={
+        'Accept-Encoding': 'gzip;q=0.5, br, zstd;q=0.1'
+    })
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == plain.data
+
+
+def test_streamed_responses_compressed(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN streamed collection and CSV export are requested with gzip
+    accepted
+
+    THEN they must be compressed as they are streamed, without length
+    """
+
+    for url in ('/users?stream=ndjson', '/users?stream=json', '/users/export'):
+        # Streamed body is read before the next request is made
+        plain = test_client.get(url).data
+        response = test_client.get(url, headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        assert gzip.decompress(response.data) == plain
@@ -0,0 +1,203 @@
+"""Functional tests for conditional requests (ETag) of the API"""
+
+from project import user_cache # pylint: disable=import-error
+
+
+def _create_user(test_client, name):
+    data = {
+        'email': f'{name}@example.com',
+        'name': name,
+        'consent' : True
+    }
+
+    response = test_client.post('/users', json=data)
+    assert response.status_code == 201
+
+    return response
+
+
+def test_get_user_not_modified(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user is requested with If-None-Match of its current ETag,
+    with and without user being cached
+
+    THEN response must be 304 without a body
+    """
+
+    response = _create_user(test_client, 'etag1')
+    user_id = response.json['id']
+    etag = response.headers['ETag']
+
+    assert etag.startswith('W/"')
+
+    response = test_client.get(f'/users/{user_id}')
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] == etag
+
+    response = test_client.get(f'/users/{user_id}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+    user_cache.clear()
+
+    response = test_client.get(f'/users/{user_id}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+    response = test_client.get(f'/users/{user_id}', headers={'If-None-Match': 'W/"other"'})
+
+    assert response.status_code == 200
+    assert response.json['name'] == 'etag1'
+
+
+def test_update_user_with_if_match(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user is updated with If-Match of outdated and of current ETag
+
+    THEN outdated update must fail with 412, current one must succeed
+    """
+
+    response = _create_user(test_client, 'etag2')
+    user_id = response.json['id']
+    etag = response.headers['ETag']
+
+    response = test_client.patch(
+        f'/users/{user_id}',
+        json={'name': 'first'},
+        headers={'If-Match': etag}
+    )
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    response = test_client.patch(
+        f'/users/{user_id}',
+        json={'name': 'second'},
+        headers={'If-Match': etag}
+    )
+
+    assert response.status_code == 412
+    assert response.is_json
+    assert test_client.get(f'/users/{user_id}').json['name'] == 'first'
+
+
+def test_get_user_collection_not_modified(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user collection is requested with If-None-Match of its ETag,
+    before and after a new user is created, updated and deleted
+
+    THEN response must be 304 until collection changes
+    """
+
+    _create_user(test_client, 'etag3')
+
+    etag = test_client.get('/users').headers['ETag']
+
+    response = test_client.get('/users', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+
+    response = test_client.get('/users?limit=1', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+
+    _create_user(test_client, 'etag4')
+
+    response = test_client.get('/users', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    user_id = response.json[-1]['id']
+
+    for method, status_code in (('patch', 200), ('delete', 202)):
+        etag = response.headers['ETag']
+
+        assert test_client.open(
+            f'/users/{user_id}', method=method, json={'memo': 'changed'}
+        ).status_code == status_code
+
+        response = test_client.get('/users', headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+def test_amend_user_with_if_match(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user is amended through setters with If-Match of outdated and of
+    current ETag, and unknown user is updated with If-Match
+
+    THEN outdated amendment must fail with 412, current one must succeed,
+    unknown user must not be found
+    """
+
+    response = _create_user(test_client, 'etag5')
+    user_id = response.json['id']
+    etag = response.headers['ETag']
+
+    assert test_client.patch(f'/users/{user_id}', json={'name': 'first'}).status_code == 200
+
+    response = test_client.patch(
+        f'/users/{user_id}',
+        json={'password': 'password123'},
+        headers={'If-Match': etag}
+    )
+
+    assert response.status_code == 412
+
+    etag = test_client.get(f'/users/{user_id}').headers['ETag']
+    response = test_client.patch(
+        f'/users/{user_id}',
+        json={'password': 'password123'},
+        headers={'If-Match': etag}
+    )
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    for data in ({'name': 'x'}, {'password': 'password123'}):
+        response = test_client.patch('/users/999999', json=data, headers={'If-Match': '*'})
+
+        assert response.status_code == 404
+
+        response = test_client.patch('/users/999999', json=data, headers={'If-Match': etag})
+
+        assert response.status_code == 404
+
+
+def test_if_match_compares_weak_etags(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user is amended with If-Match of its weak ETag, and of the same
+    ETag without weak marker
+
+    THEN both must match, user ETags being compared weakly on purpose
+    """
+
+    response = _create_user(test_client, 'etag6')
+    user_id = response.json['id']
+    etag = response.headers['ETag']
+
+    assert etag.startswith('W/"')
+
+    response = test_client.patch(
+        f'/users/{user_id}', json={'name': 'weak'}, headers={'If-Match': etag}
+    )
+
+    assert response.status_code == 200
+
+    etag = response.headers['ETag']
+    response = test_client.patch(
+        f'/users/{user_id}', json={'name': 'strong'}, headers={'If-Match': etag[2:]}
+    )
+
+    assert response.status_code == 200
+    assert response.json['name'] == 'strong'
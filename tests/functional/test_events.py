@@ -0,0 +1,107 @@
+"""Functional tests for the users mutation events stream"""
+import json
+
+from project import event_broker # pylint: disable=import-error
+
+
+def _read_event(chunks):
+    """ Read next event of the stream, skipping keep-alive comments """
+    for chunk in chunks:
+        chunk = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+
+        if chunk.startswith(':'):
+            continue
+
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+
+        return fields.get('event', None), json.loads(fields['data'])
+
+    return None
+
+
+def test_user_events_stream(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user events are streamed while a user is created, updated and
+    its consent revoked
+
+    THEN every mutation must be pushed as a server-sent event, and the
+    subscriber removed once the stream is closed
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'EVENTS_HEARTBEAT_SECONDS', 0.01)
+
+    response = test_client.get('/users/events', buffered=False)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    chunks = iter(response.response)
+
+    assert next(chunks).startswith(b'retry: ')
+    assert event_broker.metrics()['subscribers'] == 1
+
+    user_id = test_client.post('/users', json={
+        'email': 'events@example.com',
+        'name': 'events',
+        'consent': True
+    }).json['id']
+    test_client.patch(f'/users/{user_id}', json={'memo': 'evented'})
+    test_client.patch(f'/users/{user_id}', json={'consent': False})
+
+    event_type, data = _read_event(chunks)
+
+    assert event_type == 'user.created'
+    assert data['id'] == user_id
+    assert data['user']['email'] == 'events@example.com'
+
+    event_type, data = _read_event(chunks)
+
+    assert event_type == 'user.updated'
+    assert data['user']['memo'] == 'evented'
+    assert _read_event(chunks) == ('user.consent_revoked', {'id': user_id})
+
+    response.close()
+
+    assert event_broker.metrics()['subscribers'] == 0
+
+
+def test_user_events_filter_and_overflow(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing, with subscriber
+    queue of a single event and disconnect overflow policy
+
+    WHEN deletion events are streamed, and more users are deleted than the
+    subscriber reads
+
+    THEN other event types must be filtered out, and the stream ended by
+    an overflow event
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'EVENTS_HEARTBEAT_SECONDS', 0.01)
+    event_broker.queue_size = 1
+    event_broker.policy = 'disconnect'
+
+    try:
+        response = test_client.get('/users/events?types=user.deleted', buffered=False)
+        chunks = iter(response.response)
+        next(chunks)
+
+        user_ids = [
+            result['id'] for result in test_client.post('/users/bulk', json=[
+                {'email': f'overflow{index}@example.com', 'name': 'overflow', 'consent': True}
+                for index in range(2)
+            ]).json['results']
+        ]
+        test_client.post('/users/bulk/delete', json={'ids': user_ids})
+
+        assert _read_event(chunks) == ('user.deleted', {'id': user_ids[0]})
+        assert _read_event(chunks) == ('overflow', {})
+        assert _read_event(chunks) is None
+
+        response.close()
+    finally:
+        event_broker.queue_size = 100
+        event_broker.policy = 'drop_oldest'
+
+    assert test_client.get('/users/events?types=user.renamed').status_code == 400
@@ -0,0 +1,167 @@
+"""Functional tests for the users table export"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+def _create_users(test_client, prefix, count):
+    response = test_client.post('/users/bulk', json=[
+        {'email': f'{prefix}{index}@example.com', 'name': prefix, 'consent': True}
+        for index in range(count)
+    ])
+    assert response.status_code == 200
+
+    return [result['id'] for result in response.json['results']]
+
+
+def test_export_users_csv_and_ndjson(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/export' page is requested as CSV and as NDJSON
+
+    THEN every user must be exported in id order, without password
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_EXPORT_CHUNK_SIZE', 2)
+    user_ids = _create_users(test_client, 'export', 3)
+
+    response = test_client.get('/users/export')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'filename=users.csv' in response.headers['Content-Disposition']
+
+    rows = list(csv.DictReader(io.StringIO(response.data.decode('utf-8'))))
+
+    assert [int(row['id']) for row in rows][-3:] == user_ids
+    assert 'password' not in rows[0]
+    assert rows[-1]['email'] == 'export2@example.com'
+
+    response = test_client.get('/users/export?format=ndjson&fields=id,email,created_at')
+    items = [json.loads(line) for line in response.data.splitlines()]
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert set(items[-1]) == {'id', 'email', 'created_at'}
+    assert items[-1]['created_at'].startswith(response.headers['X-Export-Watermark'][:10])
+
+
+def test_export_users_parquet_since_watermark(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/export' page is requested as Parquet, then again since
+    the watermark of the first export, after a user was added and another
+    one updated
+
+    THEN second export must only hold the added and updated users
+    """
+
+    parquet = pytest.importorskip('pyarrow.parquet')
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_EXPORT_CHUNK_SIZE', 2)
+    user_ids = _create_users(test_client, 'parquet', 3)
+
+    response = test_client.get('/users/export?format=parquet')
+
+    assert response.status_code == 200
+
+    table = parquet.read_table(io.BytesIO(response.data))
+
+    assert table.column('id').to_pylist()[-3:] == user_ids
+    assert 'password' not in table.column_names
+
+    watermark = response.headers['X-Export-Watermark']
+    added_id = _create_users(test_client, 'parquet-added', 1)[0]
+    assert test_client.patch(f'/users/{user_ids[0]}', json={'memo': 'changed'}).status_code == 200
+
+    response = test_client.get(f'/users/export?format=parquet&since={watermark}')
+    table = parquet.read_table(io.BytesIO(response.data))
+
+    assert table.column('id').to_pylist() == [user_ids[0], added_id]
+    assert table.column('memo').to_pylist()[0] == 'changed'
+
+    response = test_client.get(
+        f'/users/export?format=parquet&since={response.headers["X-Export-Watermark"]}'
+    )
+
+    assert parquet.read_table(io.BytesIO(response.data)).num_rows == 0
+
+
+def test_export_users_since_with_offset_and_settled(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/export' page is requested since a watermark with UTC
+    offset, then with writes held back for an hour
+
+    THEN watermark must be converted to local time, and users written
+    within the hour must be left for the next export
+    """
+
+    user_id = _create_users(test_client, 'offset', 1)[0]
+    since = datetime.now() - timedelta(minutes=1)
+
+    for offset_since in (since.astimezone().isoformat(),
+                         since.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')):
+        response = test_client.get('/users/export', query_string={
+            'format': 'ndjson', 'fields': 'id', 'since': offset_since
+        })
+
+        assert response.status_code == 200
+        assert json.loads(response.data.splitlines()[-1]) == {'id': user_id}
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_CHANGES_SETTLE_SECONDS', 3600)
+
+    response = test_client.get('/users/export', query_string={
+        'format': 'ndjson', 'fields': 'id', 'since': since.isoformat()
+    })
+
+    assert response.status_code == 200
+    assert not response.data
+    assert response.headers['X-Export-Watermark'] == since.isoformat()
+
+
+def test_export_users_invalid_arguments(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the '/users/export' page is requested with unknown format, field
+    or malformed watermark
+
+    THEN response must be 400
+    """
+
+    assert test_client.get('/users/export?format=xml').status_code == 400
+    assert test_client.get('/users/export?fields=password').status_code == 400
+    assert test_client.get('/users/export?since=yesterday').status_code == 400
+
+
+def test_export_users_command(test_client, tmp_path):
+    """GIVEN a Flask application configured for testing
+
+    WHEN the 'flask export_users' command is called
+
+    THEN users must be written to the output file and watermark reported
+    """
+
+    _create_users(test_client, 'cli-export', 2)
+    output_path = tmp_path / 'users.ndjson'
+
+    output = test_client.application.test_cli_runner().invoke(args=[
+        'export_users', '--format', 'ndjson', '--output', str(output_path), '--fields', 'email'
+    ])
+
+    assert output.exit_code == 0
+    assert 'watermark:' in output.output
+
+    lines = output_path.read_text().splitlines()
+
+    assert json.loads(lines[-1]) == {'email': 'cli-export1@example.com'}
+    assert f'Exported {len(lines)} users' in output.output
+
+    output = test_client.application.test_cli_runner().invoke(args=[
+        'export_users', '--format', 'xml'
+    ])
+
+    assert output.exit_code != 0
+    assert 'Unsupported export format' in output.output
@@ -0,0 +1,58 @@
+"""Functional tests for request instrumentation and metrics"""
+import re
+
+
+def test_server_timing_header(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN a user with password is created
+
+    THEN response must report durations of request phases, SQL queries
+    and of the whole request in Server-Timing header
+    """
+
+    data = {
+        'email': 'timing@example.com',
+        'name': 'timing',
+        'password': 'password123',
+        'consent' : True
+    }
+
+    response = test_client.post('/users', json=data)
+
+    assert response.status_code == 201
+
+    phases = dict(
+        re.match(r'^(\w+);dur=([\d.]+)', metric.strip()).groups()
+        for metric in response.headers['Server-Timing'].split(',')
+    )
+
+    assert {'validate', 'password_hash', 'commit', 'db', 'total'} <= set(phases)
+    assert 'queries"' in response.headers['Server-Timing']
+
+
+def test_prometheus_metrics(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN a user is requested and '/metrics' page is requested (GET)
+
+    THEN latency histogram of the user route and service counters
+    must be exposed in Prometheus text format
+    """
+
+    test_client.get('/users/1')
+
+    response = test_client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+    text = response.get_data(as_text=True)
+    labels = 'blueprint="user_resources",route="/users/<int:user_id>",method="GET"'
+
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f'http_request_duration_seconds_count{{{labels}}} 1' in text
+    assert f'http_request_sql_queries_count{{{labels}}} 1' in text
+    assert 'user_cache_misses_total' in text
+    assert 'db_pool_checked_out_connections' in text
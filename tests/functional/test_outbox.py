@@ -0,0 +1,181 @@
+"""Functional tests for the transactional outbox of user changes"""
+import json
+
+import sqlalchemy as sa
+
+from project import db # pylint: disable=import-error
+from project.models.outbox_message import OutboxMessage # pylint: disable=import-error
+
+
+class _FailingSink(): # pylint: disable=too-few-public-methods
+    """Sink failing every delivery"""
+
+    def deliver(self, messages):
+        """Fail whole batch"""
+        raise ConnectionError(f'{len(messages)} messages refused')
+
+
+def _outbox_dispatcher(test_client):
+    """ Dispatcher of the app, with outbox emptied and sink cleared """
+    dispatcher = test_client.application.extensions['outbox']
+    dispatcher.run(once=True)
+    dispatcher.sink.messages.clear()
+
+    return dispatcher
+
+
+def _outbox_messages():
+    return db.session.execute(
+        sa.select(OutboxMessage).order_by(OutboxMessage._id) # pylint: disable=protected-access
+    ).scalars().all()
+
+
+def test_outbox_written_and_dispatched(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN a user is created, updated and deleted, and outbox dispatched in
+    batches of two messages
+
+    THEN every change must be written to outbox along with the user, and
+    delivered to the sink in order, once
+    """
+
+    dispatcher = _outbox_dispatcher(test_client)
+    monkeypatch.setitem(dispatcher.options, 'batch_size', 2)
+
+    user_id = test_client.post('/users', json={
+        'email': 'outbox@example.com',
+        'name': 'outbox',
+        'consent': True
+    }).json['id']
+    test_client.patch(f'/users/{user_id}', json={'memo': 'outboxed'})
+    test_client.delete(f'/users/{user_id}')
+
+    messages = _outbox_messages()
+
+    assert [message.event_type for message in messages] == [
+        'user.created', 'user.updated', 'user.deleted'
+    ]
+    assert json.loads(messages[0].payload)['user']['email'] == 'outbox@example.com'
+    assert json.loads(messages[2].payload) == {'id': user_id}
+    assert dispatcher.status()['pending'] == 3
+
+    assert dispatcher.dispatch_batch() == 2
+    assert dispatcher.dispatch_batch() == 1
+    assert dispatcher.dispatch_batch() == 0
+
+    delivered = dispatcher.sink.messages
+
+    assert [message['type'] for message in delivered] == [
+        'user.created', 'user.updated', 'user.deleted'
+    ]
+    assert delivered[1]['data']['user']['memo'] == 'outboxed'
+    assert delivered[0]['attempts'] == 1
+    assert not _outbox_messages()
+    assert dispatcher.status() == {'pending': 0, 'parked': 0, 'lag_seconds': 0.0}
+
+
+def test_outbox_bulk_changes(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN users are imported and deleted in bulk
+
+    THEN an outbox message must be written for every created and deleted
+    user
+    """
+
+    dispatcher = _outbox_dispatcher(test_client)
+
+    response = test_client.post('/users/bulk', json=[
+        {'email': f'outbox.bulk{index}@example.com', 'name': 'bulk', 'consent': True}
+        for index in range(3)
+    ])
+    user_ids = [result['id'] for result in response.json['results']]
+
+    test_client.post('/users/bulk/revoke-consent', json={'ids': user_ids})
+    dispatcher.run(once=True)
+
+    assert [(message['type'], message['data']['id']) for message in dispatcher.sink.messages] == (
+        [('user.created', user_id) for user_id in user_ids]
+        + [('user.consent_revoked', user_id) for user_id in user_ids]
+    )
+
+
+def test_outbox_retry_park_and_requeue(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN sink fails every delivery
+
+    THEN message must be retried, parked after the maximum attempts, and
+    delivered once requeued
+    """
+
+    dispatcher = _outbox_dispatcher(test_client)
+    sink = dispatcher.sink
+    monkeypatch.setitem(dispatcher.options, 'max_attempts', 2)
+    monkeypatch.setitem(dispatcher.options, 'retry_seconds', 0)
+    monkeypatch.setattr(dispatcher, 'sink', _FailingSink())
+
+    test_client.post('/users', json={
+        'email': 'outbox.retry@example.com',
+        'name': 'retry',
+        'consent': True
+    })
+
+    failed = dispatcher.metrics()['failed']
+
+    assert dispatcher.dispatch_batch() == 1
+    assert dispatcher.status()['pending'] == 1
+    assert dispatcher.dispatch_batch() == 1
+    assert dispatcher.dispatch_batch() == 0
+
+    message, = _outbox_messages()
+
+    assert message.attempts == 2
+    assert message.last_error == 'ConnectionError: 1 messages refused'
+    assert dispatcher.status()['parked'] == 1
+    assert dispatcher.metrics()['failed'] == failed + 2
+
+    dispatcher.sink = sink
+
+    assert dispatcher.requeue_parked() == 1
+    assert dispatcher.dispatch_batch() == 1
+    assert sink.messages[0]['attempts'] == 1
+    assert dispatcher.status() == {'pending': 0, 'parked': 0, 'lag_seconds': 0.0}
+
+
+def test_outbox_commands_and_metrics(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN outbox status and dispatch commands are called and metrics
+    requested
+
+    THEN pending messages must be reported, dispatched, and exposed as
+    metrics
+    """
+
+    dispatcher = _outbox_dispatcher(test_client)
+    runner = test_client.application.test_cli_runner()
+
+    test_client.post('/users', json={
+        'email': 'outbox.cli@example.com',
+        'name': 'cli',
+        'consent': True
+    })
+
+    output = runner.invoke(args=['outbox', 'status'])
+
+    assert output.exit_code == 0
+    assert output.output.startswith('1 pending, 0 parked')
+
+    output = runner.invoke(args=['outbox', 'dispatch', '--once'])
+
+    assert output.exit_code == 0
+    assert 'Dispatched' in output.output
+    assert len(dispatcher.sink.messages) == 1
+
+    metrics = test_client.get('/metrics').get_data(as_text=True)
+
+    assert 'outbox_pending_messages 0' in metrics
+    assert '# TYPE outbox_messages_dispatched_total counter' in metrics
+    assert 'outbox_lag_seconds' in metrics
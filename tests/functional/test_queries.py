@@ -0,0 +1,213 @@
+"""Functional tests for user collection lookups, filters and their indexes"""
+from datetime import datetime
+import itertools
+
+import pytest
+import sqlalchemy as sa
+
+from project import db, user_cache # pylint: disable=import-error
+from project.http.user_requests import CollectionArguments, user_collection_query # pylint: disable=import-error
+
+
+def _create_user(test_client, email):
+    response = test_client.post('/users', json={
+        'email': email,
+        'name': email.split('@')[0],
+        'consent': True
+    })
+    assert response.status_code == 201
+
+    return response.json['id']
+
+
+def _query_plan(arguments):
+    """ EXPLAIN QUERY PLAN details of the collection query on SQLite """
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('Query plan checks are written for SQLite')
+
+    query = user_collection_query(arguments, db.engine.dialect.name).limit(101)
+    statement = query.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(sa.text(f'EXPLAIN QUERY PLAN {statement}')).all()
+
+    return ' | '.join(row[-1] for row in rows)
+
+
+def test_get_user_by_email(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user collection is requested with email in another letter case
+
+    THEN matching user must be returned
+    """
+
+    user_id = _create_user(test_client, 'Mixed.Case@Example.com')
+
+    response = test_client.get('/users?email=mixed.case@EXAMPLE.com')
+
+    assert response.status_code == 200
+    assert response.json == [
+        {'id': user_id, 'email': 'Mixed.Case@Example.com', 'name': 'Mixed.Case'}
+    ]
+    assert test_client.get('/users?email=unknown@example.com').json == []
+
+
+def test_get_unverified_users_newest_first(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN unverified users are requested newest first, page by page
+
+    THEN verified user must be skipped and pages linked in creation order
+    """
+
+    first_id = _create_user(test_client, 'unverified1@example.com')
+    verified_id = _create_user(test_client, 'verified@example.com')
+    last_id = _create_user(test_client, 'unverified2@example.com')
+
+    response = test_client.patch(f'/users/{verified_id}', json={'email_confirmed': True})
+    assert response.status_code == 200
+
+    response = test_client.get('/users?verified=false&sort=-created_at&limit=1')
+
+    assert response.status_code == 200
+    assert [user['id'] for user in response.json] == [last_id]
+
+    next_page = response.headers['Link'].split(';')[0].strip('<>')
+
+    assert 'verified=false' in next_page
+    assert 'sort=-created_at' in next_page
+
+    assert 'cursor=' in next_page
+
+    # Cursor holds the sort key, so the page is found after its user is gone
+    assert test_client.delete(f'/users/{last_id}').status_code == 202
+
+    response = test_client.get(next_page)
+
+    assert [user['id'] for user in response.json] == [first_id]
+
+    response = test_client.get('/users?verified=true&fields=id')
+
+    assert response.json == [{'id': verified_id}]
+
+
+def test_get_user_collection_invalid_filters(test_client):
+    """GIVEN a Flask application configured for testing
+
+    WHEN user collection is requested with unknown sort key, verified value
+    or malformed page position
+
+    THEN response must be 400
+    """
+
+    assert test_client.get('/users?sort=name').status_code == 400
+    assert test_client.get('/users?sort=--id').status_code == 400
+    assert test_client.get('/users?verified=yes').status_code == 400
+    assert test_client.get('/users?sort=created_at&after=1').status_code == 400
+    assert test_client.get('/users?sort=created_at&cursor=1').status_code == 400
+
+
+def test_collection_queries_use_indexes(test_client): # pylint: disable=unused-argument
+    """GIVEN a Flask application configured for testing
+
+    WHEN query plans of every combination of email and verified filters,
+    sort key and keyset are explained
+
+    THEN users must be read in order from an index, searched from the
+    keyset on, with neither a temporary sort nor a scan of the table
+    """
+
+    arguments = CollectionArguments(
+        fields=None, limit=100, after=None, email=None, verified=None, sort='id'
+    )
+
+    for email, verified, sort, keyset in itertools.product(
+        (None, 'Mixed.Case@example.com'),
+        (None, False, True),
+        ('id', '-id', 'created_at', '-created_at'),
+        (False, True)
+    ):
+        after = None
+
+        if keyset:
+            after = (3,) if sort.lstrip('-') == 'id' else (datetime(2024, 1, 2), 3)
+
+        plan = _query_plan(arguments._replace(
+            email=email, verified=verified, sort=sort, after=after
+        ))
+
+        assert 'TEMP B-TREE' not in plan, plan
+
+        if keyset:
+            assert plan.startswith('SEARCH users USING'), plan
+        elif email is not None or verified is not None or sort.lstrip('-') != 'id':
+            # Filtered or sorted by creation: no scan of the table itself
+            assert 'USING INDEX' in plan, plan
+        else:
+            # First page by id scans the table in primary key order
+            assert plan == 'SCAN users', plan
+
+    plan = _query_plan(arguments._replace(email='Mixed.Case@example.com', sort='-created_at'))
+
+    assert 'SEARCH users USING INDEX ix_users_email_nocase_created_at_id' in plan
+
+    plan = _query_plan(arguments._replace(verified=True))
+
+    assert 'SCAN users USING INDEX ix_users_verified_id' in plan
+
+
+def test_get_user_batch(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN users are looked up by a list of ids, some of them cached and
+    some unknown
+
+    THEN users must be listed in the order of requested ids, with not
+    found markers for unknown ids
+    """
+
+    first_id = _create_user(test_client, 'batch1@example.com')
+    second_id = _create_user(test_client, 'batch2@example.com')
+    unknown_id = second_id + 100
+
+    assert test_client.get(f'/users/{first_id}').status_code == 200
+
+    response = test_client.get(f'/users?ids={second_id},{unknown_id},{first_id}&fields=id,email')
+
+    assert response.status_code == 200
+    assert response.json == [
+        {'id': second_id, 'email': 'batch2@example.com'},
+        {'id': unknown_id, 'error': f'User not found: id: {unknown_id}'},
+        {'id': first_id, 'email': 'batch1@example.com'},
+    ]
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_BATCH_CHUNK_SIZE', 1)
+    user_cache.clear()
+
+    response = test_client.post('/users/batch', json={'ids': [first_id, second_id, first_id]})
+
+    assert response.status_code == 200
+    assert [user['email'] for user in response.json] == [
+        'batch1@example.com', 'batch2@example.com', 'batch1@example.com'
+    ]
+    assert 'password' not in response.json[0]
+    assert user_cache.get(second_id)['user'] == response.json[1]
+
+
+def test_get_user_batch_invalid_ids(test_client, monkeypatch):
+    """GIVEN a Flask application configured for testing
+
+    WHEN users are looked up by an empty, too long or malformed list of ids
+
+    THEN response must be 400
+    """
+
+    monkeypatch.setitem(test_client.application.config, 'USERS_BATCH_MAX_IDS', 2)
+
+    assert test_client.get('/users?ids=').status_code == 400
+    assert test_client.get('/users?ids=1,x').status_code == 400
+    assert test_client.get('/users?ids=1,2,3').status_code == 400
+    assert test_client.post('/users/batch', json={'ids': [1, 1.5]}).status_code == 400
+    assert test_client.post('/users/batch', json={'ids': [True]}).status_code == 400
+    assert test_client.post('/users/batch', json=[1, 2]).json == {
+        'error': 'List of user ids expected'
+    }
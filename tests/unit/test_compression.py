@@ -0,0 +1,89 @@
+"""
+This file (test_compression.py) contains the unit tests for the
+compression.py file.
+"""
+import gzip
+import unittest
+import zlib
+
+from flask import Flask
+
+# pylint: disable=import-error
+from project.services.compression import (
+    GzipEncoder, ResponseCompressor, available_encoders, brotli, zstandard
+)
+# pylint: enable=import-error
+
+CHUNKS = [b'{"id": %d, "name": "compressed"}\n' % index for index in range(100)]
+
+
+class TestCompression(unittest.TestCase):
+    """ Unit test suite for ResponseCompressor and its encoders"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.app = Flask(__name__)
+
+
+    def test_gzip_stream_is_flushed_per_chunk(self):
+        """GIVEN a gzip encoder
+        WHEN chunks are compressed as a stream
+        THEN every compressed chunk decodes to its chunk right away, and
+        the whole stream to the whole body
+        """
+
+        encoder = GzipEncoder(6)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        compressed = list(encoder.stream(iter(CHUNKS)))
+
+        for chunk, compressed_chunk in zip(CHUNKS, compressed):
+            assert decompressor.decompress(compressed_chunk) == chunk
+
+        assert len(compressed) == len(CHUNKS) + 1
+        assert gzip.decompress(b''.join(compressed)) == b''.join(CHUNKS)
+
+
+    def test_every_encoder_round_trips(self):
+        """GIVEN every installed encoder
+        WHEN body is compressed whole and as a stream
+        THEN both decompress to the body
+        """
+
+        decompress = {'gzip': gzip.decompress}
+
+        if brotli is not None:
+            decompress['br'] = brotli.decompress
+
+        if zstandard is not None:
+            # Streamed frames do not carry content size
+            decompress['zstd'] = lambda data: zstandard.ZstdDecompressor().decompressobj(
+            ).decompress(data)
+
+        body = b''.join(CHUNKS)
+
+        for coding, encoder_class in available_encoders().items():
+            encoder = encoder_class(1)
+
+            assert decompress[coding](encoder.compress(body)) == body
+            assert decompress[coding](b''.join(encoder.stream(iter(CHUNKS)))) == body
+
+
+    def test_levels_and_hook_are_configured(self):
+        """GIVEN compression configuration
+        WHEN compressor is initialised
+        THEN encoders have configured levels, and no request hook is
+        registered when compression is disabled
+        """
+
+        self.app.config['COMPRESSION_LEVELS'] = {'gzip': 1}
+        compressor = ResponseCompressor(self.app)
+
+        assert compressor.encoders['gzip'].level == 1
+        assert list(compressor.encoders)[-1] == 'gzip'
+        assert self.app.after_request_funcs[None]
+
+        app = Flask(__name__)
+        app.config['COMPRESSION_ENABLED'] = False
+        ResponseCompressor(app)
+
+        assert not app.after_request_funcs
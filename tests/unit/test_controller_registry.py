@@ -0,0 +1,98 @@
+"""
+This file (test_controller_registry.py) contains the unit tests for the
+controller_registry.py file.
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from flask import Flask
+
+from project.http import CONTROLLERS # pylint: disable=import-error
+# pylint: disable=import-error
+from project.services.controller_registry import (
+    LazyView, build_manifest, controller_modules, lazy_rules, register_lazy_controller,
+    write_manifest
+)
+# pylint: enable=import-error
+
+
+class TestControllerRegistry(unittest.TestCase):
+    """ Unit test suite for controller registry"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.manifest_path = os.path.join(self.directory.name, 'controllers.json')
+
+
+    def tearDown(self):
+        "Mandatory method"
+        self.directory.cleanup()
+
+
+    def test_registry_lists_controllers(self):
+        """GIVEN the controller registry
+        WHEN controller modules are resolved
+        THEN every registered controller is listed once, result is cached
+        """
+
+        assert controller_modules()[:len(CONTROLLERS)] == CONTROLLERS
+        assert len(set(controller_modules())) == len(controller_modules())
+        assert controller_modules() is controller_modules()
+
+
+    def test_manifest_describes_blueprint_rules(self):
+        """GIVEN the default controller
+        WHEN its manifest is built
+        THEN its URL rule and view are described
+        """
+
+        manifest = build_manifest(['project.http.default'])
+
+        assert manifest['project.http.default']['rules'] == [{
+            'rule': '/',
+            'endpoint': 'default_resources.check_status',
+            'view': 'project.http.default:check_status',
+            'methods': ['GET'],
+        }]
+
+
+    def test_lazy_controller_serves_requests(self):
+        """GIVEN an app with the default controller registered lazily
+        WHEN its URL is requested
+        THEN view is imported and response is returned
+        """
+
+        write_manifest(self.manifest_path, ['project.http.default'])
+        rules = lazy_rules(self.manifest_path, 'project.http.default')
+
+        app = Flask(__name__)
+        register_lazy_controller(app, rules)
+
+        view = app.view_functions['default_resources.check_status']
+
+        assert isinstance(view, LazyView)
+
+        with app.test_client() as client:
+            response = client.get('/')
+
+        assert response.status_code == 200
+        assert response.json == {'status': 'ok'}
+
+
+    def test_stale_manifest_is_ignored(self):
+        """GIVEN a manifest older than controller source
+        WHEN lazy rules are requested
+        THEN no rules are returned
+        """
+
+        manifest = build_manifest(['project.http.default'])
+        manifest['project.http.default']['modified_at'] -= 1
+
+        with open(self.manifest_path, mode='w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file)
+
+        assert lazy_rules(self.manifest_path, 'project.http.default') is None
+        assert lazy_rules(os.path.join(self.directory.name, 'missing.json'), 'x') is None
@@ -0,0 +1,73 @@
+"""
+This file (test_db_pool.py) contains the unit tests for the db_pool.py
+file and engine options of config.py.
+"""
+import os
+import tempfile
+import unittest
+
+import sqlalchemy as sa
+
+from config import engine_options # pylint: disable=import-error
+from project.services.db_pool import InstrumentedQueuePool, pool_metrics # pylint: disable=import-error
+
+
+class TestDatabasePool(unittest.TestCase):
+    """ Unit test suite for connection pool configuration and metrics"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.engine = sa.create_engine(
+            f"sqlite:///{os.path.join(self.directory.name, 'pool.db')}",
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.01
+        )
+
+
+    def tearDown(self):
+        "Mandatory method"
+        self.engine.dispose()
+        self.directory.cleanup()
+
+
+    def test_engine_options(self):
+        """GIVEN database URLs
+        WHEN engine options are built
+        THEN pool options are set, with driver specific options for Postgres
+        """
+
+        sqlite_options = engine_options('sqlite:///app.db')
+        postgres_options = engine_options('postgresql://localhost/app', pool_size=10)
+
+        assert sqlite_options['pool_pre_ping'] is True
+        assert 'connect_args' not in sqlite_options
+        assert postgres_options['pool_size'] == 10
+        assert 'connect_timeout' in postgres_options['connect_args']
+        assert not engine_options('sqlite://')
+
+
+    def test_pool_metrics(self):
+        """GIVEN an engine with instrumented pool of a single connection
+        WHEN connection is checked out and another one is requested
+        THEN checked out connection, wait and timeout are reported
+        """
+
+        with self.engine.connect():
+            metrics = pool_metrics(self.engine)
+
+            assert metrics['pool'] == 'InstrumentedQueuePool'
+            assert metrics['checked_out'] == 1
+            assert metrics['idle'] == 0
+
+            with self.assertRaises(sa.exc.TimeoutError):
+                self.engine.connect()
+
+        metrics = pool_metrics(self.engine)
+
+        assert metrics['checked_out'] == 0
+        assert metrics['idle'] == 1
+        assert metrics['wait']['count'] == 2
+        assert metrics['wait']['timeouts'] == 1
@@ -0,0 +1,184 @@
+"""
+This file (test_event_broker.py) contains the unit tests for the
+event_broker.py file.
+"""
+import threading
+import unittest
+
+from flask import Flask
+
+# pylint: disable=import-error
+from project.services.event_broker import (
+    EventBroker, InMemoryPubSubClient, SharedEventBackend, Subscription
+)
+# pylint: enable=import-error
+
+
+class TestEventBroker(unittest.TestCase):
+    """ Unit test suite for EventBroker and its subscriptions"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.app = Flask(__name__)
+
+
+    def test_subscription_drops_oldest_event(self):
+        """GIVEN a subscription with room for two events, dropping oldest
+        WHEN third event is queued
+        THEN first event is dropped and counted
+        """
+
+        subscription = Subscription(max_size=2, policy='drop_oldest')
+
+        for index in range(3):
+            subscription.put({'type': 'user.created', 'data': {'id': index}})
+
+        assert subscription.get(timeout=0)['data'] == {'id': 1}
+        assert subscription.get(timeout=0)['data'] == {'id': 2}
+        assert subscription.get(timeout=0) is None
+        assert subscription.dropped == 1
+        assert not subscription.overflowed
+
+
+    def test_subscription_drops_newest_event(self):
+        """GIVEN a subscription with room for one event, dropping newest
+        WHEN second event is queued
+        THEN second event is dropped
+        """
+
+        subscription = Subscription(max_size=1, policy='drop_newest')
+        subscription.put({'type': 'user.created', 'data': {'id': 1}})
+        subscription.put({'type': 'user.created', 'data': {'id': 2}})
+
+        assert subscription.get(timeout=0)['data'] == {'id': 1}
+        assert subscription.get(timeout=0) is None
+        assert subscription.dropped == 1
+
+
+    def test_local_broker_fans_out(self):
+        """GIVEN a broker with local backend and two subscribers
+        WHEN an event is published
+        THEN both subscribers receive it, until unsubscribed
+        """
+
+        broker = EventBroker(self.app)
+        first = broker.subscribe()
+        second = broker.subscribe(frozenset(('user.deleted',)))
+
+        broker.publish('user.created', {'id': 1})
+        broker.publish('user.deleted', {'id': 1})
+
+        assert first.get(timeout=0)['type'] == 'user.created'
+        assert first.get(timeout=0)['type'] == 'user.deleted'
+        assert second.get(timeout=0) == {'type': 'user.deleted', 'data': {'id': 1}}
+
+        broker.unsubscribe(first)
+        broker.publish('user.deleted', {'id': 2})
+
+        assert first.get(timeout=0) is None
+        assert broker.metrics() == {
+            'backend': 'LocalEventBackend',
+            'subscribers': 1,
+            'published': 3,
+            'dropped': 0,
+        }
+
+
+    def test_shared_broker_delivers_across_brokers(self):
+        """GIVEN two brokers sharing an in-memory channel, as two workers
+        WHEN an event is published by one of them
+        THEN subscriber of the other one receives it
+        """
+
+        self.app.config['EVENTS_BACKEND'] = 'memory'
+        publisher = EventBroker(self.app)
+        subscriber = EventBroker()
+        subscriber.init_app(self.app)
+        subscriber.backend = publisher.backend
+        subscriber.backend.start(subscriber._dispatch) # pylint: disable=protected-access
+
+        subscription = subscriber.subscribe()
+        publisher.publish('user.updated', {'id': 5})
+
+        assert subscription.get(timeout=5) == {'type': 'user.updated', 'data': {'id': 5}}
+
+
+    def test_shared_broker_listens_again_after_failure(self):
+        """GIVEN a broker listening to a shared channel
+        WHEN the channel fails under the listening thread
+        THEN the failure is logged, and events published once the thread
+        subscribed again are delivered
+        """
+
+        client = _FailingOncePubSubClient()
+        broker = EventBroker(self.app)
+        broker.backend = SharedEventBackend(client, reconnect_delay=0.01)
+        broker.backend.start(broker._dispatch) # pylint: disable=protected-access
+
+        with self.assertLogs('project.services.event_broker', level='ERROR'):
+            subscription = broker.subscribe()
+            client.fail.set()
+            event = None
+
+            for _ in range(500):
+                broker.publish('user.updated', {'id': 5})
+                event = subscription.get(timeout=0.01)
+
+                if event is not None:
+                    break
+
+        assert event == {'type': 'user.updated', 'data': {'id': 5}}
+
+
+    def test_subscribers_are_limited(self):
+        """GIVEN a broker allowing a single subscriber
+        WHEN second subscription is requested
+        THEN it is refused
+        """
+
+        self.app.config['EVENTS_MAX_SUBSCRIBERS'] = 1
+        broker = EventBroker(self.app)
+
+        assert broker.subscribe() is not None
+        assert broker.subscribe() is None
+
+
+    def test_unknown_backend_and_policy_are_rejected(self):
+        """GIVEN an unknown event backend or overflow policy
+        WHEN event broker is initialised
+        THEN ValueError is raised
+        """
+
+        self.app.config['EVENTS_BACKEND'] = 'kafka'
+
+        with self.assertRaises(ValueError):
+            EventBroker(self.app)
+
+        self.app.config['EVENTS_BACKEND'] = 'local'
+        self.app.config['EVENTS_OVERFLOW_POLICY'] = 'block'
+
+        with self.assertRaises(ValueError):
+            EventBroker(self.app)
+
+
+class _FailingOncePubSubClient(InMemoryPubSubClient):
+    """In-memory channel whose first subscriber fails once `fail` is set,
+    like a lost connection"""
+
+    def __init__(self):
+        super().__init__()
+        self.fail = threading.Event()
+        self._subscribers_created = 0
+
+    def pubsub(self):
+        pubsub = super().pubsub()
+        self._subscribers_created += 1
+
+        if self._subscribers_created == 1:
+            pubsub.listen = self._lose_connection
+
+        return pubsub
+
+    def _lose_connection(self):
+        self.fail.wait()
+        raise ConnectionError('Connection lost')
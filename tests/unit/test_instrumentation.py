@@ -0,0 +1,61 @@
+"""
+This file (test_instrumentation.py) contains the unit tests for the
+instrumentation.py file.
+"""
+import unittest
+
+import sqlalchemy as sa
+from flask import Flask
+
+# pylint: disable=import-error
+from project.services.instrumentation import Histogram, Instrumentation, timed
+# pylint: enable=import-error
+
+
+class TestInstrumentation(unittest.TestCase):
+    """ Unit test suite for request instrumentation"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """GIVEN a histogram with two buckets
+        WHEN values are observed
+        THEN bucket counts are cumulative, ending with +Inf
+        """
+
+        histogram = Histogram((0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.cumulative_counts() == [('0.1', 2), ('1.0', 3), ('+Inf', 4)]
+        assert histogram.count == 4
+        assert histogram.sum == 2.65
+
+
+    def test_timed_outside_request(self):
+        """GIVEN no request context
+        WHEN block is timed
+        THEN block runs and nothing is recorded
+        """
+
+        with timed('phase'):
+            result = 1 + 1
+
+        assert result == 2
+
+
+    def test_failed_statement_timing_is_popped(self):
+        """GIVEN an instrumented engine
+        WHEN a statement fails
+        THEN its start time does not stay on the connection
+        """
+
+        Instrumentation(Flask(__name__))
+        engine = sa.create_engine('sqlite://')
+
+        with engine.connect() as connection:
+            with self.assertRaises(sa.exc.OperationalError):
+                connection.execute(sa.text('SELECT * FROM missing'))
+
+            connection.execute(sa.text('SELECT 1'))
+
+            assert not connection.info['query_started_at']
@@ -0,0 +1,122 @@
+"""
+This file (test_log_pipeline.py) contains the unit tests for the
+log_pipeline.py file.
+"""
+import json
+import logging
+import os
+import queue
+import tempfile
+import unittest
+
+from flask import Flask
+
+# pylint: disable=import-error
+from project.services.log_pipeline import (
+    DroppingQueueHandler, JsonFormatter, LogPipeline, SamplingFilter
+)
+# pylint: enable=import-error
+
+
+def make_record(level=logging.INFO, message='message', lineno=1):
+    """Build log record logged from given line"""
+    return logging.LogRecord('test', level, 'test.py', lineno, message, None, None)
+
+
+class TestLogPipeline(unittest.TestCase):
+    """ Unit test suite for logging pipeline"""
+
+    def test_sampling_filter(self):
+        """GIVEN a filter sampling 1 of 3 records
+        WHEN records are logged from one call site
+        THEN every third info record and every warning passes
+        """
+
+        sampling_filter = SamplingFilter(rate=3)
+
+        passed = [sampling_filter.filter(make_record()) for _ in range(6)]
+
+        assert passed == [True, False, False, True, False, False]
+        assert sampling_filter.filter(make_record(level=logging.WARNING))
+        assert sampling_filter.filter(make_record(lineno=2))
+        assert sampling_filter.sampled_out == 4
+
+
+    def test_full_queue_drops_records(self):
+        """GIVEN a queue handler with room for one record
+        WHEN two records are logged
+        THEN second record is dropped without raising
+        """
+
+        handler = DroppingQueueHandler(queue.Queue(1))
+
+        handler.handle(make_record())
+        handler.handle(make_record())
+
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 1
+
+
+    def test_json_formatter(self):
+        """GIVEN a JSON formatter
+        WHEN record is formatted
+        THEN a JSON object with message and level is returned
+        """
+
+        entry = json.loads(JsonFormatter().format(make_record(message='hello')))
+
+        assert entry['message'] == 'hello'
+        assert entry['level'] == 'INFO'
+        assert entry['line'] == 1
+
+
+    def test_pipeline_writes_log_file(self):
+        """GIVEN a pipeline attached to an app logger
+        WHEN records are logged and pipeline is stopped
+        THEN records are written to the log file as JSON lines
+        """
+
+        app = Flask(__name__)
+        pipeline = LogPipeline()
+
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'test.log')
+            pipeline.init_app(app, log_file)
+
+            app.logger.info('first')
+            app.logger.error('second')
+            pipeline.stop()
+
+            with open(log_file, mode='r', encoding='utf-8') as lines:
+                messages = [json.loads(line)['message'] for line in lines]
+
+        assert messages == ['first', 'second']
+        assert pipeline.handler not in app.logger.handlers
+
+
+    def test_pipeline_keeps_exception_apart(self):
+        """GIVEN a pipeline attached to an app logger
+        WHEN an exception is logged
+        THEN its traceback is written in its own field, not in the message
+        """
+
+        app = Flask(__name__)
+        pipeline = LogPipeline()
+
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, 'test.log')
+            pipeline.init_app(app, log_file)
+
+            try:
+                raise ValueError('broken')
+            except ValueError:
+                app.logger.exception('failed %s', 'here')
+
+            pipeline.stop()
+
+            with open(log_file, mode='r', encoding='utf-8') as lines:
+                entry = json.loads(lines.readline())
+
+        assert entry['message'] == 'failed here'
+        assert entry['exception'].startswith('Traceback')
+        assert 'ValueError: broken' in entry['exception']
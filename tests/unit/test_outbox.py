@@ -0,0 +1,98 @@
+"""
+This file (test_outbox.py) contains the unit tests for the outbox.py
+file.
+"""
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from flask import Flask
+
+# pylint: disable=import-error
+from project.models.outbox_message import OutboxMessage
+from project.services.outbox import LogSink, MemorySink, OutboxDispatcher, WebhookSink
+# pylint: enable=import-error
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """Handler recording POSTed batches, refusing them once `status` is set"""
+
+    batches = []
+    status = 204
+
+    def do_POST(self): # pylint: disable=invalid-name
+        """Record batch and answer with configured status"""
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        _WebhookHandler.batches.append(json.loads(body))
+
+        self.send_response(_WebhookHandler.status)
+        self.end_headers()
+
+    def log_message(self, *_): # pylint: disable=arguments-differ
+        """Keep test output clean"""
+
+
+class TestOutbox(unittest.TestCase):
+    """ Unit test suite for OutboxDispatcher sinks and messages"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.app = Flask(__name__)
+
+
+    def test_sink_is_configured(self):
+        """GIVEN outbox sink configuration
+        WHEN dispatcher is initialised
+        THEN configured sink is created, unknown sink is rejected
+        """
+
+        assert isinstance(OutboxDispatcher(self.app).sink, LogSink)
+
+        self.app.config['OUTBOX_SINK'] = 'memory'
+
+        assert isinstance(OutboxDispatcher(self.app).sink, MemorySink)
+        assert self.app.extensions['outbox'].metrics()['sink'] == 'MemorySink'
+
+        self.app.config['OUTBOX_SINK'] = 'webhook'
+        self.app.config['OUTBOX_WEBHOOK_URL'] = 'http://localhost/outbox'
+
+        assert OutboxDispatcher(self.app).sink.url == 'http://localhost/outbox'
+
+        self.app.config['OUTBOX_SINK'] = 'kafka'
+
+        with self.assertRaises(ValueError):
+            OutboxDispatcher(self.app)
+
+
+    def test_webhook_sink_posts_batch(self):
+        """GIVEN a webhook sink
+        WHEN a batch is delivered, and refused
+        THEN batch is POSTed as a JSON array, refusal raises
+        """
+
+        server = HTTPServer(('127.0.0.1', 0), _WebhookHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        sink = WebhookSink(f'http://127.0.0.1:{server.server_port}/outbox', timeout=5)
+        messages = [{'id': 1, 'type': 'user.deleted', 'data': {'id': 7}}]
+
+        try:
+            assert not sink.deliver(messages)
+            assert _WebhookHandler.batches == [messages]
+
+            _WebhookHandler.status = 500
+
+            with self.assertRaises(OSError):
+                sink.deliver(messages)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+    def test_insert_statement_of_no_change(self):
+        """GIVEN no user change
+        WHEN outbox insert statement is built
+        THEN there is no statement
+        """
+
+        assert OutboxMessage.insert_statement('user.created', []) is None
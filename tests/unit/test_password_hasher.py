@@ -0,0 +1,120 @@
+"""
+This file (test_password_hasher.py) contains the unit tests for the
+password_hasher.py file.
+"""
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+from project.exceptions.password_hasher_saturated import PasswordHasherSaturated # pylint: disable=import-error
+from project.services.password_hasher import PasswordHasher # pylint: disable=import-error
+
+
+class TestPasswordHasher(unittest.TestCase):
+    """ Unit test suite for PasswordHasher"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.app = Flask(__name__)
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+
+    def test_hash_and_check_in_request_thread(self):
+        """GIVEN a hasher without workers
+        WHEN password is hashed and checked
+        THEN hash is verifiable and metrics are recorded
+        """
+
+        hasher = PasswordHasher(self.app)
+        password_hash = hasher.hash('password123')
+
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.check(password_hash, 'password123')
+        assert not hasher.check(password_hash, 'password1234')
+
+        metrics = hasher.metrics()
+
+        assert metrics['hash']['count'] == 1
+        assert metrics['check']['count'] == 2
+        assert metrics['pending'] == 0
+
+
+    def test_hash_in_worker_process(self):
+        """GIVEN a hasher with a worker process
+        WHEN password is hashed
+        THEN hash is verifiable in the request thread
+        """
+
+        self.app.config['PASSWORD_HASH_WORKERS'] = 1
+        hasher = PasswordHasher(self.app)
+
+        try:
+            password_hash = hasher.hash('password123')
+        finally:
+            hasher.shutdown()
+
+        assert PasswordHasher().check(password_hash, 'password123')
+
+
+    def test_saturated_hasher_rejects_work(self):
+        """GIVEN a hasher allowing one pending hash
+        WHEN another hash is requested while the first one is running
+        THEN PasswordHasherSaturated is raised
+        """
+
+        self.app.config['PASSWORD_HASH_MAX_PENDING'] = 1
+        hasher = PasswordHasher(self.app)
+
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_hash(*_):
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=hasher._run, args=('hash', blocking_hash)) # pylint: disable=protected-access
+        thread.start()
+        started.wait(5)
+
+        try:
+            with self.assertRaises(PasswordHasherSaturated):
+                hasher.hash('password123')
+        finally:
+            release.set()
+            thread.join()
+
+        assert hasher.metrics()['rejected'] == 1
+        assert hasher.hash('password123')
+
+
+    def test_timed_out_hash_keeps_its_slot(self):
+        """GIVEN a hasher with a worker process, allowing one pending hash
+        WHEN hash does not finish in time
+        THEN PasswordHasherSaturated is raised, and the slot is only
+        released once the worker is done
+        """
+
+        self.app.config['PASSWORD_HASH_WORKERS'] = 1
+        self.app.config['PASSWORD_HASH_MAX_PENDING'] = 1
+        self.app.config['PASSWORD_HASH_TIMEOUT'] = 0.01
+        hasher = PasswordHasher(self.app)
+
+        try:
+            with self.assertRaises(PasswordHasherSaturated):
+                hasher._run('hash', time.sleep, 1) # pylint: disable=protected-access
+
+            with self.assertRaises(PasswordHasherSaturated):
+                hasher._run('hash', time.sleep, 0) # pylint: disable=protected-access
+
+            assert hasher.metrics()['pending'] == 1
+
+            deadline = time.monotonic() + 30
+
+            while hasher.metrics()['pending'] and time.monotonic() < deadline:
+                time.sleep(0.05)
+
+            assert hasher.metrics()['pending'] == 0
+            assert hasher.metrics()['rejected'] == 2
+        finally:
+            hasher.shutdown()
@@ -0,0 +1,91 @@
+"""
+This file (test_request_profiler.py) contains the unit tests for the
+request_profiler.py file.
+"""
+import tempfile
+import unittest
+
+from flask import Flask
+
+from project.services.request_profiler import RequestProfiler # pylint: disable=import-error
+
+
+class TestRequestProfiler(unittest.TestCase):
+    """ Unit test suite for on-demand request profiling"""
+
+    def setUp(self):
+        """Mandatory method"""
+
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+
+        self.app = Flask(__name__)
+        self.app.config.update(
+            PROFILING_ENABLED=True,
+            PROFILING_DIRECTORY=self.directory.name,
+            PROFILING_MAX_FILES=2,
+        )
+        self.app.add_url_rule('/ping', 'ping', lambda: 'pong')
+
+    def tearDown(self):
+        """Mandatory method"""
+
+        self.directory.cleanup()
+
+    def test_profile_requested_by_header(self):
+        """GIVEN enabled profiler
+        WHEN requests are sent with and without X-Profile header
+        THEN only the flagged request is profiled and can be summarised
+        """
+
+        profiler = RequestProfiler(self.app)
+        client = self.app.test_client()
+
+        assert 'X-Profile-Id' not in client.get('/ping').headers
+
+        response = client.get('/ping', headers={'X-Profile': '1'})
+        profile_id = response.headers['X-Profile-Id']
+
+        assert profiler.list_profiles() == [profile_id]
+        assert profile_id.endswith('-GET-ping')
+        assert 'function calls' in profiler.summary(profile_id, limit=5)
+
+    def test_old_profiles_removed(self):
+        """GIVEN profiler keeping two profiles
+        WHEN three requests are profiled with the query argument
+        THEN only two newest profiles are kept
+        """
+
+        profiler = RequestProfiler(self.app)
+        client = self.app.test_client()
+
+        profile_ids = [
+            client.get('/ping?_profile=1').headers['X-Profile-Id'] for _ in range(3)
+        ]
+
+        assert profiler.list_profiles() == profile_ids[:0:-1]
+
+    def test_token_required(self):
+        """GIVEN profiler with a token
+        WHEN request carries wrong token
+        THEN request is not profiled
+        """
+
+        self.app.config['PROFILING_TOKEN'] = 'secret'
+        RequestProfiler(self.app)
+        client = self.app.test_client()
+
+        assert 'X-Profile-Id' not in client.get('/ping', headers={'X-Profile': '1'}).headers
+        assert 'X-Profile-Id' in client.get('/ping', headers={'X-Profile': 'secret'}).headers
+
+    def test_disabled_profiler_registers_no_hooks(self):
+        """GIVEN disabled profiler
+        WHEN it is initialised
+        THEN no request hook is registered
+        """
+
+        self.app.config['PROFILING_ENABLED'] = False
+        RequestProfiler(self.app)
+
+        assert not self.app.before_request_funcs
+        assert not self.app.after_request_funcs
+        assert 'X-Profile-Id' not in self.app.test_client().get('/ping?_profile=1').headers
@@ -0,0 +1,102 @@
+"""
+This file (test_schema_registry.py) contains the unit tests for the
+schema_registry.py file.
+"""
+import json
+import os
+import tempfile
+import unittest
+
+import jsonschema
+from flask import Flask
+
+from project.services.schema_registry import SchemaRegistry # pylint: disable=import-error
+
+
+SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "email": {"type": "string", "format": "email"}
+    },
+    "required": ["email"]
+}
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    """ Unit test suite for SchemaRegistry"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.schema_path = os.path.join(self.directory.name, 'sample.json')
+        self._write_schema(SCHEMA)
+
+        self.app = Flask(__name__)
+
+
+    def tearDown(self):
+        "Mandatory method"
+        self.directory.cleanup()
+
+
+    def _write_schema(self, schema):
+        with open(self.schema_path, mode='w', encoding='utf-8') as schema_file:
+            json.dump(schema, schema_file)
+
+
+    def test_validator_is_compiled_once(self):
+        """GIVEN a schema directory
+        WHEN validator is requested several times
+        THEN the same compiled validator is returned
+        """
+
+        registry = SchemaRegistry(self.directory.name, self.app)
+
+        assert registry.validator('sample') is registry.validator('sample')
+        assert self.app.extensions['schema_registry'] is registry
+
+
+    def test_email_format_is_checked(self):
+        """GIVEN a schema with email format
+        WHEN data with invalid email is validated
+        THEN ValidationError is raised
+        """
+
+        registry = SchemaRegistry(self.directory.name, self.app)
+
+        registry.validate('sample', {'email': 'john.doe@example.com'})
+
+        with self.assertRaises(jsonschema.ValidationError):
+            registry.validate('sample', {'email': 'john.doe'})
+
+
+    def test_invalid_schema_is_rejected_on_load(self):
+        """GIVEN a schema violating its meta-schema
+        WHEN registry is initialised
+        THEN SchemaError is raised
+        """
+
+        self._write_schema({"type": "no-such-type"})
+
+        with self.assertRaises(jsonschema.SchemaError):
+            SchemaRegistry(self.directory.name, self.app)
+
+
+    def test_changed_schema_is_reloaded(self):
+        """GIVEN a registry with auto reload enabled
+        WHEN schema file is changed
+        THEN new schema is used for validation
+        """
+
+        self.app.config['SCHEMA_AUTO_RELOAD'] = True
+        registry = SchemaRegistry(self.directory.name, self.app)
+
+        registry.validate('sample', {'email': 'john.doe@example.com'})
+
+        self._write_schema(dict(SCHEMA, required=['email', 'name']))
+        modified_at = os.stat(self.schema_path).st_mtime_ns + 1
+        os.utime(self.schema_path, ns=(modified_at, modified_at))
+
+        with self.assertRaises(jsonschema.ValidationError):
+            registry.validate('sample', {'email': 'john.doe@example.com'})
@@ -0,0 +1,96 @@
+"""
+This file (test_serialization.py) contains the unit tests for the
+serialization.py file.
+"""
+import unittest
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import Flask
+
+from project.models.user import User # pylint: disable=import-error
+from project.services.serialization import dumps, serializer_for # pylint: disable=import-error
+
+
+class TestModelSerializer(unittest.TestCase):
+    """ Unit test suite for ModelSerializer"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.app = Flask(__name__)
+        self.user = User('test@example.com',  'password123', True, 'Test user')
+        self.user._created_at = datetime(2024, 1, 2, 3, 4, 5) # pylint: disable=protected-access
+        self.serializer = serializer_for(User)
+
+
+    def test_plan_is_computed_once_per_model(self):
+        """GIVEN a User model
+        WHEN serializer is requested twice
+        THEN the same serializer, without hidden columns, is returned
+        """
+
+        assert serializer_for(User) is self.serializer
+        assert 'password' not in self.serializer.field_names
+        assert 'email' in self.serializer.field_names
+
+
+    def test_serialize_formats_datetimes(self):
+        """GIVEN a User model
+        WHEN serialized with http and iso datetime formats
+        THEN created_at is formatted accordingly
+        """
+
+        with self.app.app_context():
+            data = self.serializer.serialize(self.user)
+
+            self.app.config['JSON_DATETIME_FORMAT'] = 'iso'
+            iso_data = self.serializer.serialize(self.user)
+
+        assert data['created_at'] == 'Tue, 02 Jan 2024 03:04:05 GMT'
+        assert iso_data['created_at'] == '2024-01-02T03:04:05'
+        assert data['email_verified_at'] is None
+        assert dumps(data).startswith(b'{')
+
+
+    def test_sparse_fieldset(self):
+        """GIVEN a User model
+        WHEN serialized with sparse fieldset
+        THEN only requested fields are returned, unknown fields are rejected
+        """
+
+        fields = self.serializer.parse_fields('email, name')
+
+        assert self.serializer.serialize(self.user, fields) == {
+            'email': 'test@example.com',
+            'name': 'Test user',
+        }
+        assert self.serializer.parse_fields(None) is None
+
+        with self.assertRaises(ValueError):
+            self.serializer.parse_fields('email,password')
+
+
+    def test_serialize_rows_of_column_limited_select(self):
+        """GIVEN a users table with a single user
+        WHEN columns of sparse fieldset are selected
+        THEN only those columns are selected and serialized
+        """
+
+        engine = sa.create_engine('sqlite://')
+        User.__table__.create(engine)
+
+        columns = self.serializer.columns(frozenset(('id', 'created_at')))
+
+        with engine.connect() as connection:
+            connection.execute(sa.insert(User.__table__).values(
+                email='test@example.com',
+                name='Test user',
+                created_at=datetime(2024, 1, 2, 3, 4, 5),
+                consent=True
+            ))
+            rows = connection.execute(sa.select(*columns)).all()
+
+        with self.app.app_context():
+            data = list(self.serializer.serialize_rows(rows))
+
+        assert data == [{'id': 1, 'created_at': 'Tue, 02 Jan 2024 03:04:05 GMT'}]
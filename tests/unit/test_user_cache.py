@@ -0,0 +1,138 @@
+"""
+This file (test_user_cache.py) contains the unit tests for the
+user_cache.py file.
+"""
+import unittest
+from datetime import datetime
+
+from flask import Flask
+
+# pylint: disable=import-error
+from project.services.user_cache import (
+    InMemoryCacheClient, LRUCacheBackend, SharedCacheBackend, UserCache
+)
+# pylint: enable=import-error
+
+
+class TestUserCache(unittest.TestCase):
+    """ Unit test suite for UserCache and its backends"""
+
+    def setUp(self):
+        "Mandatory method"
+        self.app = Flask(__name__)
+
+
+    def test_lru_backend_evicts_least_recently_used(self):
+        """GIVEN a LRU backend with room for two values
+        WHEN third value is stored
+        THEN least recently used value is evicted
+        """
+
+        backend = LRUCacheBackend(max_entries=2, ttl=60)
+        backend.set(1, 'one')
+        backend.set(2, 'two')
+        backend.get(1)
+        backend.set(3, 'three')
+
+        assert backend.get(1) == 'one'
+        assert backend.get(2) is None
+        assert backend.get(3) == 'three'
+        assert backend.evictions == 1
+
+
+    def test_lru_backend_expires_values(self):
+        """GIVEN a LRU backend with zero TTL
+        WHEN value is stored
+        THEN value is expired on the next read
+        """
+
+        backend = LRUCacheBackend(max_entries=2, ttl=-1)
+        backend.set(1, 'one')
+
+        assert backend.get(1) is None
+        assert backend.evictions == 1
+
+
+    def test_shared_backend_round_trip(self):
+        """GIVEN a shared backend with in-memory client
+        WHEN user representation is stored
+        THEN it is read back as JSON compatible value
+        """
+
+        backend = SharedCacheBackend(InMemoryCacheClient(), ttl=60)
+
+        with self.app.app_context():
+            backend.set(1, {'id': 1, 'created_at': datetime(2024, 1, 2, 3, 4, 5)})
+
+        assert backend.get(1) == {'id': 1, 'created_at': 'Tue, 02 Jan 2024 03:04:05 GMT'}
+
+        assert backend.get_many([1, 2]) == {
+            1: {'id': 1, 'created_at': 'Tue, 02 Jan 2024 03:04:05 GMT'}
+        }
+
+        backend.delete(1)
+
+        assert backend.get(1) is None
+        assert backend.get_many([1]) == {}
+
+
+    def test_shared_backend_clear_by_prefix(self):
+        """GIVEN a shared backend sharing its client with another backend
+        WHEN it is cleared
+        THEN values under its prefix are removed, whichever process stored
+        them, and other values are kept
+        """
+
+        client = InMemoryCacheClient()
+        backend = SharedCacheBackend(client, ttl=60)
+        other = SharedCacheBackend(client, ttl=60, prefix='others:')
+
+        with self.app.app_context():
+            for key in range(1200):
+                backend.set(key, {'id': key})
+
+            other.set(1, {'id': 1})
+
+        SharedCacheBackend(client, ttl=60).clear()
+
+        assert not list(client.scan_iter(match='users:*'))
+        assert other.get(1) == {'id': 1}
+
+
+    def test_user_cache_counts_hits_and_misses(self):
+        """GIVEN a user cache with default backend
+        WHEN user is looked up before and after being cached
+        THEN a miss and a hit are counted
+        """
+
+        cache = UserCache(self.app)
+
+        assert cache.get(1) is None
+
+        cache.set(1, {'id': 1})
+
+        assert cache.get(1) == {'id': 1}
+
+        assert cache.get_many([1, 2]) == {1: {'id': 1}}
+
+        cache.invalidate(1)
+
+        assert cache.get(1) is None
+        assert cache.metrics() == {
+            'backend': 'LRUCacheBackend',
+            'hits': 2,
+            'misses': 3,
+            'evictions': 0,
+        }
+
+
+    def test_unknown_backend_is_rejected(self):
+        """GIVEN an unknown cache backend name
+        WHEN user cache is initialised
+        THEN ValueError is raised
+        """
+
+        self.app.config['USER_CACHE_BACKEND'] = 'memcached'
+
+        with self.assertRaises(ValueError):
+            UserCache(self.app)